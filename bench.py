@@ -0,0 +1,786 @@
+"""
+PeekAlert 벤치마크
+실행: python bench.py [--rows 1000,100000] [--wal off|on|both] [--only poll,parse,...]
+                      [--json 결과.json]
+알림 파싱, DB 폴링, 중복 제거, 큐 처리 등 핫패스의 처리 속도를 측정합니다.
+가짜 알림 DB(make_testdb.py)를 쓰므로 Windows 없이도 돌아갑니다.
+--json 으로 저장한 결과끼리 비교하면 버전 간 회귀를 확인할 수 있습니다.
+"""
+import argparse, contextlib, json, os, platform, queue, random, socket, statistics
+import sys, tempfile, threading, time, timeit, tracemalloc
+import xml.etree.ElementTree as ET
+
+import peekalert as pa
+import make_testdb
+
+# ── 샘플 토스트 (Discord 데스크톱 앱이 남기는 형태) ──
+def _toast(title, body, src="", launch="", extra=""):
+    image = (f'<image placement="appLogoOverride" src="{src}" hint-crop="circle"/>'
+             if src else "")
+    return (f'<toast launch="{launch}" activationType="protocol"><visual>'
+            f'<binding template="ToastGeneric"><text>{title}</text><text>{body}</text>'
+            f'{extra}{image}</binding></visual></toast>')
+
+AVATAR = r"C:\Users\user\AppData\Local\Temp\discord-avatar-4b1d2c.png"
+
+CORPUS = [
+    # DM
+    _toast("\u2068친구#1234\u2069", "야 게임하자! 들어와~", AVATAR,
+           "discord://-/channels/@me/1029384756"),
+    # 서버 채널 메시지
+    _toast("\u2068Alice\u2069 (#\u2068general\u2069, \u2068My Server\u2069)",
+           "오늘 9시 레이드 ㄱㄱ", AVATAR,
+           "discord://-/channels/8675309/1122334455"),
+    # 멘션 + 이스케이프 문자
+    _toast("\u2068Bob\u2069 (#\u2068raid\u2069, \u2068Guild &amp; Co\u2069)",
+           "@\u2068me\u2069 &lt;3 &quot;빨리&quot; 와 &amp; 준비해", AVATAR,
+           "discord://-/channels/8675309/5566778899"),
+    # 첨부파일 / 빈 본문
+    _toast("\u2068Carol\u2069", "이미지를 보냈습니다.", AVATAR),
+    _toast("\u2068Dave\u2069 (#\u2068clips\u2069, \u2068Gamers\u2069)", ""),
+    # 긴 본문
+    _toast("\u2068Eve\u2069 (#\u2068notes\u2069, \u2068Study\u2069)",
+           "긴 메시지 " * 60, AVATAR),
+    # attribution 텍스트 포함
+    _toast("\u2068Frank\u2069", "통화 요청", AVATAR,
+           extra='<text placement="attribution">Discord</text>'),
+    # 버튼(actions) 포함
+    _toast("\u2068Grace\u2069", "답장 가능", AVATAR).replace(
+        "</toast>",
+        '<actions><input id="reply" type="text"/><action content="보내기" '
+        'arguments="reply" hint-inputId="reply"/></actions></toast>'),
+]
+CORPUS_BYTES = [s.encode("utf-8") for s in CORPUS]
+
+
+def _legacy_parse(payload):
+    """v1.0 의 파싱 방식 (비교 기준)"""
+    ps = payload.decode("utf-8", errors="replace")
+    texts = [e.text for e in ET.fromstring(ps).iter("text") if e.text]
+    clean = lambda s: s.replace("\u2068", "").replace("\u2069", "").strip()
+    title = clean(texts[0]) if texts else "Discord"
+    body  = clean(texts[1]) if len(texts) > 1 else ""
+    return title, body
+
+
+def _uncached_parse(payload):
+    return pa.parse_toast.__wrapped__(payload)
+
+
+def bench_parse(rounds=2000):
+    # 빠른 경로와 XML 파싱 결과가 같은지 먼저 확인
+    for s in CORPUS:
+        fast, full = pa._parse_toast_fast(s), pa._parse_toast_xml(s)
+        assert fast is not None, s
+        for k in pa.Toast.__slots__:
+            assert getattr(fast, k) == getattr(full, k), (k, s)
+
+    results = {}
+    for name, fn in (("legacy ElementTree", _legacy_parse),
+                     ("fast path",          _uncached_parse),
+                     ("fast path + cache",  pa.parse_toast)):
+        t = timeit.timeit(lambda: [fn(p) for p in CORPUS_BYTES], number=rounds)
+        results[name] = t / (rounds * len(CORPUS_BYTES)) * 1e6
+    base = results["legacy ElementTree"]
+    print(f"[파싱] 샘플 {len(CORPUS)}개 x {rounds}회")
+    for name, us in results.items():
+        print(f"  {name:<20} {us:7.2f} us/건  (x{base / us:.1f})")
+    return results
+
+
+def bench_layout(rounds=20000, slots=5):
+    """재정렬 한 번(슬롯 slots 개)의 좌표 계산 비용: 모니터 캐시 유/무"""
+    cfg = dict(pa.DEFAULT_CONFIG)
+    fake = pa.FakeDisplays([(0, 0, 2560, 1400, True), (2560, 0, 4480, 1040, False),
+                            (-1920, 0, 0, 1040, False)])
+
+    def restack():
+        base_x, base_y = pa._base_x_y(cfg)[:2]
+        return [(base_x, pa._target_y_for_slot(i, cfg, base_y)) for i in range(slots)]
+
+    results = {}
+    saved = pa.displays
+    try:
+        for name, ttl, refresh in (("캐시 없음", 0.0, 0.0), ("캐시", 2.0, 60.0)):
+            pa.displays = pa._DisplayService(fake, ttl=ttl, refresh=refresh)
+            fake.calls = 0
+            t = timeit.timeit(restack, number=rounds)
+            results[name] = t / rounds * 1e6
+            print(f"  {name:<10} {results[name]:7.2f} us/재정렬  (모니터 열거 {fake.calls}회)")
+    finally:
+        pa.displays = saved
+    return results
+
+
+@contextlib.contextmanager
+def temp_config(**overrides):
+    """사용자 설정 파일은 건드리지 않도록 임시 설정으로 교체"""
+    saved = pa._config
+    with tempfile.TemporaryDirectory() as d:
+        pa._config = pa._ConfigStore(os.path.join(d, "cfg.json"), pa.DEFAULT_CONFIG)
+        pa._config.save({**pa._config.get(), "verbose": False, **overrides})
+        try:
+            yield pa._config
+        finally:
+            pa._config.flush()
+            pa._config = saved
+
+
+def _summary(values, scale=1.0):
+    """값 목록 → 건수/p50/p95/p99/max (scale 배)"""
+    if not values:
+        return {"count": 0}
+    v = sorted(values)
+    q = lambda p: round(v[min(len(v) - 1, int(p * len(v)))] * scale, 3)
+    return {"count": len(v), "p50": q(0.5), "p95": q(0.95), "p99": q(0.99),
+            "max": round(v[-1] * scale, 3)}
+
+
+class _ThreadWakeRoot:
+    """디스플레이 없을 때의 디스패처 모형: Tk 가상 이벤트 대신 스레드 이벤트로 깨움"""
+    def __init__(self):
+        self.wake = threading.Event()
+
+    def event_generate(self, name, when=None):
+        self.wake.set()
+
+
+def _dispatch_run(mode, root, idle_s, arrivals):
+    """mode 로 메인 루프를 돌리며 (한가할 때 초당 깨어남, 지연 ms 목록)"""
+    lat, loops = [], [0]
+    done = threading.Event()
+
+    def producer():
+        time.sleep(idle_s)
+        for gap, burst in arrivals:
+            time.sleep(gap)
+            for _ in range(burst):
+                t0 = time.perf_counter()
+                task = lambda t0=t0: lat.append((time.perf_counter() - t0) * 1000)
+                if mode == "v1.0":
+                    legacy.put(task)
+                else:
+                    pa._queue_task(task, pa.PRI_NORMAL)
+        time.sleep(0.1)
+        done.set()
+
+    legacy = queue.Queue()
+    saved = pa._root, pa._root_sweeps, pa._main_queue, dict(pa._dispatch_stats)
+    pa._main_queue = pa._TaskQueue()
+    threading.Thread(target=producer, daemon=True).start()
+    t_idle = time.monotonic() + idle_s
+    idle_loops = None
+    try:
+        if mode == "v1.0":  # 예전 루프: 20ms 마다 작업 하나 + update
+            while not done.is_set():
+                loops[0] += 1
+                try: legacy.get_nowait()()
+                except queue.Empty: pass
+                if root is not None:
+                    root.update()
+                time.sleep(0.02)
+                if idle_loops is None and time.monotonic() >= t_idle:
+                    idle_loops = loops[0]
+        elif root is not None:
+            pa._start_dispatcher(root)
+            w0 = pa._dispatch_stats["wakeups"]
+            def check():
+                nonlocal idle_loops
+                if idle_loops is None and time.monotonic() >= t_idle:
+                    idle_loops = pa._dispatch_stats["wakeups"] - w0
+                if done.is_set():
+                    root.quit()
+                else:
+                    root.after(50, check)
+            root.after(50, check)
+            root.mainloop()
+        else:
+            fake = _ThreadWakeRoot()
+            pa._root, pa._root_sweeps = fake, False
+            w0 = pa._dispatch_stats["wakeups"]
+            while not done.is_set():
+                if fake.wake.wait(0.05):
+                    fake.wake.clear()
+                    pa._drain()
+                if idle_loops is None and time.monotonic() >= t_idle:
+                    idle_loops = pa._dispatch_stats["wakeups"] - w0
+    finally:
+        pa._root, pa._root_sweeps, pa._main_queue = saved[:3]
+        pa._dispatch_stats.update(saved[3])
+    return ((idle_loops or 0) / idle_s if idle_s else None), lat
+
+
+def bench_dispatch(idle_s=2.0, n=100):
+    """메인 스레드 작업 큐: v1.0 의 20ms 주기 루프 vs 이벤트 디스패처
+    한가할 때 초당 깨어남 수와 큐 삽입 → 실행 지연 (띄엄띄엄 / 20개씩 몰아서).
+    디스플레이가 없으면 Tk 이벤트 대신 스레드 이벤트로 깨우는 모형 (Tk 자체 비용은 빠짐)
+    """
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        kind = "Tk"
+    except tk.TclError:
+        root, kind = None, "모형"
+    rng = random.Random(7)
+    # v1.0 은 20ms 에 작업 하나라, 그보다 촘촘하면 지연이 끝없이 쌓인다 (여기선 그 아래로)
+    cases = {"띄엄띄엄": [(rng.uniform(0.02, 0.06), 1) for _ in range(n)],
+             "20개씩": [(0.5, 20) for _ in range(n // 10)]}
+    results = {"loop": kind}
+    try:
+        for mode in ("v1.0", "디스패처"):
+            res = {}
+            for name, arrivals in cases.items():
+                with temp_config():
+                    idle, lat = _dispatch_run(mode, root, idle_s if not res else 0.0, arrivals)
+                if idle is not None:
+                    res["idle_wakeups_per_s"] = round(idle, 1)
+                res[name] = _summary([v / 1000 for v in lat], 1e3)
+            results[mode] = res
+            print(f"  {mode:<6} ({kind})  한가할 때 {res['idle_wakeups_per_s']:5.1f}회/s  " + "  ".join(
+                f"{name} p50 {res[name]['p50']:6.2f} ms p99 {res[name]['p99']:7.2f} ms"
+                for name in cases))
+    finally:
+        if root is not None:
+            root.destroy()
+    return results
+
+
+def bench_popup(n=30):
+    """팝업 첫 프레임까지 걸린 시간: 창 풀 사용/미사용 (디스플레이 필요)"""
+    import tkinter as tk
+    pa._load_ui()
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        print("  (디스플레이 없음 - 건너뜀)")
+        return None
+    root.withdraw()
+    results = {}
+    try:
+        with temp_config():
+            for name, pooled in (("풀 미사용", False), ("풀 사용", True)):
+                pa._config.save({**pa._config.get(), "popup_pool": pooled,
+                                 "popup_duration_ms": 60000})
+                pa._pool.warm(pa._config.get())
+                pa.metrics.hists.pop("popup.first_frame", None)
+                for i in range(n):
+                    pa._create_popup(f"벤치#{i}", "첫 프레임까지 시간 측정")
+                    root.update()
+                ms = pa.metrics.values("popup.first_frame")
+                results[name] = statistics.median(ms)
+                print(f"  {name:<8} 중앙값 {results[name]:6.2f} ms  최대 {max(ms):6.2f} ms")
+                for entry in list(pa._popup_stack):
+                    pa._remove_popup(entry["id"], pa._config.get())
+                pa._pool.clear()
+    finally:
+        root.destroy()
+    return results
+
+
+def bench_avatar(n=3000, senders=60, size=40):
+    """아바타 캐시: 보낸 사람 분포(지프)에서의 적중률, 호출 스레드 시간, 로딩 시간
+    디스플레이가 있으면 팝업 하나당 UI 스레드 시간도 (아바타 없음 / 있음). Pillow 필요
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print("  (Pillow 없음 - 건너뜀)")
+        return None
+    rng = random.Random(5)
+    results = {}
+    with tempfile.TemporaryDirectory() as d:
+        srcs = []
+        for i in range(senders):
+            path = os.path.join(d, f"avatar-{i}.png")
+            Image.effect_noise((256, 256), 40 + i).convert("RGB").save(path)
+            srcs.append(path)
+        stream = rng.choices(srcs, [1 / (i + 1) for i in range(senders)], k=n)
+
+        for budget_kb in (32, 128, 2048):
+            cache = pa._AvatarCache(budget=budget_kb * 1024)
+            pa.metrics.hists.pop("avatar.load", None)
+            get_s = []
+            for src in stream:
+                loaded = threading.Event()
+                t0 = time.perf_counter()
+                data = cache.get(src, size, lambda data: loaded.set())
+                get_s.append(time.perf_counter() - t0)
+                if data is None:  # 다음 알림은 로딩이 끝난 뒤에 온다고 가정
+                    loaded.wait(5)
+            hit = cache.stats["hits"] / n
+            load = pa.metrics.values("avatar.load")
+            results[f"{budget_kb}KB"] = {
+                "hit_rate": round(hit, 3), "get_us": round(statistics.mean(get_s) * 1e6, 2),
+                "load_ms_p50": round(statistics.median(load), 2), "items": len(cache.items)}
+            print(f"  캐시 {budget_kb:5d} KB  적중 {hit:6.1%}  get {statistics.mean(get_s) * 1e6:5.1f} us  "
+                  f"로딩 p50 {statistics.median(load):5.2f} ms  보관 {len(cache.items)}개")
+
+        import tkinter as tk
+        pa._load_ui()
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            print("  (디스플레이 없음 - UI 시간 건너뜀)")
+            return results
+        root.withdraw()
+        try:
+            with temp_config(avatar_size=size, popup_duration_ms=60000):
+                pa._start_dispatcher(root)
+                for name, image in (("아바타 없음", None), ("아바타", srcs[0])):
+                    pa.metrics.hists.pop("popup.first_frame", None)
+                    pa.metrics.hists.pop("avatar.ui", None)
+                    for i in range(30):
+                        pa._create_popup(f"벤치#{i}", "아바타 교체 시간 측정", image=image)
+                        for _ in range(5):
+                            root.update()
+                            time.sleep(0.002)
+                    ui = [a + b for a, b in zip(pa.metrics.values("popup.first_frame"),
+                                                pa.metrics.values("avatar.ui") or [0.0] * 30)]
+                    results[name + " UI ms"] = round(statistics.median(ui), 3)
+                    print(f"  {name:<8} UI 스레드 {statistics.median(ui):6.2f} ms/팝업")
+                    for entry in list(pa._popup_stack):
+                        pa._remove_popup(entry["id"], pa._config.get())
+        finally:
+            root.destroy()
+    return results
+
+
+def bench_render(n=200):
+    """비트맵 모드: 작업 스레드 렌더링 시간 (글꼴/줄바꿈 캐시 비움/채움), PNG 크기
+    디스플레이가 있으면 팝업 하나당 UI 스레드 시간도 (위젯 / 비트맵). Pillow 필요
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("  (Pillow 없음 - 건너뜀)")
+        return None
+    rng = random.Random(9)
+    msgs = [(f"{rng.choice(make_testdb.NAMES)} (#general, My Server)",
+             rng.choice(make_testdb.BODIES)) for _ in range(n)]
+    cfg = dict(pa.DEFAULT_CONFIG)
+    results = {}
+    for name in ("캐시 비움", "캐시 채움"):
+        if name == "캐시 비움":
+            pa._pil_font.cache_clear()
+            pa._wrap_text.cache_clear()
+        ms, size = [], []
+        for title, body in msgs:
+            t0 = time.perf_counter()
+            data = pa._render_popup(title, body, cfg)
+            ms.append((time.perf_counter() - t0) * 1000)
+            size.append(len(data))
+        results[name] = {"ms_p50": round(statistics.median(ms), 3), "ms_max": round(max(ms), 3),
+                         "png_bytes": round(statistics.mean(size))}
+        print(f"  {name:<8} 렌더링 p50 {statistics.median(ms):6.2f} ms  최대 {max(ms):6.2f} ms  "
+              f"PNG {statistics.mean(size):6.0f} B")
+
+    import tkinter as tk
+    pa._load_ui()
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        print("  (디스플레이 없음 - UI 시간 건너뜀)")
+        return results
+    root.withdraw()
+    try:
+        for mode in ("widget", "bitmap"):
+            with temp_config(render_mode=mode, popup_duration_ms=60000):
+                cfg = pa._config.get()
+                pa.metrics.hists.pop("popup.first_frame", None)
+                for i, (title, body) in enumerate(msgs[:30]):
+                    bitmap = pa._render_popup(title, body, cfg) if mode == "bitmap" else None
+                    pa._create_popup(title, body, bitmap=bitmap)
+                    root.update()
+                ms = pa.metrics.values("popup.first_frame")
+                results[mode + " UI ms"] = round(statistics.median(ms), 3)
+                print(f"  {mode:<8} UI 스레드 {statistics.median(ms):6.2f} ms/팝업")
+                for entry in list(pa._popup_stack):
+                    pa._remove_popup(entry["id"], pa._config.get())
+                pa._pool.clear()
+    finally:
+        root.destroy()
+    return results
+
+
+# ── DB 폴링 시나리오 ──
+# 틱 번호 → 그 틱 직전에 Windows 가 쓴 알림 수
+SCENARIOS = {
+    "trickle": lambda i: 1 if i % 5 == 0 else 0,      # 가끔 한 건씩
+    "burst":   lambda i: 50 if i % 100 == 10 else 0,  # 레이드/단톡 폭주
+    "idle":    lambda i: 0,                           # 게임 중 대부분의 시간
+}
+
+
+def _legacy_tick(path):
+    """v1.0 의 한 틱: DB 전체 복사 + 최근 30행"""
+    pa._read_db("SELECT Id, HandlerId, Payload FROM Notification ORDER BY Id DESC LIMIT 30",
+                path=path)
+
+
+def bench_poll(rows=1000, wal=False, ticks=300, legacy_ticks=5):
+    """시나리오별 폴링 틱 비용 (us), 읽은 행 수, 내보낸 알림 수"""
+    results = {}
+    with tempfile.TemporaryDirectory() as d, temp_config():
+        path = os.path.join(d, "wpndatabase.db")
+        writer = make_testdb.make_db(path, rows, wal)
+        size_mb = sum(os.path.getsize(path + s) for s in ("", "-wal")
+                      if os.path.exists(path + s)) / 1024 / 1024
+        rng = random.Random(1)
+        label = f"{rows}행 {'WAL' if wal else 'journal'} ({size_mb:.1f} MB)"
+        print(f"[폴링] {label}")
+
+        t = timeit.timeit(lambda: _legacy_tick(path), number=legacy_ticks)
+        legacy_us = t / legacy_ticks * 1e6
+        print(f"  {'v1.0 복사 방식':<10} {legacy_us:10.1f} us/틱")
+        results["legacy_tick_us"] = round(legacy_us, 1)
+
+        for name, writes in SCENARIOS.items():
+            emitted = []
+            pipe = pa._Pipeline(lambda t, b, priority=None, stamps=None, image=None: emitted.append(stamps))
+            poller = pa._DbPoller(path, emit=pipe.push)
+            poller.start()
+            copied0 = pa.metrics.counters["poll.bytes_copied"]
+            tick_s, rows_read = [], 0
+            for i in range(ticks):
+                n = writes(i)
+                if n:
+                    make_testdb.append_rows(writer, n, rng)
+                rows0 = pa.metrics.counters["poll.rows"]
+                t0 = time.perf_counter()
+                poller.tick()
+                tick_s.append(time.perf_counter() - t0)
+                rows_read += pa.metrics.counters["poll.rows"] - rows0
+            poller.reader.close()
+            pipe.join()
+            written = sum(writes(i) for i in range(ticks))
+            lat = [(s["parse"] - s["read"]) for s in emitted if s]
+            res = {
+                "tick_us":   _summary(tick_s, 1e6),
+                "written":   written,
+                "rows_read": rows_read,
+                "emitted":   len(emitted),
+                "bytes_copied": pa.metrics.counters["poll.bytes_copied"] - copied0,
+                "read_to_parse_ms": _summary(lat, 1e3),
+            }
+            results[name] = res
+            tu = res["tick_us"]
+            print(f"  {name:<10} p50 {tu['p50']:8.1f} us  p99 {tu['p99']:8.1f} us  "
+                  f"쓴 행 {written:4d} / 읽은 행 {rows_read:4d} / 알림 {len(emitted):4d}")
+        writer.close()
+    return results
+
+
+def bench_dedup(n=1_000_000, window=8):
+    """중복 제거 상태의 메모리: _SeenIds vs v1.0 의 set (Id n 개, window 단위로 순서 뒤섞임)"""
+    rng = random.Random(2)
+    ids = []
+    for base in range(1, n + 1, window):
+        chunk = list(range(base, min(base + window, n + 1)))
+        rng.shuffle(chunk)
+        ids += chunk
+    results = {}
+    for name, make, add in (("v1.0 set", set, lambda s, i: (i not in s, s.add(i))[0]),
+                            ("_SeenIds", pa._SeenIds, lambda s, i: s.add(i))):
+        tracemalloc.start()
+        state = make()
+        new = 0
+        t0 = time.perf_counter()
+        for i in ids:
+            new += add(state, i)
+        elapsed = time.perf_counter() - t0
+        cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"new": new, "peak_kb": round(peak / 1024, 1),
+                         "ns_per_id": round(elapsed / len(ids) * 1e9, 1)}
+        print(f"  {name:<10} 새 Id {new}  메모리 최대 {peak / 1024:10.1f} KB  "
+              f"{elapsed / len(ids) * 1e9:6.1f} ns/Id")
+    return results
+
+
+def bench_rewrite(n=300):
+    """재기록 재생: 새 Id 로 다시 써진 같은 알림이 팝업으로 또 나가지 않는지
+
+    1) 새 알림 n 개  2) 그대로 새 Id 로 재기록  3) 같은 본문이지만 Tag 가 다른 새 알림
+    4) 중복 창(dedup_window_s)이 지난 뒤 재기록 → 다시 표시
+    """
+    apps = ["discord", "slack", "teams", "telegram"]
+    results = {}
+    with tempfile.TemporaryDirectory() as d, temp_config(watch_apps=apps, dedup_window_s=0.5):
+        path = os.path.join(d, "wpndatabase.db")
+        writer = make_testdb.make_db(path, 100)
+        out = []
+        pipe = pa._Pipeline(lambda t, b, priority=None, stamps=None, image=None: out.append(b))
+        poller = pa._DbPoller(path, emit=pipe.push)
+        poller.start()
+
+        def replay(write):
+            before = len(out)
+            write()
+            while True:  # 한 틱에 batch 행까지라 남은 행이 없을 때까지
+                poller.reader.invalidate()
+                if not poller.tick():
+                    break
+            pipe.join()
+            return len(out) - before
+
+        rng = random.Random(4)
+        first = writer.execute("SELECT MAX(Id) FROM Notification").fetchone()[0] + 1
+        new = replay(lambda: make_testdb.append_rows(writer, n, rng))
+        ids = range(first, first + n)
+        results["new"] = new
+        results["rewritten"] = replay(lambda: make_testdb.rewrite_rows(writer, ids))
+        results["same_text_new_tag"] = replay(lambda: make_testdb.append_rows(writer, n, random.Random(4)))
+        time.sleep(0.6)
+        results["rewritten_after_window"] = replay(lambda: make_testdb.rewrite_rows(writer, ids))
+        results["suppressed"] = pipe.dedup.stats["suppressed"]
+        writer.close()
+        poller.reader.close()
+
+    ok = (results["rewritten"] == 0 and results["same_text_new_tag"] == new
+          and results["rewritten_after_window"] == new)
+    print(f"  새 알림 {new} → 재기록 {results['rewritten']} / Tag 다른 같은 본문 "
+          f"{results['same_text_new_tag']} / 창 지난 뒤 재기록 {results['rewritten_after_window']}"
+          f"  (억제 {results['suppressed']})  {'[OK]' if ok else '[불일치]'}")
+
+    dedup = pa._ContentDedup(window=10.0)
+    items = [pa._Item("db", "discord", title=f"보낸사람{i % 50}", body=f"메시지 {i}", tag=f"t{i}")
+             for i in range(20000)]
+    t = timeit.timeit(lambda: [dedup.seen(it, 0.0) for it in items], number=1)
+    results["ns_per_check"] = round(t / len(items) * 1e9)
+    results["keys"] = len(dedup.keys)
+    print(f"  내용 해시 확인 {results['ns_per_check']} ns/건, 기억 {results['keys']}개 (상한 {dedup.max_keys})")
+    results["ok"] = ok
+    return results
+
+
+def bench_enqueue(n=2000):
+    """폴러 → 묶기 단계 → 메인 스레드 큐 까지의 지연 (ms)"""
+    results = {}
+    with temp_config(rate_per_s=1000.0, rate_burst=1000, coalesce_ms=1000, max_popups=1000):
+        got = []
+        def sink(t, b, group=None, priority=None, stamps=None, image=None, update=False):
+            if stamps:  # 갱신(stamps 없음)은 제외하고 새 팝업만
+                got.append(time.perf_counter() - stamps["t"])
+        co = pa._Coalescer(sink=sink)
+        for i in range(n):
+            co.submit(f"보낸사람{i % 200}", "본문", stamps={"t": time.perf_counter()})
+        deadline = time.time() + 5
+        while len(got) < min(n, 200) and time.time() < deadline:
+            time.sleep(0.01)
+        results["coalesce_ms"] = _summary(got, 1e3)
+        results["coalesce"] = dict(co.stats)
+
+        q = pa._TaskQueue()
+        t0 = time.perf_counter()
+        for i in range(n):
+            q.put(lambda: None, pa.PRI_NORMAL, droppable=True)
+        waits = []
+        while not q.empty():
+            t_put, fn, _ = q.get_nowait()
+            waits.append(time.perf_counter() - t_put)
+        results["queue_ops_per_s"] = round(2 * n / (time.perf_counter() - t0))
+        results["queue"] = dict(q.stats)
+    c = results["coalesce_ms"]
+    print(f"  묶기 단계  p50 {c['p50']:.2f} ms  p99 {c['p99']:.2f} ms  "
+          f"(알림 {n} → 팝업 {results['coalesce']['popups']})")
+    print(f"  작업 큐    {results['queue_ops_per_s']:,} ops/s  버림 {results['queue']}")
+    return results
+
+
+def bench_pipeline(n=20000, rate=5000):
+    """푸시 소스 부하: UDP/HTTP 로 보낸 알림 → 파이프라인 → emit 까지 처리량과 지연
+
+    알림 본문에 보낸 시각을 넣어 두고 emit 에서 꺼내 지연을 잰다.
+    """
+    import urllib.request
+    results = {}
+    with temp_config():
+        for kind in ("udp", "http"):
+            count = n if kind == "udp" else n // 10  # HTTP 는 요청마다 연결이라 느림
+            got, done = [], threading.Event()
+            def emit(title, body, priority=None, stamps=None, image=None):
+                got.append(time.time() - float(body))
+                if len(got) >= count:
+                    done.set()
+            pipe = pa._Pipeline(emit, maxsize=256)
+            if kind == "udp":
+                src = pa._UdpSource("127.0.0.1", 0)
+                out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                send = lambda data: out.sendto(data, ("127.0.0.1", src.port))
+            else:
+                src = pa._HttpSource("127.0.0.1", 0)
+                url = f"http://127.0.0.1:{src.port}/notify"
+                send = lambda data: urllib.request.urlopen(
+                    urllib.request.Request(url, data, method="POST"), timeout=5).close()
+            pipe.add_source(src)
+            t0 = time.perf_counter()
+            for i in range(count):
+                send(json.dumps({"title": f"봇{i % 20}", "body": repr(time.time())}).encode())
+                if rate and i % 100 == 99:  # 초당 rate 개를 넘지 않게
+                    ahead = (i + 1) / rate - (time.perf_counter() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            done.wait(10)
+            elapsed = time.perf_counter() - t0
+            src.close()
+            st = pipe.stats()
+            res = {"sent": count, "received": len(got), "msgs_per_s": round(len(got) / elapsed),
+                   "latency_ms": _summary(got, 1e3), "dropped": st["filter.dropped"]}
+            results[kind] = res
+            lat = res["latency_ms"]
+            print(f"  {kind:<5} {len(got):6d}/{count:<6d} {res['msgs_per_s']:>7,} 건/s  "
+                  f"p50 {lat.get('p50', 0):6.2f} ms  p99 {lat.get('p99', 0):6.2f} ms  "
+                  f"큐 넘침 {res['dropped']}")
+    return results
+
+
+def bench_history(n=100_000, reps=20):
+    """알림 기록: n 건 저장 속도와 검색/한 화면 읽기 지연 (FTS5 / LIKE)"""
+    rng = random.Random(3)
+    results = {}
+    for fts in (True, False):
+        with tempfile.TemporaryDirectory() as d:
+            h = pa._History(os.path.join(d, "history.db"), max_rows=n, fts=fts)
+            name = "FTS5" if h.fts else "LIKE"
+            now = time.time()
+            t0 = time.perf_counter()
+            for i in range(n):
+                title = rng.choice(make_testdb.NAMES)
+                if rng.random() < 0.7:
+                    ch, server = rng.choice(make_testdb.CHANNELS)
+                    title += f" (#{ch}, {server})"
+                h.add(title, rng.choice(make_testdb.BODIES), t=now - (n - i) * 20)
+                if i % h.BATCH == h.BATCH - 1:
+                    h.flush()
+            h.flush()
+            insert_s = time.perf_counter() - t0
+            size_mb = sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d)) / 1024 / 1024
+
+            queries = {
+                "전체":        lambda: h.search(),
+                "본문 레이드":  lambda: h.search("레이드"),
+                "보낸 사람":    lambda: h.search(sender="Alice"),
+                "둘 다":       lambda: h.search("게임", "민수"),
+                "최근 하루":    lambda: h.search(since=now - 86400),
+                "링크 clip":    lambda: h.search("clip"),
+            }
+            res = {"insert_per_s": round(n / insert_s), "size_mb": round(size_mb, 1), "query_ms": {}}
+            print(f"  {name}: 저장 {res['insert_per_s']:,} 건/s  ({size_mb:.1f} MB)")
+            for qname, q in queries.items():
+                ms = [timeit.timeit(q, number=1) * 1000 for _ in range(reps)]
+                hits = len(q())
+                res["query_ms"][qname] = round(statistics.median(ms), 2)
+                print(f"    {qname:<8} {statistics.median(ms):8.2f} ms  ({hits:,}건)")
+            ids = h.search()
+            page = lambda: h.rows(ids[50_000:50_020])
+            ms = statistics.median(timeit.timeit(page, number=1) * 1000 for _ in range(reps * 5))
+            res["page_ms"] = round(ms, 3)
+            print(f"    {'한 화면 20줄':<8} {ms:8.3f} ms")
+            results[name] = res
+    return results
+
+
+def bench_relay(n=20000, rate=None):
+    """루프백 릴레이: 보낸 알림 → 받은 쪽 sink 까지 처리량과 지연
+
+    rate 가 None 이면 최대한 빨리, 아니면 초당 rate 개씩 나눠서 보냄.
+    """
+    results = {}
+    for compress in (False, True):
+        got, done = [], threading.Event()
+        def sink(title, body, priority=None, stamps=None):
+            got.append(time.time() - float(body))
+            if len(got) >= n:
+                done.set()
+        rx = pa._RelayReceiver("127.0.0.1", 0, sink=sink)
+        rx.start()
+        tx = pa._RelaySender("127.0.0.1", rx.port, limit=n, compress=compress)
+        t0 = time.perf_counter()
+        for i in range(n):
+            tx.submit(f"보낸사람{i % 50} (#general, My Server)", repr(time.time()), priority=1)
+            if rate and i % 100 == 99:
+                time.sleep(100 / rate)
+        done.wait(30)
+        elapsed = time.perf_counter() - t0
+        rx.close()
+        name = "zlib" if compress else "압축 없음"
+        res = {"msgs_per_s": round(len(got) / elapsed), "latency_ms": _summary(got, 1e3),
+               "bytes_per_msg": round(tx.stats["bytes"] / max(1, tx.stats["sent"]), 1),
+               "frames": tx.stats["frames"], "dropped": tx.stats["dropped"]}
+        results[name] = res
+        lat = res["latency_ms"]
+        print(f"  {name:<8} {res['msgs_per_s']:>9,} 건/s  p50 {lat['p50']:7.2f} ms  "
+              f"p99 {lat['p99']:7.2f} ms  {res['bytes_per_msg']:6.1f} B/건  프레임 {res['frames']}")
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="PeekAlert 벤치마크")
+    ap.add_argument("--rows", default="1000,100000",
+                    help="폴링 벤치용 DB 크기 (쉼표 구분, 예: 1000,100000,1000000)")
+    ap.add_argument("--wal", choices=("off", "on", "both"), default="both")
+    ap.add_argument("--ticks", type=int, default=300)
+    ap.add_argument("--only", default="parse,layout,poll,dedup,enqueue,dispatch,pipeline,relay,history,"
+                                      "avatar,render,popup",
+                    help="실행할 벤치 (쉼표 구분)")
+    ap.add_argument("--json", help="결과를 저장할 JSON 파일")
+    args = ap.parse_args(argv)
+    only = set(args.only.split(","))
+
+    results = {"version": pa.VERSION, "python": sys.version.split()[0],
+               "platform": platform.platform(), "time": time.time()}
+    if "parse" in only:
+        results["parse_us"] = bench_parse()
+    if "layout" in only:
+        print("[배치 계산] 가짜 모니터 3대")
+        results["layout_us"] = bench_layout()
+    if "poll" in only:
+        results["poll"] = {}
+        wals = {"off": [False], "on": [True], "both": [False, True]}[args.wal]
+        for rows in (int(r) for r in args.rows.split(",")):
+            for wal in wals:
+                key = f"{rows}{'_wal' if wal else ''}"
+                results["poll"][key] = bench_poll(rows, wal, args.ticks)
+    if "dedup" in only:
+        print("[중복 제거] Id 1,000,000개")
+        results["dedup"] = bench_dedup()
+    if "dedup" in only:
+        print("[내용 중복 제거] 재기록 재생")
+        results["rewrite"] = bench_rewrite()
+    if "enqueue" in only:
+        print("[큐 지연]")
+        results["enqueue"] = bench_enqueue()
+    if "dispatch" in only:
+        print("[메인 스레드 깨우기] v1.0 20ms 루프 vs 디스패처")
+        results["dispatch"] = bench_dispatch()
+    if "pipeline" in only:
+        print("[파이프라인] 푸시 소스 부하 (초당 5,000건까지)")
+        results["pipeline"] = bench_pipeline()
+    if "relay" in only:
+        print("[릴레이] 루프백 20,000건 (최대 속도 / 초당 2,000건)")
+        results["relay"] = {"max": bench_relay(), "paced": bench_relay(rate=2000)}
+    if "history" in only:
+        print("[기록] 100,000건")
+        results["history"] = bench_history()
+    if "avatar" in only:
+        print("[아바타] 보낸 사람 60명, 알림 3,000건")
+        results["avatar"] = bench_avatar()
+    if "render" in only:
+        print("[비트맵 렌더링] 알림 200건")
+        results["render"] = bench_render()
+    if "popup" in only:
+        print("[팝업] 첫 프레임까지")
+        results["popup_ms"] = bench_popup()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n[OK] 결과 저장: {args.json}")
+    return results
+
+
+if __name__ == "__main__":
+    res = main()
+    if res.get("rewrite") and not res["rewrite"]["ok"]:
+        sys.exit("[불일치] 재기록 재생 결과가 기대와 다름")
@@ -18,7 +18,7 @@ print("  PeekAlert - EXE 빌드")
 print("=" * 50)
 
 # 1. PyInstaller 설치
-run("pip install pyinstaller pystray Pillow -q", "PyInstaller 설치")
+run("pip install pyinstaller -r requirements.txt -q", "PyInstaller 설치")
 
 # 2. 아이콘 생성
 run("python make_icon.py", "아이콘 생성")
@@ -0,0 +1,171 @@
+"""
+PeekAlert 테스트용 알림 DB 생성 스크립트
+Windows 의 wpndatabase.db 와 같은 스키마(Notification / NotificationHandler)로
+가짜 알림 DB 를 만듭니다. 벤치마크(bench.py)와 Windows 없는 환경에서의 확인용.
+
+실행: python make_testdb.py --rows 100000 --wal --out test_wpndatabase.db
+"""
+import argparse, os, random, sqlite3, time
+from xml.sax.saxutils import escape, quoteattr
+
+SCHEMA = """
+CREATE TABLE NotificationHandler (
+    RecordId              INTEGER PRIMARY KEY,
+    PrimaryId             TEXT NOT NULL,
+    HandlerType           TEXT,
+    WNSId                 TEXT,
+    WNFEventName          INTEGER,
+    SystemDataPropertySet BLOB,
+    CreatedTime           INTEGER,
+    ModifiedTime          INTEGER
+);
+CREATE TABLE Notification (
+    "Order"          INTEGER,
+    Id               INTEGER PRIMARY KEY,
+    HandlerId        INTEGER NOT NULL,
+    ActivityId       BLOB,
+    Type             TEXT,
+    Payload          BLOB,
+    Tag              TEXT,
+    "Group"          TEXT,
+    ExpiryTime       INTEGER,
+    ArrivalTime      INTEGER,
+    DataVersion      INTEGER,
+    PayloadType      TEXT,
+    BootId           INTEGER,
+    ExpiresOnReboot  INTEGER
+);
+CREATE INDEX IX_Notification_HandlerId ON Notification (HandlerId);
+"""
+
+# HandlerId → (앱, PrimaryId)
+HANDLERS = [
+    (1, "discord",  "com.squirrel.Discord.Discord"),
+    (2, "slack",    "com.squirrel.slack.slack"),
+    (3, "teams",    "MSTeams_8wekyb3d8bbwe!MSTeams"),
+    (4, "telegram", "TelegramDesktop"),
+    (5, "other",    "Microsoft.Windows.Explorer"),
+    (6, "other",    "Microsoft.WindowsStore_8wekyb3d8bbwe!App"),
+]
+DEFAULT_MIX = {"discord": 60, "slack": 15, "teams": 10, "telegram": 5, "other": 10}
+
+NAMES    = ["Alice", "Bob", "Carol", "민수", "지은", "xX_Sniper_Xx", "Dave", "하늘", "Eve"]
+CHANNELS = [("general", "My Server"), ("raid", "Guild & Co"), ("clips", "Gamers"),
+            ("공지", "스터디"), ("random", "Friends")]
+BODIES   = ["ㅋㅋㅋㅋ", "오늘 9시 레이드 ㄱㄱ", "야 게임하자! 들어와~", "이미지를 보냈습니다.",
+            "@me 이거 봐봐 <3", "brb 5 min", "GG", "\"빨리\" 와 & 준비해",
+            "긴 메시지 " * 30, "https://example.com/clip/12345"]
+
+
+def filetime(t=None):
+    """unix 초 → Windows FILETIME (1601년부터 100ns 단위)"""
+    return int(((time.time() if t is None else t) + 11_644_473_600) * 10_000_000)
+
+
+def toast_xml(rng, app):
+    name = rng.choice(NAMES)
+    if app == "discord" and rng.random() < 0.7:
+        ch, server = rng.choice(CHANNELS)
+        title = f"\u2068{name}\u2069 (#\u2068{ch}\u2069, \u2068{server}\u2069)"
+    else:
+        title = f"\u2068{name}\u2069"
+    body = rng.choice(BODIES)
+    src = rf"C:\Users\user\AppData\Local\Temp\{app}-avatar-{rng.randrange(1 << 24):06x}.png"
+    launch = f"{app}://-/channels/{rng.randrange(10**9)}/{rng.randrange(10**9)}"
+    return (f"<toast launch={quoteattr(launch)} activationType=\"protocol\"><visual>"
+            f"<binding template=\"ToastGeneric\"><text>{escape(title)}</text>"
+            f"<text>{escape(body)}</text>"
+            f"<image placement=\"appLogoOverride\" src={quoteattr(src)} hint-crop=\"circle\"/>"
+            f"</binding></visual></toast>").encode("utf-8")
+
+
+def _handler_picker(rng, mix):
+    by_app = {}
+    for hid, app, _ in HANDLERS:
+        by_app.setdefault(app, []).append(hid)
+    apps = [a for a in mix if a in by_app]
+    weights = [mix[a] for a in apps]
+    def pick():
+        app = rng.choices(apps, weights)[0]
+        return rng.choice(by_app[app]), app
+    return pick
+
+
+def append_rows(con, n, rng=None, mix=None, start_id=None, arrival=None):
+    """알림 n 개 추가 후 커밋. 마지막 Id 반환"""
+    rng = rng or random.Random()
+    pick = _handler_picker(rng, mix or DEFAULT_MIX)
+    if start_id is None:
+        start_id = con.execute("SELECT IFNULL(MAX(Id), 0) + 1 FROM Notification").fetchone()[0]
+    ft = filetime(arrival)
+    rows = []
+    for i in range(n):
+        hid, app = pick()
+        rid = start_id + i
+        rows.append((rid, rid, hid, "toast", toast_xml(rng, app), f"tag{rid}",
+                     f"group{rid % 7}", ft + 7 * 86400 * 10_000_000, ft, 1, "Xml", 1, 0))
+    con.executemany(
+        'INSERT INTO Notification ("Order", Id, HandlerId, Type, Payload, Tag, "Group",'
+        ' ExpiryTime, ArrivalTime, DataVersion, PayloadType, BootId, ExpiresOnReboot)'
+        ' VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)', rows)
+    con.commit()
+    return start_id + n - 1
+
+
+def rewrite_rows(con, ids, arrival=None):
+    """기존 행을 새 Id 로 다시 기록 (Payload/Tag/Group 그대로). 마지막 Id 반환
+
+    Windows 가 알림을 갱신하거나 다시 넣을 때, 앱이 같은 토스트를 다시 보낼 때의 모양.
+    """
+    ids = list(ids)
+    start_id = con.execute("SELECT IFNULL(MAX(Id), 0) + 1 FROM Notification").fetchone()[0]
+    ft = filetime(arrival)
+    rows = con.execute(
+        'SELECT HandlerId, Type, Payload, Tag, "Group", ExpiryTime, DataVersion, PayloadType,'
+        ' BootId, ExpiresOnReboot FROM Notification WHERE Id IN (%s) ORDER BY Id'
+        % ",".join("?" * len(ids)), ids).fetchall()
+    con.executemany(
+        'INSERT INTO Notification ("Order", Id, HandlerId, Type, Payload, Tag, "Group",'
+        ' ExpiryTime, ArrivalTime, DataVersion, PayloadType, BootId, ExpiresOnReboot)'
+        ' VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)',
+        [(start_id + i, start_id + i, *r[:5], r[5], ft, r[6] + 1, *r[7:])
+         for i, r in enumerate(rows)])
+    con.commit()
+    return start_id + len(rows) - 1
+
+
+def make_db(path, rows=1000, wal=False, mix=None, seed=0):
+    """path 에 가짜 wpndatabase.db 생성. 열린 연결을 돌려준다 (이어서 쓰기용)"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+    con = sqlite3.connect(path)
+    if wal:
+        con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(SCHEMA)
+    now = filetime()
+    con.executemany(
+        "INSERT INTO NotificationHandler (RecordId, PrimaryId, HandlerType, CreatedTime, ModifiedTime)"
+        " VALUES (?,?,?,?,?)", [(hid, pid, "app:desktop", now, now) for hid, _, pid in HANDLERS])
+    rng = random.Random(seed)
+    done = 0
+    while done < rows:
+        n = min(10_000, rows - done)
+        append_rows(con, n, rng, mix, start_id=done + 1,
+                    arrival=time.time() - (rows - done) * 0.5)
+        done += n
+    return con
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="가짜 wpndatabase.db 생성")
+    ap.add_argument("--out",  default="test_wpndatabase.db")
+    ap.add_argument("--rows", type=int, default=1000)
+    ap.add_argument("--wal",  action="store_true", help="WAL 모드로 생성")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    make_db(args.out, args.rows, args.wal, seed=args.seed).close()
+    size_mb = os.path.getsize(args.out) / 1024 / 1024
+    print(f"[OK] {args.out} 생성 ({args.rows}행, {size_mb:.1f} MB, "
+          f"{time.perf_counter() - t0:.1f}초)")
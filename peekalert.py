@@ -2,31 +2,86 @@
 PeekAlert v1.0
 Discord 알림 → 서브모니터 팝업
 트레이 아이콘 우클릭 → 설정/종료
+
+처음 한 번: python peekalert.py --install-deps   (pystray, Pillow 설치)
+시작 시간 확인: python peekalert.py --startup-report
+누수 확인:     python peekalert.py --diagnostics   (peekalert_diag.log)
 """
 
-import sys, os, subprocess, threading, time, json, queue
-import sqlite3, shutil, tempfile
+import time
+_T0 = time.perf_counter()  # 시작 보고의 기준 시각
+import sys, os, threading, json, queue, collections
+import re, html, functools, copy, heapq, contextlib, math
+import socket, struct, zlib
+import sqlite3, shutil, tempfile, csv
 import xml.etree.ElementTree as ET
-import ctypes, ctypes.wintypes as wt
-
-# ── 패키지 자동 설치 ──────────────────────────
-def _pip(pkg):
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", pkg, "-q"],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-    )
 
-print("패키지 확인 중...")
-try:    import pystray
-except: print("설치 중: pystray"); _pip("pystray"); import pystray
-try:    from PIL import Image, ImageDraw
-except: print("설치 중: Pillow");  _pip("Pillow");  from PIL import Image, ImageDraw
-import tkinter as tk
-from tkinter import ttk, colorchooser
-print("패키지 OK\n")
+# ── 시작 보고 / 지연 로딩 ──────────────────────
+# 감시는 표준 라이브러리만으로 바로 시작하고, 화면/트레이 패키지는 나중에 불러온다.
+_startup = {}          # 단계 → 시작 후 ms
+_startup_imports = {}  # 지연 로딩한 모듈 → 걸린 ms
+
+def _mark(name):
+    _startup.setdefault(name, (time.perf_counter() - _T0) * 1000)
+
+@contextlib.contextmanager
+def _timed_import(name):
+    t0 = time.perf_counter()
+    yield
+    _startup_imports[name] = (time.perf_counter() - t0) * 1000
+
+tk = ttk = colorchooser = None  # _load_ui() 후 사용
+pystray = Image = None          # _load_tray() 후 사용
+
+def _load_ui():
+    """tkinter 로드 (Tk 를 만들 메인 스레드에서)"""
+    global tk, ttk, colorchooser
+    if tk is None:
+        with _timed_import("tkinter"):
+            import tkinter as tk
+            from tkinter import ttk, colorchooser
+
+def _load_tray():
+    """pystray / Pillow 로드 (트레이 스레드에서)"""
+    global pystray, Image
+    if pystray is None:
+        with _timed_import("pystray"):
+            import pystray
+        with _timed_import("PIL"):
+            from PIL import Image
+
+def _startup_report():
+    """-X importtime 처럼 단계별 시점을 표로"""
+    lines = ["[시작 보고] 프로세스 시작 기준 (인터프리터 기동 제외)",
+             "  시점 ms | 구간 ms | 단계"]
+    prev = 0.0
+    for name, at in sorted(_startup.items(), key=lambda kv: kv[1]):
+        lines.append(f"  {at:7.1f} | {at - prev:7.1f} | {name}")
+        prev = at
+    for name, ms in _startup_imports.items():
+        lines.append(f"          | {ms:7.1f} |   import {name}")
+    return "\n".join(lines)
+
+def _pip(*pkgs):
+    import subprocess
+    subprocess.check_call([sys.executable, "-m", "pip", "install", *pkgs, "-q"])
+
+def install_deps():
+    """트레이/아이콘에 필요한 패키지 설치 (처음 한 번만)"""
+    req = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")
+    print("패키지 설치 중...")
+    _pip("-r", req) if os.path.exists(req) else _pip("pystray", "Pillow")
+    print("[OK] 패키지 설치 완료")
+
+_mark("import")
 
 # ── 설정 ─────────────────────────────────────
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "peekalert_config.json")
+VERSION      = "1.0"
+APP_DIR      = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH  = os.path.join(APP_DIR, "peekalert_config.json")
+METRICS_PATH = os.path.join(APP_DIR, "peekalert_metrics")  # .json / .csv
+HISTORY_PATH = os.path.join(APP_DIR, "peekalert_history.db")
+DIAG_PATH    = os.path.join(APP_DIR, "peekalert_diag.log")
 
 DEFAULT_CONFIG = {
     "monitor_index":     1,
@@ -45,71 +100,901 @@ DEFAULT_CONFIG = {
     "body_color":        "#dcddde",
     "bg_color":          "#36393f",
     "accent_color":      "#5865f2",
+    "avatar_size":       40,     # 보낸 사람 프로필 사진 크기(px), 0 이면 💬 만
+    # widget: Tk 위젯으로 그림 / bitmap: 작업 스레드가 팝업 전체를 이미지 한 장으로 (Pillow 필요)
+    "render_mode":       "widget",
+    # DB 폴링 간격: 알림 직후 poll_min_ms, 조용하면 poll_backoff 배씩 늘려 poll_max_ms 까지
+    # (변경 확인은 PRAGMA data_version 한 번이라 싸다. 예전 고정 1초보다 길게 두면 조용하다가
+    #  오는 첫 알림만 늦어진다)
+    "poll_min_ms":       100,
+    "poll_max_ms":       500,
+    "poll_backoff":      1.5,
+    "verbose":           True,   # 알림마다 콘솔에 한 줄 출력
+    "popup_pool":        True,   # 팝업 창을 파괴하지 않고 재사용
+    "anim_ms":           200,    # 슬라이드/재정렬 애니메이션 길이
+    "anim_easing":       "ease_out",  # linear / ease_out / ease_in_out
+    # 같은 제목 알림은 coalesce_ms 안에 하나의 팝업으로 묶음, 새 팝업은 초당 rate_per_s 개까지
+    "coalesce_ms":       3000,
+    "rate_per_s":        2.0,
+    "rate_burst":        3,
+    # 메인 스레드 대기 알림 수 상한과 넘칠 때 버리는 방식 (drop_lowest / drop_oldest)
+    "queue_max":         32,
+    "queue_policy":      "drop_lowest",
+    # 측정값 파일 저장 주기(초, 0 이면 끔)와 형식 (json / csv / both)
+    "metrics_interval_s": 60,
+    "metrics_format":    "json",
+    # 알림 우선순위 규칙 (type: dm / mention / keyword / sender, pattern 은 정규식, dm 은 Discord 만)
+    # 해당하는 규칙 중 가장 높은 priority 사용, 없으면 1. 2 이상이면 속도 제한을 건너뛰고
+    # 화면이 꽉 차 있으면 우선순위 낮은 팝업 자리를 바로 차지한다.
+    "priority_rules":    [
+        {"type": "dm",      "priority": 2},
+        {"type": "mention", "pattern": r"@\S+", "priority": 2},
+    ],
+    # 팝업으로 띄울 앱과, NotificationHandler 행에서 앱을 알아보는 정규식
+    "watch_apps":        ["discord"],
+    "app_patterns":      {
+        "discord":  r"discord",
+        "slack":    r"slack",
+        "teams":    r"teams",
+        "telegram": r"telegram",
+    },
+    # 릴레이: off / send (이 PC 알림을 다른 PC 로) / receive (받아서 팝업). 재시작 후 반영
+    # receive 는 relay_host 에서 대기 (다른 PC 에서 받으려면 "0.0.0.0")
+    "relay_mode":        "off",
+    "relay_host":        "127.0.0.1",
+    "relay_port":        47800,
+    "relay_compress":    True,
+    "relay_buffer":      1000,   # 못 보낸 알림 보관 개수 (넘치면 오래된 것부터 버림)
+    "relay_local":       True,   # send 모드에서도 이 PC 에 팝업 표시
+    # 알림을 받아올 곳: db (Windows 알림 DB) / http / udp / file. 재시작 후 반영
+    # http: POST http://127.0.0.1:47801/notify  {"title": ..., "body": ...}
+    # udp : 같은 JSON 또는 텍스트 (첫 줄 제목, 나머지 본문)
+    # file: tail_path 파일에 추가되는 줄마다 알림 하나
+    "sources":           ["db"],
+    "ingest_host":       "127.0.0.1",
+    "http_port":         47801,
+    "udp_port":          47802,
+    "tail_path":         "",
+    "pipeline_queue":    256,    # 단계 사이 큐 크기
+    "dedup_window_s":    10.0,   # 이 시간 안에 같은 내용의 알림은 한 번만 (0 이면 끔)
+    # 지난 알림 기록 (트레이 → 기록). 보관 기간(일)과 최대 개수
+    "history":           True,
+    "history_days":      30,
+    "history_max":       100000,
+    # 진단 모드 (--diagnostics 로도 켬): diag_interval_s 마다 메모리/Tk 위젯/after/큐 상태를
+    # peekalert_diag.log 에 기록. diag_profile 이면 폴링/UI 스레드 샘플링 프로파일도.
+    # 최근 diag_alarm_samples 번 계속 늘면서 RSS 가 diag_alarm_rss_mb 이상,
+    # 또는 위젯이 diag_alarm_widgets 개 이상 늘었으면 경고
+    "diagnostics":       False,
+    "diag_interval_s":   60,
+    "diag_profile":      False,
+    "diag_alarm_samples": 5,
+    "diag_alarm_rss_mb": 20,
+    "diag_alarm_widgets": 50,
 }
 
-def load_config():
-    if os.path.exists(CONFIG_PATH):
+class _ConfigStore:
+    """프로세스 전체가 공유하는 설정
+
+    파일은 처음 한 번, 그리고 수정시각이 바뀌었을 때(check)만 다시 읽는다.
+    get() 이 돌려주는 dict 는 공유 객체이므로 고치지 말 것.
+    save() 는 메모리에 바로 반영하고 구독자에게 알린 뒤, 파일 쓰기는
+    save_delay 초 모아서 임시 파일 → rename 으로 원자적으로 한다.
+    """
+    def __init__(self, path, defaults, save_delay=0.5):
+        self.path       = path
+        self.defaults   = defaults
+        self.save_delay = save_delay
+        self._lock  = threading.RLock()
+        self._cfg   = None
+        self._mtime = None
+        self._timer = None
+        self._subs  = []
+
+    def _validate(self, raw):
+        """DEFAULT_CONFIG 의 타입에 맞추고, 안 맞는 값은 기본값으로"""
+        cfg = dict(raw)  # 모르는 키는 그대로 둔다
+        for key, default in self.defaults.items():
+            if key not in raw:
+                cfg[key] = copy.deepcopy(default)
+                continue
+            v = raw[key]
+            try:
+                if isinstance(default, bool):    ok = isinstance(v, bool)
+                elif isinstance(default, int):   v, ok = int(v), not isinstance(v, bool)
+                elif isinstance(default, float): v, ok = float(v), not isinstance(v, bool)
+                elif isinstance(default, str):   ok = isinstance(v, str)
+                elif isinstance(default, list):  ok = isinstance(v, list)
+                elif isinstance(default, dict):  ok = isinstance(v, dict)
+                else:                            ok = True
+            except (TypeError, ValueError):
+                ok = False
+            if not ok:
+                print(f"[설정] {key}={raw[key]!r} 무시 → 기본값 {default!r}")
+                v = copy.deepcopy(default)
+            cfg[key] = v
+        return cfg
+
+    def _read(self):
         try:
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                cfg = DEFAULT_CONFIG.copy()
-                cfg.update(json.load(f))
-                return cfg
-        except Exception:
-            pass
-    return DEFAULT_CONFIG.copy()
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self._validate({}), None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return self._validate(json.load(f)), mtime
+        except (OSError, ValueError) as e:
+            print(f"[설정] 읽기 실패: {e}")
+            return self._validate({}), mtime
+
+    def get(self):
+        cfg = self._cfg
+        if cfg is None:
+            with self._lock:
+                if self._cfg is None:
+                    self._cfg, self._mtime = self._read()
+                cfg = self._cfg
+        return cfg
+
+    def subscribe(self, fn):
+        """fn(cfg, 바뀐 키 set) — 바꾼 쪽 스레드에서 호출된다"""
+        self._subs.append(fn)
+
+    def _set(self, cfg):
+        old, self._cfg = self._cfg or {}, cfg
+        changed = {k for k in cfg.keys() | old.keys() if cfg.get(k) != old.get(k)}
+        if changed:
+            for fn in list(self._subs):
+                try: fn(cfg, changed)
+                except Exception as e: print(f"[설정] 구독자 오류: {e!r}")
+
+    def check(self):
+        """파일이 밖에서 바뀌었으면 다시 읽는다 (stat 한 번)"""
+        try: mtime = os.stat(self.path).st_mtime_ns
+        except OSError: mtime = None
+        with self._lock:
+            if self._cfg is not None and (mtime == self._mtime or self._timer):
+                return False
+            cfg, self._mtime = self._read()
+            self._set(cfg)
+            return True
+
+    def save(self, cfg):
+        with self._lock:
+            self._set(self._validate(cfg))
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """대기 중인 저장을 지금 파일에 쓴다"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            else:
+                return
+            d = os.path.dirname(self.path) or "."
+            fd, tmp = tempfile.mkstemp(prefix=".peekalert_config.", suffix=".tmp", dir=d)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._cfg, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.path)
+                self._mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                print(f"[설정] 저장 실패: {e}")
+                try: os.unlink(tmp)
+                except OSError: pass
 
-def save_config(cfg):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, ensure_ascii=False, indent=2)
+_config = _ConfigStore(CONFIG_PATH, DEFAULT_CONFIG)
 
-# ── 메인 스레드 큐 ────────────────────────────
-_main_queue = queue.Queue()
+def save_config(cfg):
+    _config.save(cfg)
+
+# ── 측정 ──────────────────────────────────────
+class _Histogram:
+    """최근 size 개 값으로 p50/p95/p99 계산 (링 버퍼)"""
+    __slots__ = ("values", "count", "total")
+
+    def __init__(self, size=1024):
+        self.values = collections.deque(maxlen=size)
+        self.count  = 0
+        self.total  = 0.0
+
+    def add(self, v):
+        self.values.append(v)
+        self.count += 1
+        self.total += v
+
+    def summary(self):
+        vals = sorted(self.values)
+        if not vals:
+            return {"count": self.count}
+        q = lambda p: round(vals[min(len(vals) - 1, int(p * len(vals)))], 3)
+        return {"count": self.count, "mean": round(self.total / self.count, 3),
+                "p50": q(0.50), "p95": q(0.95), "p99": q(0.99), "max": round(vals[-1], 3)}
+
+class _Metrics:
+    """단계별 지연 히스토그램(ms) + 카운터 + 각 구성요소의 상태값(gauge)"""
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self.started  = time.time()
+        self.hists    = {}
+        self.counters = collections.Counter()
+        self.gauges   = {}  # 이름 → dict 를 돌려주는 함수
+
+    def observe(self, name, ms):
+        with self._lock:
+            h = self.hists.get(name)
+            if h is None:
+                h = self.hists[name] = _Histogram()
+            h.add(ms)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def values(self, name):
+        with self._lock:
+            h = self.hists.get(name)
+            return list(h.values) if h else []
+
+    def snapshot(self):
+        with self._lock:
+            snap = {
+                "version":  VERSION,
+                "time":     round(time.time(), 3),
+                "uptime_s": round(time.time() - self.started, 1),
+                "latency_ms": {k: h.summary() for k, h in sorted(self.hists.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+        gauges = {}
+        for name, fn in self.gauges.items():
+            try: gauges[name] = fn()
+            except Exception as e: gauges[name] = {"error": repr(e)}
+        snap["gauges"] = gauges
+        return snap
+
+    def write(self, base, fmt="json"):
+        """base.json 은 최신 값으로 교체, base.csv 에는 한 줄씩 누적 (긴 형식)"""
+        snap = self.snapshot()
+        if fmt in ("json", "both"):
+            tmp = base + ".json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, base + ".json")
+        if fmt in ("csv", "both"):
+            new = not os.path.exists(base + ".csv")
+            with open(base + ".csv", "a", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                if new:
+                    w.writerow(["time", "version", "metric", "stat", "value"])
+                for name, summ in snap["latency_ms"].items():
+                    for stat, v in summ.items():
+                        w.writerow([snap["time"], VERSION, name, stat, v])
+                for name, v in snap["counters"].items():
+                    w.writerow([snap["time"], VERSION, name, "count", v])
+        return snap
+
+metrics = _Metrics()
+
+# 알림 한 건이 거치는 시각(time.time())들과, 그 사이 구간을 기록할 히스토그램 이름
+_STAGES = (
+    ("arrival", "read",      "stage.db_visible"),   # Windows 가 행 기록 → 폴러가 읽음
+    ("read",    "parse",     "stage.parse"),
+    ("parse",   "enqueue",   "stage.coalesce"),     # 묶기/속도 제한 대기
+    ("enqueue", "mapped",    "stage.ui"),           # 메인 스레드 대기 + 창 표시
+    ("mapped",  "anim_done", "stage.anim"),
+    ("arrival", "mapped",    "e2e.arrival_to_mapped"),
+    ("read",    "mapped",    "e2e.read_to_mapped"),
+)
 
-def _queue_task(fn):
-    _main_queue.put(fn)
+def _record_stages(stamps):
+    for a, b, name in _STAGES:
+        if stamps.get(a) and stamps.get(b):
+            metrics.observe(name, max(0.0, (stamps[b] - stamps[a]) * 1000))
 
-# ── ctypes 모니터 ─────────────────────────────
-user32 = ctypes.windll.user32
+def _metrics_writer():
+    """metrics_interval_s 마다 측정값을 파일로 저장 (별도 스레드)"""
+    while True:
+        cfg = _config.get()
+        interval = cfg["metrics_interval_s"]
+        time.sleep(interval if interval > 0 else 60)
+        if interval > 0:
+            try: metrics.write(METRICS_PATH, cfg["metrics_format"])
+            except OSError as e: print(f"[측정] 저장 실패: {e}")
 
-class MONITORINFO(ctypes.Structure):
-    _fields_ = [
-        ("cbSize",    wt.DWORD),
-        ("rcMonitor", wt.RECT),
-        ("rcWork",    wt.RECT),
-        ("dwFlags",   wt.DWORD),
-    ]
+# ── 메인 스레드 큐 ────────────────────────────
+# 다른 스레드(폴링/트레이)가 넣은 작업을 Tk 메인 루프에서 실행.
+# 작업이 들어오면 가상 이벤트로 메인 루프를 바로 깨우고, 쌓인 작업은 한 번에 처리.
+PRI_LOW, PRI_NORMAL, PRI_HIGH, PRI_CONTROL = 0, 1, 2, 9
+
+class _TaskQueue:
+    """우선순위 작업 큐 (높은 것 먼저, 같으면 먼저 들어온 것 먼저)
+
+    버릴 수 있는 작업(알림 팝업)은 최대 queue_max 개까지만 두고, 넘치면
+    queue_policy 에 따라 drop_oldest(가장 오래된 것) 또는
+    drop_lowest(우선순위가 가장 낮은 것 중 가장 오래된 것)를 버린다.
+    설정 창 등 제어 작업은 버리지 않는다.
+    """
+    def __init__(self):
+        self._heap  = []  # (-priority, seq, 삽입시각, fn, droppable)
+        self._seq   = 0
+        self._lock  = threading.Lock()
+        self.droppable = 0
+        self.stats = {"dropped_oldest": 0, "dropped_lowest": 0, "max_depth": 0}
+
+    def put(self, fn, priority=PRI_CONTROL, droppable=False):
+        cfg = _config.get()
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._heap, (-priority, self._seq, time.perf_counter(), fn, droppable))
+            if droppable:
+                self.droppable += 1
+                if self.droppable > cfg["queue_max"]:
+                    self._drop(cfg["queue_policy"])
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self._heap))
+
+    def _drop(self, policy):
+        items = [(i, it) for i, it in enumerate(self._heap) if it[4]]
+        if policy == "drop_oldest":
+            i, _ = min(items, key=lambda x: x[1][1])
+            self.stats["dropped_oldest"] += 1
+        else:
+            # -priority 가 가장 큰(= 우선순위 가장 낮은) 것 중 seq 가 가장 작은 것
+            i, _ = min(items, key=lambda x: (-x[1][0], x[1][1]))
+            self.stats["dropped_lowest"] += 1
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            heapq.heapify(self._heap)
+        self.droppable -= 1
+
+    def get_nowait(self):
+        """(삽입시각, fn, priority)"""
+        with self._lock:
+            if not self._heap:
+                raise queue.Empty
+            negp, _, t0, fn, droppable = heapq.heappop(self._heap)
+            if droppable:
+                self.droppable -= 1
+            return t0, fn, -negp
+
+    def empty(self):
+        return not self._heap
+
+    def qsize(self):
+        return len(self._heap)
+
+_main_queue = _TaskQueue()
+_root       = None                  # 디스패처 시작 후의 tk.Tk
+_root_sweeps = False                # True 면 이벤트 대신 주기 확인
+_wake_lock  = threading.Lock()
+_wake_sent  = False                 # 깨우기 이벤트가 이미 대기 중인지
+_WAKE_EVENT = "<<PeekAlertWake>>"
+_SWEEP_MS   = 50                    # Tcl 이 스레드 미지원일 때만 쓰는 주기 확인
+
+_dispatch_stats = {
+    "started":    time.monotonic(),
+    "wakeups":    0,                # 디스패처가 깨어난 횟수
+    "tasks":      0,                # 실행한 작업 수
+}
 
-_MonitorEnumProc = ctypes.WINFUNCTYPE(
-    ctypes.c_bool, wt.HMONITOR, wt.HDC,
-    ctypes.POINTER(wt.RECT), wt.LPARAM,
-)
+def _queue_task(fn, priority=PRI_CONTROL, droppable=False):
+    global _wake_sent
+    _main_queue.put(fn, priority, droppable)
+    with _wake_lock:
+        if _wake_sent or _root is None or _root_sweeps:
+            return
+        _wake_sent = True
+    try:
+        _root.event_generate(_WAKE_EVENT, when="tail")
+    except Exception:
+        with _wake_lock:
+            _wake_sent = False
+
+def _drain(event=None):
+    """큐에 쌓인 작업을 한 번에 실행 (메인 스레드)"""
+    global _wake_sent
+    with _wake_lock:
+        _wake_sent = False
+    _dispatch_stats["wakeups"] += 1
+    while True:
+        try: t0, fn, priority = _main_queue.get_nowait()
+        except queue.Empty: break
+        lat = (time.perf_counter() - t0) * 1000
+        metrics.observe("dispatch.wait", lat)  # 큐 삽입 → 실행
+        if PRI_HIGH <= priority < PRI_CONTROL:
+            metrics.observe("dispatch.wait_high", lat)
+        _dispatch_stats["tasks"] += 1
+        try: fn()
+        except Exception as e:
+            print(f"[오류] 메인 스레드 작업: {e!r}")
+
+def _start_dispatcher(root):
+    global _root, _root_sweeps
+    root.bind(_WAKE_EVENT, _drain)
+    # 스레드 미지원 Tcl 이면 다른 스레드에서 Tk 를 부를 수 없으므로 주기 확인으로 대체
+    _root_sweeps = not root.tk.call("info", "exists", "tcl_platform(threaded)")
+    if _root_sweeps:
+        def sweep():
+            if not _main_queue.empty(): _drain()
+            root.after(_SWEEP_MS, sweep)
+        root.after(_SWEEP_MS, sweep)
+    _root = root
+    root.after(0, _drain)  # 시작 전에 쌓인 작업
+
+def dispatch_stats():
+    """디스패처 통계: 초당 깨어남, 실행한 작업 수, 큐 상태 (대기 지연은 metrics 의 dispatch.*)"""
+    st = _dispatch_stats
+    return {
+        "wakeups_per_s": round(st["wakeups"] / max(1e-9, time.monotonic() - st["started"]), 3),
+        "tasks":         st["tasks"],
+        "queue_depth":   _main_queue.qsize(),
+        **_main_queue.stats,
+    }
+
+metrics.gauge("dispatch", dispatch_stats)
+
+# ── 모니터 ────────────────────────────────────
+# 백엔드는 monitors() → [(left, top, right, bottom, is_primary), ...] (작업 영역)
+# 와 signature() (모니터 구성이 바뀌면 달라지는 값) 두 가지만 제공하면 된다.
+class Win32Displays:
+    """EnumDisplayMonitors 로 모니터 작업 영역 조회"""
+    def __init__(self):
+        import ctypes, ctypes.wintypes as wt
+        self.user32 = ctypes.windll.user32
+
+        class MONITORINFO(ctypes.Structure):
+            _fields_ = [
+                ("cbSize",    wt.DWORD),
+                ("rcMonitor", wt.RECT),
+                ("rcWork",    wt.RECT),
+                ("dwFlags",   wt.DWORD),
+            ]
+        self._info_t = MONITORINFO
+        self._proc_t = ctypes.WINFUNCTYPE(
+            ctypes.c_bool, wt.HMONITOR, wt.HDC,
+            ctypes.POINTER(wt.RECT), wt.LPARAM,
+        )
 
-def _enum_monitors():
-    result = []
-    def cb(hMon, hdc, lpRect, data):
-        info = MONITORINFO()
-        info.cbSize = ctypes.sizeof(MONITORINFO)
-        user32.GetMonitorInfoW(hMon, ctypes.byref(info))
-        r = info.rcWork
-        result.append((r.left, r.top, r.right, r.bottom, bool(info.dwFlags & 1)))
-        return True
-    user32.EnumDisplayMonitors(None, None, _MonitorEnumProc(cb), 0)
-    primary = [m for m in result if m[4]]
-    others  = [m for m in result if not m[4]]
-    return primary + others
+    def monitors(self):
+        import ctypes
+        result = []
+        def cb(hMon, hdc, lpRect, data):
+            info = self._info_t()
+            info.cbSize = ctypes.sizeof(self._info_t)
+            self.user32.GetMonitorInfoW(hMon, ctypes.byref(info))
+            r = info.rcWork
+            result.append((r.left, r.top, r.right, r.bottom, bool(info.dwFlags & 1)))
+            return True
+        self.user32.EnumDisplayMonitors(None, None, self._proc_t(cb), 0)
+        return result
+
+    def signature(self):
+        # 모니터 수 + 가상 화면 영역 (열거 없이 GetSystemMetrics 만)
+        gsm = self.user32.GetSystemMetrics
+        return tuple(gsm(i) for i in (80, 76, 77, 78, 79))
+
+class FakeDisplays:
+    """테스트/벤치마크용 가짜 모니터 (Windows 없이 배치 계산 확인)"""
+    def __init__(self, monitors=((0, 0, 1920, 1040, True), (1920, 0, 3840, 1040, False))):
+        self.set_monitors(monitors)
+        self.calls = 0  # monitors() 호출 수 (캐시 확인용)
+
+    def set_monitors(self, monitors):
+        self._monitors = [tuple(m) for m in monitors]
+
+    def monitors(self):
+        self.calls += 1
+        return list(self._monitors)
+
+    def signature(self):
+        return tuple(self._monitors)
+
+class _DisplayService:
+    """모니터 목록 캐시
+
+    ttl 초마다 백엔드 signature() 만 확인하고, 바뀌었거나 refresh 초가 지났거나
+    invalidate() 된 경우에만 전체 열거를 다시 한다.
+    """
+    def __init__(self, backend=None, ttl=2.0, refresh=60.0):
+        self.backend = backend
+        self.ttl, self.refresh = ttl, refresh
+        self._mons    = None
+        self._sig     = None
+        self._checked = self._loaded = 0.0
+
+    def set_backend(self, backend):
+        self.backend = backend
+        self.invalidate()
+
+    def invalidate(self):
+        self._mons = None
+
+    def monitors(self):
+        now = time.monotonic()
+        if self._mons is not None and now - self._checked < self.ttl:
+            return self._mons
+        if self.backend is None:
+            self.backend = Win32Displays() if sys.platform == "win32" else FakeDisplays()
+        sig = self.backend.signature()
+        if self._mons is None or sig != self._sig or now - self._loaded >= self.refresh:
+            mons = self.backend.monitors()
+            self._mons = ([m for m in mons if m[4]] + [m for m in mons if not m[4]])
+            self._sig, self._loaded = sig, now
+        self._checked = now
+        return self._mons
+
+    def work_area(self, index):
+        mons = self.monitors()
+        if not mons: return (0, 0, 1920, 1040)
+        l, t, r, b, _ = mons[min(index, len(mons)-1)]
+        return (l, t, r, b)
+
+    def count(self):
+        return len(self.monitors())
+
+displays = _DisplayService()
 
 def get_work_area(index):
-    mons = _enum_monitors()
-    if not mons: return (0, 0, 1920, 1040)
-    l, t, r, b, _ = mons[min(index, len(mons)-1)]
-    return (l, t, r, b)
+    return displays.work_area(index)
 
 def count_monitors():
-    return len(_enum_monitors())
+    return displays.count()
+
+
+# ── 애니메이션 ─────────────────────────────────
+EASINGS = {
+    "linear":      lambda p: p,
+    "ease_out":    lambda p: 1 - (1 - p) ** 3,
+    "ease_in_out": lambda p: 4 * p ** 3 if p < 0.5 else 1 - (-2 * p + 2) ** 3 / 2,
+}
+
+class _Animator:
+    """모든 팝업 이동을 타이머 하나로 처리 (프레임마다 한 번 tick)
+
+    위치는 시작 후 경과 시간으로 계산하므로 tick 이 늦으면 중간 프레임은
+    건너뛰고 바로 지금 있어야 할 위치로 간다. 한 프레임 안에서 예산(FRAME_MS)을
+    넘기면 나머지 창은 다음 프레임으로 미룬다.
+    """
+    FRAME_MS = 16
+
+    def __init__(self):
+        self.anims    = {}    # win → 애니메이션 정보 dict
+        self.after_id = None
+        self._last    = None  # 마지막 tick 시각
+        self._burst   = None  # 애니메이션이 시작된 시각
+        # tick 처리 시간은 anim.frame, 쉬지 않고 애니메이션한 구간 길이는 anim.burst (metrics)
+        self.stats = {
+            "frames":   0,
+            "skipped":  0,     # 늦게 와서 건너뛴 프레임 수
+            "deferred": 0,     # 예산 초과로 다음 프레임으로 미룬 창 수
+        }
+
+    def position(self, win):
+        """애니메이션 중이면 현재 (x, y), 아니면 None"""
+        a = self.anims.get(win)
+        return a["cur"] if a else None
+
+    def move(self, win, start, end, size, duration_ms, easing="ease_out",
+             done=None, keep_done=False):
+        """win 을 start → end 로 이동. 끝나면 done() 호출"""
+        old = self.anims.get(win)
+        if keep_done and old and done is None:
+            done = old["done"]
+        self.anims[win] = {
+            "start": start, "end": end, "cur": start, "size": size,
+            "t0": time.perf_counter(), "dur": max(1, duration_ms) / 1000,
+            "ease": EASINGS.get(easing, EASINGS["ease_out"]), "done": done,
+        }
+        self._schedule()
+
+    def cancel(self, win):
+        self.anims.pop(win, None)
+
+    def _schedule(self, delay=None):
+        if self.after_id is None and self.anims:
+            host = _root or next(iter(self.anims))
+            if self._burst is None:
+                self._burst = self._last = time.perf_counter()
+            self.after_id = host.after(self.FRAME_MS if delay is None else delay, self._tick)
+
+    def _tick(self):
+        self.after_id = None
+        t0 = now = time.perf_counter()
+        st = self.stats
+        st["frames"] += 1
+        st["skipped"] += max(0, int((now - self._last) * 1000 / self.FRAME_MS) - 1)
+        self._last = now
+        budget = t0 + self.FRAME_MS / 1000
+        finished = []
+        for win, a in list(self.anims.items()):
+            if time.perf_counter() > budget:
+                st["deferred"] += 1
+                continue
+            p = min(1.0, (now - a["t0"]) / a["dur"])
+            e = a["ease"](p)
+            (x0, y0), (x1, y1) = a["start"], a["end"]
+            a["cur"] = (round(x0 + (x1 - x0) * e), round(y0 + (y1 - y0) * e))
+            try:
+                win.geometry(f"{a['size'][0]}x{a['size'][1]}+{a['cur'][0]}+{a['cur'][1]}")
+            except tk.TclError:
+                p = 1.0  # 이미 파괴된 창
+            if p >= 1.0:
+                del self.anims[win]
+                finished.append(a["done"])
+        elapsed = time.perf_counter() - t0
+        metrics.observe("anim.frame", elapsed * 1000)
+        for done in finished:
+            if done:
+                try: done()
+                except Exception as e: print(f"[오류] 애니메이션 완료 처리: {e!r}")
+        if self.anims:
+            self._schedule(max(1, self.FRAME_MS - int(elapsed * 1000)))
+        elif self._burst is not None:
+            metrics.observe("anim.burst", (time.perf_counter() - self._burst) * 1000)
+            self._burst = None
+
+_animator = _Animator()
+metrics.gauge("anim", lambda: dict(_animator.stats, active=len(_animator.anims)))
+
+
+# ── 아바타 ─────────────────────────────────────
+def _avatar_path(src):
+    """토스트 image src → 로컬 파일 경로 (file: URI 포함). http 등은 None"""
+    if src.startswith("file:"):
+        from urllib.parse import unquote, urlsplit
+        u = urlsplit(src)
+        path = unquote(u.path)
+        if re.match(r"/[A-Za-z]:", path):  # file:///C:/...
+            path = path[1:]
+        elif u.netloc:                      # file://server/share/...
+            path = "//" + u.netloc + path
+        src = path
+    elif "://" in src:
+        return None
+    return src if os.path.isfile(src) else None
+
+@functools.lru_cache(maxsize=8)
+def _circle_mask(size):
+    from PIL import Image, ImageDraw
+    big = Image.new("L", (size * 4, size * 4), 0)  # 크게 그려서 줄이면 가장자리가 부드러움
+    ImageDraw.Draw(big).ellipse((0, 0, size * 4 - 1, size * 4 - 1), fill=255)
+    return big.resize((size, size), Image.LANCZOS)
+
+def _render_avatar(src, size):
+    """이미지 파일 → size x size 원형 PNG 바이트 (작업 스레드). 못 읽으면 b"" """
+    import io
+    from PIL import Image, ImageChops
+    path = _avatar_path(src)
+    if path is None:
+        return b""
+    with Image.open(path) as im:
+        im.draft("RGB", (size * 2, size * 2))  # JPEG 이면 디코딩부터 작게
+        im = im.convert("RGBA")
+    side = min(im.size)
+    left, top = (im.width - side) // 2, (im.height - side) // 2
+    im = im.resize((size, size), Image.LANCZOS, box=(left, top, left + side, top + side))
+    im.putalpha(ImageChops.multiply(im.getchannel("A"), _circle_mask(size)))
+    buf = io.BytesIO()
+    im.save(buf, "PNG")
+    return buf.getvalue()
+
+class _AvatarCache:
+    """아바타 썸네일 캐시 — 디코딩/축소는 작업 스레드에서, 결과는 PNG 바이트로 보관
+
+    (src, 크기) 별로 budget 바이트까지 LRU 로 보관한다 (못 읽은 src 도 빈 값으로 기억).
+    Tk 이미지는 메인 스레드에서만 만들 수 있어서 여기서는 바이트까지만 준비한다.
+    """
+    OVERHEAD = 100  # 항목당 대략의 부가 메모리 (바이트)
+
+    def __init__(self, budget=2 * 1024 * 1024, workers=2):
+        self.budget  = budget
+        self.workers = workers
+        self.items   = collections.OrderedDict()  # (src, size) → PNG 바이트
+        self.size    = 0
+        self.pending = {}                          # 읽는 중인 키 → 콜백 목록
+        self.lock    = threading.Lock()
+        self.pool    = None
+        self.stats   = {"hits": 0, "misses": 0, "loaded": 0, "failed": 0, "evicted": 0}
+
+    def get(self, src, size, callback):
+        """캐시에 있으면 바이트, 없으면 None 을 돌려주고 읽은 뒤 callback(bytes) (작업 스레드)"""
+        key = (src, size)
+        with self.lock:
+            data = self.items.get(key)
+            if data is not None:
+                self.items.move_to_end(key)
+                self.stats["hits"] += 1
+                return data
+            self.stats["misses"] += 1
+            if key in self.pending:
+                self.pending[key].append(callback)
+                return None
+            self.pending[key] = [callback]
+            if self.pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="avatar")
+        self.pool.submit(self._load, key)
+        return None
+
+    def load(self, src, size, timeout=1.0):
+        """get() 의 기다리는 버전 (작업 스레드용). 못 읽으면 None"""
+        box, loaded = [], threading.Event()
+        data = self.get(src, size, lambda d: (box.append(d), loaded.set()))
+        if data is None and loaded.wait(timeout):
+            data = box[0]
+        return data or None
+
+    def _load(self, key):
+        t0 = time.perf_counter()
+        try:
+            data = _render_avatar(*key)
+        except Exception:  # Pillow 없음, 깨진 이미지, 지워진 임시 파일 등
+            data = b""
+        metrics.observe("avatar.load", (time.perf_counter() - t0) * 1000)
+        with self.lock:
+            callbacks = self.pending.pop(key, [])
+            self.stats["loaded" if data else "failed"] += 1
+            self.items[key] = data
+            self.size += len(data) + self.OVERHEAD
+            while self.size > self.budget and len(self.items) > 1:
+                _, old = self.items.popitem(last=False)
+                self.size -= len(old) + self.OVERHEAD
+                self.stats["evicted"] += 1
+        for cb in callbacks:
+            cb(data)
+
+_avatars = _AvatarCache()
+metrics.gauge("avatars", lambda: dict(_avatars.stats, items=len(_avatars.items),
+                                      bytes=_avatars.size))
+
+# ── 비트맵 렌더링 ─────────────────────────────────
+# render_mode "bitmap": 위젯 모드와 같은 배치(강조 바 4px, 아이콘, wraplength W-90)를
+# Pillow 로 그려서 UI 스레드는 이미지 한 장만 붙인다. Tk 글꼴 크기는 pt → 96 DPI 픽셀.
+_FONT_FILES = {
+    "regular": ("segoeui.ttf", "DejaVuSans.ttf"),
+    "bold":    ("segoeuib.ttf", "DejaVuSans-Bold.ttf"),
+    "emoji":   ("seguiemj.ttf", "DejaVuSans.ttf"),
+}
+
+def _pt_px(pt):
+    return round(pt * 96 / 72)
+
+@functools.lru_cache(maxsize=32)
+def _pil_font(style, px):
+    from PIL import ImageFont
+    for name in _FONT_FILES[style]:
+        try: return ImageFont.truetype(name, px)
+        except OSError: pass
+    try: return ImageFont.load_default(px)
+    except TypeError: return ImageFont.load_default()  # Pillow 10.1 이전
+
+def _fit_chars(font, text, width, suffix=""):
+    """width 안에 들어가는 text 앞부분 글자 수 (이분 탐색)"""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if font.getlength(text[:mid] + suffix) <= width: lo = mid
+        else: hi = mid - 1
+    return lo
+
+@functools.lru_cache(maxsize=1024)
+def _wrap_text(text, style, px, width):
+    """Tk 의 wraplength 처럼 단어 단위로 줄바꿈 (너무 긴 단어는 글자 단위). 줄 튜플"""
+    font, lines = _pil_font(style, px), []
+    for para in text.split("\n"):
+        line = ""
+        for w in para.split(" "):
+            cand = w if not line else line + " " + w
+            if font.getlength(cand) <= width:
+                line = cand
+                continue
+            if line:
+                lines.append(line)
+            while w and font.getlength(w) > width:
+                k = max(1, _fit_chars(font, w, width))
+                lines.append(w[:k])
+                w = w[k:]
+            line = w
+        lines.append(line)
+    return tuple(lines)
+
+def _ellipsize(font, text, width):
+    if font.getlength(text + "…") <= width:
+        return text + "…"
+    return text[:_fit_chars(font, text, width, "…")] + "…"
+
+def _render_popup(title, body, cfg, avatar=None):
+    """팝업 전체 → PNG 바이트 (작업 스레드). 넘치는 줄은 … 로 자름"""
+    import io
+    from PIL import Image, ImageDraw
+    W, H = cfg["popup_width"], cfg["popup_height"]
+    im = Image.new("RGB", (W, H), cfg["bg_color"])
+    d = ImageDraw.Draw(im)
+    d.rectangle((0, 0, 3, H - 1), fill=cfg["accent_color"])
+
+    # 아이콘 (위젯 모드: padx 6, 세로 가운데)
+    x, size = 4 + 6, cfg["avatar_size"]
+    emoji = _pil_font("emoji", _pt_px(cfg["title_size"] + 2))
+    if avatar:
+        a = Image.open(io.BytesIO(avatar))
+        im.paste(a, (x, (H - a.height) // 2), a.convert("RGBA"))
+        icon_w = a.width
+    else:
+        icon_w = size if size > 0 else round(emoji.getlength("  💬"))
+        ew = emoji.getlength("💬")
+        try:
+            d.text((x + (icon_w - ew) / 2 if size > 0 else x + icon_w - ew, H / 2), "💬",
+                   font=emoji, fill=cfg["body_color"], anchor="lm", embedded_color=True)
+        except (ValueError, OSError):
+            pass
 
+    # 제목/본문 (위젯 모드: 프레임 padx 8, pady 6, Label 안쪽 여백 1)
+    tx, wrap, y, bottom = x + icon_w + 8 + 1, W - 90, 6 + 1, H - 6
+    for text, style, px, color in ((title, "bold", _pt_px(cfg["title_size"]), cfg["title_color"]),
+                                   (body, "regular", _pt_px(cfg["body_size"]), cfg["body_color"])):
+        if not text:
+            continue
+        font = _pil_font(style, px)
+        ascent, descent = font.getmetrics()
+        line_h = ascent + descent
+        lines = _wrap_text(text, style, px, wrap)
+        for i, line in enumerate(lines):
+            if y + line_h > bottom:
+                break
+            if i + 1 < len(lines) and y + 2 * line_h > bottom:
+                line = _ellipsize(font, line, wrap)  # 다음 줄이 안 들어가면 여기서 …
+            d.text((tx, y), line, font=font, fill=color)
+            y += line_h
+    buf = io.BytesIO()
+    im.save(buf, "PNG", compress_level=1)
+    return buf.getvalue()
+
+class _Rasterizer:
+    """render_mode "bitmap" 의 작업 스레드 (알림 순서를 지키려고 하나만)"""
+    def __init__(self):
+        self.pool   = None
+        self.failed = False  # Pillow 가 없으면 위젯 모드로
+        self.stats  = {"rendered": 0, "errors": 0}
+
+    def submit(self, title, body, cfg, image, done):
+        """그린 뒤 done(PNG 바이트) — 실패하면 done(None) (위젯 모드로 표시)"""
+        if self.pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.pool = ThreadPoolExecutor(1, thread_name_prefix="raster")
+        self.pool.submit(self._run, title, body, cfg, image, done)
+
+    def _run(self, title, body, cfg, image, done):
+        t0 = time.perf_counter()
+        data = None
+        try:
+            avatar = None
+            if image and cfg["avatar_size"] > 0:
+                avatar = _avatars.load(image, cfg["avatar_size"])
+            data = _render_popup(title, body, cfg, avatar)
+            self.stats["rendered"] += 1
+            metrics.observe("popup.raster", (time.perf_counter() - t0) * 1000)
+        except ImportError:
+            if not self.failed:
+                print("[오류] 비트맵 모드에는 Pillow 필요 → 위젯 모드로 표시")
+            self.failed = True
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"  [렌더링오류] {e}")
+        done(data)
+
+_rasterizer = _Rasterizer()
+metrics.gauge("raster", lambda: dict(_rasterizer.stats, fonts=_pil_font.cache_info().currsize,
+                                     layouts=_wrap_text.cache_info().currsize))
 
 # ── 팝업 스택 ─────────────────────────────────
-# 각 항목: {"id": int, "win": Toplevel, "target_y": int}
+# 각 항목: {"id": int, "win": Toplevel, "target_y": int, "parts": {이름: 위젯}}
 # 메인 스레드에서만 접근 (락 불필요)
 _popup_stack = []
 _pid_counter = [0]
@@ -129,9 +1014,10 @@ def _base_x_y(cfg):
     else:                     bx, by = r - W - m,  b - H - m
     return bx + cfg["offset_x"], by + cfg["offset_y"], l, t, r, b
 
-def _target_y_for_slot(slot, cfg):
+def _target_y_for_slot(slot, cfg, base_y=None):
     """slot 번째 팝업의 목표 y 좌표"""
-    _, base_y, l, t, r, b = _base_x_y(cfg)
+    if base_y is None:
+        base_y = _base_x_y(cfg)[1]
     H = cfg["popup_height"]
     p = cfg["position"]
     if "top" in p:
@@ -141,19 +1027,42 @@ def _target_y_for_slot(slot, cfg):
         # 아래쪽 기준: 위로 쌓임
         return base_y - slot * (H + GAP)
 
-def _restack(cfg):
+def _restack(cfg, animate=True):
     """살아있는 팝업들의 목표 y를 슬롯 번호 기준으로 재계산 후 이동"""
     W = cfg["popup_width"]
     H = cfg["popup_height"]
-    base_x, _, l, t, r, b = _base_x_y(cfg)
+    base_x, base_y, l, t, r, b = _base_x_y(cfg)
 
     for slot, entry in enumerate(_popup_stack):
-        new_y = _target_y_for_slot(slot, cfg)
-        entry["target_y"] = new_y
-        try:
-            entry["win"].geometry(f"{W}x{H}+{base_x}+{new_y}")
-        except Exception:
-            pass
+        new_y = _target_y_for_slot(slot, cfg, base_y)
+        win, end = entry["win"], (base_x, new_y)
+        running = _animator.anims.get(win)
+        cur = running["cur"] if running else (entry.get("x", base_x), entry["target_y"])
+        size = entry.get("size")  # 덮어쓰기 전에 (크기만 바뀐 경우도 다시 그리도록)
+        entry["x"], entry["target_y"] = end
+        entry["size"] = (W, H)
+        if not animate:
+            _animator.cancel(win)
+            try: win.geometry(f"{W}x{H}+{base_x}+{new_y}")
+            except tk.TclError: pass
+        elif running and running["end"] == end and running["size"] == (W, H):
+            continue
+        elif running or cur != end or size != (W, H):
+            # 슬라이드 인 중이던 팝업은 남은 done(자동 닫기 예약)을 그대로 이어받는다
+            _animator.move(win, cur, end, (W, H), cfg["anim_ms"],
+                           cfg["anim_easing"], keep_done=True)
+
+def _release(entry):
+    """팝업 하나를 화면에서 내림 (풀에 돌려주거나 파괴)"""
+    entry["closed"] = True
+    win = entry["win"]
+    _animator.cancel(win)
+    if entry.get("timer"):
+        try: win.after_cancel(entry["timer"])
+        except tk.TclError: pass
+    if entry.get("group") is not None:
+        _coalescer.forget(entry["group"])  # 다음 알림은 새 팝업으로 (토큰 버킷을 거쳐)
+    _pool.release(entry)
 
 def _remove_popup(pid, cfg):
     """pid에 해당하는 팝업 제거 후 나머지 재정렬"""
@@ -161,30 +1070,223 @@ def _remove_popup(pid, cfg):
     new_stack = []
     for entry in _popup_stack:
         if entry["id"] == pid:
-            try: entry["win"].destroy()
-            except: pass
+            _release(entry)
         else:
             new_stack.append(entry)
     _popup_stack = new_stack
     _restack(cfg)
 
-def _create_popup(title, body, preview=False):
-    """메인 스레드에서 호출"""
-    cfg = load_config()
+def _skin_popup(entry, cfg):
+    """팝업 위젯에 현재 설정의 색/폰트/투명도 적용"""
+    parts, W = entry["parts"], cfg["popup_width"]
+    entry["win"].attributes("-alpha", cfg["opacity"])
+    entry["win"].configure(bg=cfg["bg_color"])
+    if "image" in parts:  # 비트맵 모드는 이미지에 다 그려져 있음
+        return
+    parts["bar"].configure(bg=cfg["accent_color"])
+    parts["icon"].configure(bg=cfg["bg_color"], font=("Segoe UI Emoji", cfg["title_size"] + 2))
+    parts["frame"].configure(bg=cfg["bg_color"])
+    parts["title"].configure(bg=cfg["bg_color"], fg=cfg["title_color"],
+                             font=("Segoe UI", cfg["title_size"], "bold"), wraplength=W - 90)
+    parts["body"].configure(bg=cfg["bg_color"], fg=cfg["body_color"],
+                            font=("Segoe UI", cfg["body_size"]), wraplength=W - 90)
+
+def _set_popup_text(entry, title, body):
+    parts = entry["parts"]
+    parts["title"].configure(text=title)
+    parts["body"].configure(text=body)
+    if body:
+        if not parts["body"].winfo_manager():
+            parts["body"].pack(anchor="w")
+    else:
+        parts["body"].pack_forget()
+
+_avatar_blank = {}  # 크기 → 투명 PhotoImage (아바타 자리 잡기, 메인 스레드 전용)
+
+def _set_popup_icon(entry, cfg, src=None):
+    """아이콘 자리에 우선 💬, 아바타가 캐시에 있으면 바로, 없으면 준비되는 대로 교체"""
+    icon, size = entry["parts"]["icon"], cfg["avatar_size"]
+    entry["photo"] = None
+    if size <= 0:
+        icon.configure(image="", text="  💬")
+        return
+    blank = _avatar_blank.get(size)
+    if blank is None:
+        blank = _avatar_blank[size] = tk.PhotoImage(width=size, height=size)
+    # 빈 이미지 위에 💬 → 아바타로 바뀌어도 글자 위치가 움직이지 않음
+    icon.configure(image=blank, text="💬", compound="center")
+    if not src:
+        return
+
+    def show(data):
+        if entry["closed"]:
+            return  # 그 사이 닫힘 (창은 다른 팝업이 쓰고 있을 수 있음)
+        t0 = time.perf_counter()
+        entry["photo"] = photo = tk.PhotoImage(data=data)
+        icon.configure(image=photo, text="")
+        metrics.observe("avatar.ui", (time.perf_counter() - t0) * 1000)
+
+    def ready(data):  # 작업 스레드 → 메인 스레드
+        if data:
+            _queue_task(lambda: show(data), PRI_LOW)
+
+    data = _avatars.get(src, size, ready)
+    if data:
+        show(data)
+
+def _set_popup_bitmap(entry, data):
+    entry["photo"] = photo = tk.PhotoImage(data=data)
+    entry["parts"]["image"].configure(image=photo)
+
+def _build_popup_window(cfg, bitmap=False):
+    """숨겨진 상태의 팝업 창 + 위젯 생성 (bitmap 이면 이미지 Label 하나)"""
+    win = tk.Toplevel()
+    win.withdraw()
+    win.overrideredirect(True)
+    win.attributes("-topmost", True)
+
+    # 레이아웃
+    parts = {}
+    if bitmap:
+        parts["image"] = tk.Label(win, bd=0, highlightthickness=0)
+        parts["image"].pack(fill="both", expand=True)
+    else:
+        _build_popup_widgets(win, parts)
+
+    # 클릭하면 닫기 — 창이 재사용되므로 그때그때 스택에서 찾는다
+    def close(e=None):
+        for entry in _popup_stack:
+            if entry["win"] is win:
+                _remove_popup(entry["id"], _config.get())
+                break
+    win.bind("<Button-1>", close)
+    for w in parts.values():
+        w.bind("<Button-1>", close)
+    return win, parts
+
+def _build_popup_widgets(win, parts):
+    parts["bar"] = tk.Frame(win, width=4)
+    parts["bar"].pack(side="left", fill="y")
+    parts["icon"] = tk.Label(win, text="  💬")
+    parts["icon"].pack(side="left", padx=(6, 0), pady=6)
+    parts["frame"] = frm = tk.Frame(win)
+    frm.pack(side="left", fill="both", expand=True, padx=8, pady=6)
+    parts["title"] = tk.Label(frm, anchor="w", justify="left")
+    parts["title"].pack(anchor="w")
+    parts["body"] = tk.Label(frm, anchor="w", justify="left")
+
+class _PopupPool:
+    """팝업 창 재사용 풀 (최대 max_popups 개)
+
+    닫힌 팝업은 파괴하지 않고 숨겨 두었다가 글자/색만 바꿔 다시 쓴다.
+    크기나 폰트 크기가 바뀌면 풀을 비우고 새로 만든다.
+    """
+    def __init__(self):
+        self.free = []
+        self.key  = None
+        self.stats = {"built": 0, "reused": 0}
+
+    @staticmethod
+    def _key(cfg, bitmap=None):
+        if bitmap is None:
+            bitmap = _bitmap_mode(cfg)
+        return (cfg["popup_width"], cfg["popup_height"], cfg["title_size"], cfg["body_size"],
+                bitmap)
+
+    def _check(self, cfg, bitmap=None):
+        key = self._key(cfg, bitmap)
+        if key != self.key:
+            self.clear()
+            self.key = key
+
+    def clear(self):
+        for win, _ in self.free:
+            try: win.destroy()
+            except tk.TclError: pass
+        self.free.clear()
+
+    def acquire(self, cfg, bitmap=False):
+        """(win, parts) — 풀에 있으면 재사용, 없으면 새로 생성"""
+        self._check(cfg, bitmap)
+        if cfg.get("popup_pool", True) and self.free:
+            self.stats["reused"] += 1
+            return self.free.pop()
+        self.stats["built"] += 1
+        return _build_popup_window(cfg, bitmap)
+
+    def release(self, entry):
+        cfg = _config.get()
+        win = entry["win"]
+        try:
+            if (cfg.get("popup_pool", True) and entry.get("key") == self.key
+                    and len(self.free) < cfg["max_popups"]):
+                win.withdraw()
+                self.free.append((win, entry["parts"]))
+            else:
+                win.destroy()
+        except tk.TclError:
+            pass
+
+    def warm(self, cfg):
+        """시작 시 미리 max_popups 개를 만들어 둔다"""
+        self._check(cfg)
+        if not cfg.get("popup_pool", True):
+            return
+        while len(self.free) < cfg["max_popups"]:
+            self.free.append(_build_popup_window(cfg, self.key[-1]))
+
+_pool = _PopupPool()
+metrics.gauge("popups", lambda: dict(_pool.stats, free=len(_pool.free), shown=len(_popup_stack)))
+
+def _apply_config(cfg):
+    """설정이 바뀌면 떠 있는 팝업에 바로 반영 (메인 스레드)"""
+    excess = max(0, len(_popup_stack) - cfg["max_popups"])
+    for entry in _popup_stack[:excess]:
+        _release(entry)
+    del _popup_stack[:excess]
+    for entry in _popup_stack:
+        try: _skin_popup(entry, cfg)
+        except tk.TclError: pass
+    _restack(cfg)
+    _pool.warm(cfg)
+
+_config.subscribe(lambda cfg, changed: _queue_task(lambda: _apply_config(cfg)))
+
+def _create_popup(title, body, preview=False, group=None, priority=PRI_NORMAL, stamps=None,
+                  image=None, bitmap=None, update=False):
+    """메인 스레드에서 호출. 같은 group 팝업이 떠 있으면 새로 만들지 않고 내용만 갱신
+
+    bitmap 은 비트맵 모드에서 미리 그려 둔 팝업 PNG (있으면 위젯 대신 이미지 한 장).
+    update 는 묶기 단계의 갱신 — 그 사이 팝업이 닫혔으면 새로 띄우지 않고 버린다.
+    """
+    t0 = time.perf_counter()
+    cfg = _config.get()
+    if group is not None:
+        for entry in _popup_stack:
+            if entry.get("group") == group:
+                if "image" not in entry["parts"]:
+                    _set_popup_text(entry, title, body)
+                elif bitmap is not None:
+                    _set_popup_bitmap(entry, bitmap)
+                entry["arm"]()  # 표시 시간 다시 시작
+                return
+        if update:
+            _coalescer.forget(group)
+            return
     W, H = cfg["popup_width"], cfg["popup_height"]
     base_x, base_y, l, t, r, b = _base_x_y(cfg)
     p = cfg["position"]
 
-    # 최대 개수 초과 시 가장 오래된 팝업 제거
-    while len(_popup_stack) >= cfg["max_popups"]:
-        oldest = _popup_stack[0]
-        try: oldest["win"].destroy()
-        except: pass
-        _popup_stack.pop(0)
+    # 최대 개수 초과 시 우선순위가 가장 낮은 것 중 가장 오래된 팝업 제거 후 재정렬
+    if len(_popup_stack) >= cfg["max_popups"]:
+        while len(_popup_stack) >= cfg["max_popups"]:
+            i = min(range(len(_popup_stack)), key=lambda i: (_popup_stack[i]["priority"], i))
+            _release(_popup_stack.pop(i))
+        _restack(cfg)
 
     # 새 팝업의 슬롯 = 현재 스택 크기
     slot = len(_popup_stack)
-    target_y = _target_y_for_slot(slot, cfg)
+    target_y = _target_y_for_slot(slot, cfg, base_y)
 
     # 슬라이드 시작 y (화면 바깥)
     if "top" in p:
@@ -195,135 +1297,1482 @@ def _create_popup(title, body, preview=False):
     pid = _pid_counter[0]
     _pid_counter[0] += 1
 
-    win = tk.Toplevel()
-    win.overrideredirect(True)
-    win.attributes("-topmost", True)
-    win.attributes("-alpha", cfg["opacity"])
-    win.configure(bg=cfg["bg_color"])
+    win, parts = _pool.acquire(cfg, bitmap is not None)
+    entry = {"id": pid, "win": win, "target_y": target_y, "parts": parts,
+             "key": _pool.key, "closed": False, "group": group, "priority": priority}
+    _skin_popup(entry, cfg)
+    if bitmap is not None:
+        _set_popup_bitmap(entry, bitmap)
+    else:
+        _set_popup_text(entry, title, body)
+        _set_popup_icon(entry, cfg, image)
     win.geometry(f"{W}x{H}+{base_x}+{start_y}")
-    win.update()
-
-    # 레이아웃
-    tk.Frame(win, bg=cfg["accent_color"], width=4).pack(side="left", fill="y")
-    tk.Label(win, text="  💬", bg=cfg["bg_color"],
-             font=("Segoe UI Emoji", cfg["title_size"] + 2)).pack(side="left", padx=(6, 0), pady=6)
-
-    frm = tk.Frame(win, bg=cfg["bg_color"])
-    frm.pack(side="left", fill="both", expand=True, padx=8, pady=6)
-    tk.Label(frm, text=title,
-             bg=cfg["bg_color"], fg=cfg["title_color"],
-             font=("Segoe UI", cfg["title_size"], "bold"),
-             anchor="w", wraplength=W - 90, justify="left").pack(anchor="w")
-    if body:
-        tk.Label(frm, text=body,
-                 bg=cfg["bg_color"], fg=cfg["body_color"],
-                 font=("Segoe UI", cfg["body_size"]),
-                 anchor="w", wraplength=W - 90, justify="left").pack(anchor="w")
+    win.deiconify()
+    win.update_idletasks()
+    metrics.observe("popup.first_frame", (time.perf_counter() - t0) * 1000)
+    if stamps is not None:
+        stamps["mapped"] = time.time()
 
     # 스택에 등록
-    entry = {"id": pid, "win": win, "target_y": target_y}
     _popup_stack.append(entry)
 
-    def close(e=None):
-        _remove_popup(pid, load_config())
+    def close():
+        _remove_popup(pid, _config.get())
 
-    win.bind("<Button-1>", close)
-    for w in win.winfo_children():
-        w.bind("<Button-1>", close)
+    def start_timer():
+        if entry["closed"]:
+            return
+        if stamps is not None and "anim_done" not in stamps:
+            stamps["anim_done"] = time.time()
+            _record_stages(stamps)
+        if entry.get("timer"):
+            win.after_cancel(entry["timer"])
+            entry["timer"] = None
+        running = _animator.anims.get(win)
+        if running is not None:
+            # 움직이는 중이면 끝날 때 다시 불리도록 (재정렬 이동은 done 이 없을 수 있다)
+            running["done"] = start_timer
+            return
+        dur = 2000 if preview else cfg["popup_duration_ms"]
+        entry["timer"] = win.after(dur, close)
+    entry["arm"] = start_timer
 
     # 슬라이드 인 애니메이션
-    def slide(i=0):
-        if i > 14:
-            dur = 2000 if preview else cfg["popup_duration_ms"]
-            try: win.after(dur, close)
-            except: pass
-            return
-        cy = int(start_y + (target_y - start_y) * (i / 14))
+    entry["x"], entry["size"] = base_x, (W, H)
+    _animator.move(win, (base_x, start_y), (base_x, target_y), (W, H),
+                   cfg["anim_ms"], cfg["anim_easing"], done=start_timer)
+
+
+def _bitmap_mode(cfg):
+    return cfg["render_mode"] == "bitmap" and not _rasterizer.failed
+
+def show_popup(title, body, preview=False, group=None, priority=PRI_NORMAL, stamps=None,
+               image=None, update=False):
+    def enqueue(bitmap=None):
+        if stamps is not None:
+            stamps["enqueue"] = time.time()
+        _queue_task(lambda: _create_popup(title, body, preview, group, priority, stamps,
+                                          image, bitmap, update),
+                    priority, droppable=not preview)
+    cfg = _config.get()
+    if _bitmap_mode(cfg):
+        _rasterizer.submit(title, body, cfg, image, enqueue)  # 그린 뒤에 메인 스레드로
+    else:
+        enqueue()
+
+
+# ── 알림 우선순위 ──────────────────────────────
+@functools.lru_cache(maxsize=4)
+def _compile_rules(rules_json):
+    rules = []
+    for r in json.loads(rules_json):
+        pat = r.get("pattern")
+        rules.append((r.get("type"), re.compile(pat, re.I) if pat else None,
+                      int(r.get("priority", PRI_NORMAL))))
+    return rules
+
+def notification_priority(title, body, cfg=None, app=None):
+    """priority_rules 중 맞는 규칙의 가장 높은 우선순위 (없으면 PRI_NORMAL)
+
+    dm 규칙은 app 이 "discord" 일 때만 본다 (다른 앱/푸시 알림 제목에는 "(#" 가 없음).
+    """
+    cfg = cfg or _config.get()
+    best = PRI_NORMAL
+    for kind, rx, pri in _compile_rules(json.dumps(cfg["priority_rules"])):
+        if pri <= best:
+            continue
+        if kind == "dm":
+            # Discord 서버 채널 알림 제목은 "이름 (#채널, 서버)" 형태
+            hit = app == "discord" and "(#" not in title
+        elif kind == "mention":
+            hit = bool(rx and rx.search(body))
+        elif kind == "keyword":
+            hit = bool(rx and (rx.search(title) or rx.search(body)))
+        elif kind == "sender":
+            hit = bool(rx and rx.search(title.split(" (", 1)[0]))
+        else:
+            hit = False
+        if hit:
+            best = pri
+    return best
+
+
+# ── 알림 폭주 묶기 ─────────────────────────────
+class _Coalescer:
+    """폴러와 UI 사이에서 알림 폭주를 묶고 새 팝업 수를 제한
+
+    같은 제목(보낸 사람/채널)의 알림이 window 초 안에 또 오면 새 팝업 대신
+    떠 있는 팝업을 "Alice +7" 처럼 갱신한다. 새 팝업은 토큰 버킷으로
+    초당 rate 개(최대 burst 개 연속)까지만 내보내고, 기다리는 동안 어차피
+    max_popups 밖으로 밀려날 오래된 그룹은 UI 로 보내지 않고 버린다.
+    우선순위가 PRI_HIGH 이상인 그룹은 토큰 없이 바로 내보내고 버리지 않는다.
+    """
+    UPDATE_S = 0.25  # 떠 있는 팝업 갱신은 그룹당 이 간격으로 모아서
+
+    def __init__(self, sink=None):
+        self.sink    = sink or show_popup
+        self.groups  = collections.OrderedDict()  # 제목 → 그룹 (최근 활동 순)
+        self.waiting = collections.deque()        # 토큰을 기다리는 새 그룹
+        self.cond    = threading.Condition()
+        self.tokens  = None
+        self.t_token = time.monotonic()
+        self.thread  = None
+        self.stats   = {"received": 0, "popups": 0, "updates": 0,
+                        "merged": 0, "dropped": 0, "errors": 0}
+
+    def submit(self, title, body, priority=None, stamps=None, image=None):
+        now = time.monotonic()
+        if priority is None:
+            priority = notification_priority(title, body)
+        if _history is not None:  # 묶이거나 버려지는 알림도 기록에는 남김
+            _history.add(title, body)
+        with self.cond:
+            self.stats["received"] += 1
+            g = self.groups.get(title)
+            if g is not None:
+                g["count"] += 1
+                g["body"], g["last"] = body, now
+                g["priority"] = max(g["priority"], priority)
+                self.groups.move_to_end(title)
+                self.stats["merged"] += 1
+            else:
+                g = {"title": title, "body": body, "count": 1, "sent": 0,
+                     "shown": False, "last": now, "flushed": 0.0, "priority": priority,
+                     "stamps": stamps, "image": image}
+                self.groups[title] = g
+                self.waiting.append(g)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def forget(self, title):
+        """title 그룹의 팝업이 화면에서 내려감 → 다음 알림은 다시 새 그룹으로 기다린다"""
+        with self.cond:
+            g = self.groups.get(title)
+            if g is not None and g["shown"]:
+                del self.groups[title]
+
+    @staticmethod
+    def _label(g):
+        return g["title"] if g["count"] == 1 else f"{g['title']} +{g['count'] - 1}"
+
+    def _refill(self, cfg, now):
+        rate, burst = cfg["rate_per_s"], cfg["rate_burst"]
+        if self.tokens is None:
+            self.tokens = burst
+        self.tokens = min(burst, self.tokens + (now - self.t_token) * rate)
+        self.t_token = now
+
+    def _step(self, now):
+        """보낼 것을 보내고, 다음에 깨어날 때까지의 초를 돌려준다"""
+        cfg = _config.get()
+        window = cfg["coalesce_ms"] / 1000
+        self._refill(cfg, now)
+        out, wait = [], window
+
+        # 어차피 화면에 못 남을 대기 그룹은 버림 (우선순위 낮은 것, 오래된 것부터)
+        while len(self.waiting) > cfg["max_popups"]:
+            g = min(self.waiting, key=lambda g: g["priority"])
+            if g["priority"] >= PRI_HIGH:
+                break
+            self.waiting.remove(g)
+            self.groups.pop(g["title"], None)
+            self.stats["dropped"] += g["count"]
+
+        # 새 팝업: 높은 우선순위는 바로, 나머지는 토큰 있을 때만
+        for g in sorted(self.waiting, key=lambda g: -g["priority"]):
+            if g["priority"] < PRI_HIGH:
+                if self.tokens < 1:
+                    break
+                self.tokens -= 1
+            self.waiting.remove(g)
+            g["shown"], g["sent"], g["flushed"] = True, g["count"], now
+            out.append((self._label(g), g["body"], g["title"], g["priority"], g["stamps"],
+                        g["image"], False))
+            self.stats["popups"] += 1
+        if self.waiting:
+            wait = min(wait, (1 - self.tokens) / max(cfg["rate_per_s"], 1e-3))
+
+        # 떠 있는 그룹에 추가로 온 알림 → 갱신, 조용해진 그룹은 정리
+        for title, g in list(self.groups.items()):
+            if not g["shown"]:
+                continue
+            if g["count"] > g["sent"]:
+                due = g["flushed"] + self.UPDATE_S
+                if now >= due:
+                    g["sent"], g["flushed"] = g["count"], now
+                    # 비트맵 모드는 갱신마다 팝업을 통째로 다시 그리므로 아바타도 같이
+                    out.append((self._label(g), g["body"], g["title"], g["priority"], None,
+                                g["image"], True))
+                    self.stats["updates"] += 1
+                else:
+                    wait = min(wait, due - now)
+            elif now - g["last"] >= window:
+                del self.groups[title]
+            else:
+                wait = min(wait, g["last"] + window - now)
+        return out, max(0.01, wait)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                try:
+                    out, wait = self._step(time.monotonic())
+                except Exception as e:
+                    # 상태가 깨졌으면 대기 중인 알림을 버리고 계속 (스레드는 하나뿐)
+                    self.stats["errors"] += 1
+                    self.stats["dropped"] += sum(g["count"] for g in self.waiting)
+                    self.groups.clear()
+                    self.waiting.clear()
+                    print(f"  [묶기 오류] {e!r}")
+                    out, wait = [], 0.01
+            for title, body, group, priority, stamps, image, update in out:
+                try:
+                    self.sink(title, body, group=group, priority=priority, stamps=stamps,
+                              image=image, update=update)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"  [묶기 오류] {e!r}")
+            with self.cond:
+                if not self.groups and not self.waiting:
+                    self.cond.wait()
+                else:
+                    self.cond.wait(wait)
+
+_coalescer = _Coalescer()
+metrics.gauge("coalesce", lambda: dict(_coalescer.stats, groups=len(_coalescer.groups),
+                                       waiting=len(_coalescer.waiting)))
+
+# ── 릴레이 (다른 PC 로 알림 전달) ──────────────
+# 게임 PC 의 폴러가 파싱한 알림을 TCP 로 보내고, 옆 PC 는 같은 묶기/팝업 코드로 띄운다.
+# 프레임: [길이 4바이트][플래그 1바이트][JSON [보낸 시각, [[제목, 본문, 우선순위], ...]]]
+# 플래그 1 = zlib 압축. 보내는 동안 쌓인 알림은 다음 프레임 하나로 묶인다.
+_FRAME_HEAD  = struct.Struct("!IB")
+_FRAME_ZLIB  = 1
+_FRAME_MAX   = 4 * 1024 * 1024
+_RELAY_BATCH = 256
+
+def _encode_frame(msgs, compress=True, sent=None):
+    data = json.dumps([time.time() if sent is None else sent, msgs],
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    flags = 0
+    if compress and len(data) > 512:
+        data, flags = zlib.compress(data, 1), _FRAME_ZLIB
+    return _FRAME_HEAD.pack(len(data), flags) + data
+
+def _read_frame(f):
+    """버퍼 파일(sock.makefile("rb"))에서 프레임 하나 → (보낸 시각, 메시지 목록)"""
+    head = f.read(_FRAME_HEAD.size)
+    if len(head) < _FRAME_HEAD.size:
+        raise ConnectionError("연결 끊김")
+    size, flags = _FRAME_HEAD.unpack(head)
+    if size > _FRAME_MAX:
+        raise ValueError(f"프레임이 너무 큼: {size}")
+    data = f.read(size)
+    if len(data) < size:
+        raise ConnectionError("연결 끊김")
+    if flags & _FRAME_ZLIB:
+        # 풀린 크기도 _FRAME_MAX 까지만 (작은 압축 프레임이 수 GB 로 풀릴 수 있다)
+        d = zlib.decompressobj()
+        data = d.decompress(data, _FRAME_MAX)
+        if d.unconsumed_tail:
+            raise ValueError(f"풀린 프레임이 {_FRAME_MAX} 바이트를 넘음")
+    sent, msgs = json.loads(data)
+    if not isinstance(msgs, list):
+        raise ValueError("메시지 목록이 아님")
+    return sent, msgs
+
+def _relay_message(m):
+    """받은 메시지 하나 → (제목, 본문, 우선순위) (잘못된 형식이면 None)
+
+    다른 PC 에서 온 값이므로 _push_item 처럼 제목/본문은 문자열, 우선순위는 유한한 수
+    또는 None (NaN/Infinity 는 int() 에서 터진다).
+    """
+    if not isinstance(m, list) or len(m) != 3:
+        return None
+    title, body, pri = m
+    if not isinstance(title, str) or not isinstance(body, (str, type(None))):
+        return None
+    if isinstance(pri, bool) or not isinstance(pri, (int, float, type(None))):
+        return None
+    if isinstance(pri, float) and not math.isfinite(pri):
+        return None
+    return title, body or "", None if pri is None else int(pri)
+
+class _RelaySender:
+    """알림을 receiver 로 보내는 쪽 (게임 PC)
+
+    submit() 은 버퍼에 넣기만 하고 바로 돌아온다 (폴러를 막지 않음). 버퍼는
+    최대 limit 개, 넘치면 오래된 것부터 버린다. 연결이 끊기면 BACKOFF_MIN 초부터
+    두 배씩 BACKOFF_MAX 초까지 늘려 가며 다시 접속한다.
+    """
+    BACKOFF_MIN, BACKOFF_MAX = 0.5, 30.0
+
+    def __init__(self, host, port, limit=1000, compress=True):
+        self.addr     = (host, port)
+        self.limit    = limit
+        self.compress = compress
+        self.buf      = collections.deque()
+        self.cond     = threading.Condition()
+        self.sock     = None
+        self.thread   = None
+        self.stats    = {"sent": 0, "frames": 0, "bytes": 0, "dropped": 0,
+                         "reconnects": 0, "connected": False}
+
+    def submit(self, title, body, priority=None, stamps=None, image=None):
+        # image 는 이 PC 의 파일 경로라 보내지 않는다
+        if priority is None:
+            priority = notification_priority(title, body)
+        with self.cond:
+            if len(self.buf) >= self.limit:
+                self.buf.popleft()
+                self.stats["dropped"] += 1
+            self.buf.append([title, body, priority])
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _connect(self):
+        delay = self.BACKOFF_MIN
+        while True:
+            try:
+                sock = socket.create_connection(self.addr, timeout=5)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                return sock
+            except OSError:
+                self.stats["reconnects"] += 1
+                time.sleep(delay)
+                delay = min(self.BACKOFF_MAX, delay * 2)
+
+    def _requeue(self, batch):
+        """못 보낸 묶음을 버퍼 앞에 되돌림 (자리가 없으면 오래된 것부터 버림)"""
+        with self.cond:
+            room = self.limit - len(self.buf)
+            keep = batch[-room:] if room > 0 else []
+            self.stats["dropped"] += len(batch) - len(keep)
+            self.buf.extendleft(reversed(keep))
+
+    def _run(self):
+        while True:
+            if self.sock is None:
+                self.sock = self._connect()
+                self.stats["connected"] = True
+                print(f"[릴레이] 연결됨: {self.addr[0]}:{self.addr[1]}")
+            with self.cond:
+                while not self.buf:
+                    self.cond.wait()
+                batch = [self.buf.popleft() for _ in range(min(len(self.buf), _RELAY_BATCH))]
+            frame = _encode_frame(batch, self.compress)
+            try:
+                self.sock.sendall(frame)
+            except OSError as e:
+                print(f"[릴레이] 연결 끊김: {e}")
+                try: self.sock.close()
+                except OSError: pass
+                self.sock = None
+                self.stats["connected"] = False
+                self._requeue(batch)
+                continue
+            self.stats["sent"]   += len(batch)
+            self.stats["frames"] += 1
+            self.stats["bytes"]  += len(frame)
+
+class _RelayReceiver:
+    """보낸 알림을 받아 sink(기본: 묶기 단계 → 팝업)로 넘기는 쪽 (옆 PC)"""
+    def __init__(self, host, port, sink=None):
+        self.sink   = sink or _coalescer.submit
+        self.server = socket.create_server((host, port))
+        self.port   = self.server.getsockname()[1]
+        self.stats  = {"received": 0, "frames": 0, "clients": 0, "errors": 0}
+
+    def start(self):
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try: conn, addr = self.server.accept()
+            except OSError: return  # close() 됨
+            threading.Thread(target=self._client, args=(conn, addr), daemon=True).start()
+
+    def _client(self, conn, addr):
+        print(f"[릴레이] 연결: {addr[0]}")
+        self.stats["clients"] += 1
         try:
-            win.geometry(f"{W}x{H}+{base_x}+{cy}")
-            win.after(13, slide, i + 1)
-        except:
+            with conn, conn.makefile("rb") as f:
+                while True:
+                    sent, msgs = _read_frame(f)
+                    now = time.time()
+                    # 두 PC 시계가 다르면 참고용 (같은 PC 루프백에서는 정확)
+                    if isinstance(sent, (int, float)):
+                        metrics.observe("relay.transit", max(0.0, (now - sent) * 1000))
+                    self.stats["frames"] += 1
+                    for m in msgs:
+                        msg = _relay_message(m)
+                        if msg is None:
+                            self.stats["errors"] += 1  # 이 메시지만 버림
+                            continue
+                        self.stats["received"] += 1
+                        title, body, priority = msg
+                        self.sink(title, body, priority=priority,
+                                  stamps={"read": now, "parse": now})
+        except ConnectionError:
             pass
-
-    slide()
-
-
-def show_popup(title, body, preview=False):
-    _queue_task(lambda: _create_popup(title, body, preview))
-
-
-# ── DB 폴링 ───────────────────────────────────
+        except (OSError, ValueError, TypeError, zlib.error) as e:
+            self.stats["errors"] += 1
+            print(f"[릴레이] 잘못된 데이터, 연결 종료: {e}")
+        finally:
+            self.stats["clients"] -= 1
+
+    def close(self):
+        self.server.close()
+
+_relay = None  # relay_mode 가 send / receive 일 때의 _RelaySender / _RelayReceiver
+
+def start_relay(cfg):
+    """relay_mode 에 맞춰 릴레이 시작. 폴러가 쓸 emit 을 돌려준다 (receive 면 None)"""
+    global _relay
+    mode = cfg["relay_mode"]
+    if mode == "receive":
+        _relay = _RelayReceiver(cfg["relay_host"], cfg["relay_port"])
+        _relay.start()
+        print(f"[OK] 릴레이 수신 대기: {cfg['relay_host']}:{_relay.port}")
+    elif mode == "send":
+        _relay = _RelaySender(cfg["relay_host"], cfg["relay_port"],
+                              cfg["relay_buffer"], cfg["relay_compress"])
+        print(f"[OK] 릴레이 송신: {cfg['relay_host']}:{cfg['relay_port']}")
+    else:
+        return _coalescer.submit
+    metrics.gauge("relay", lambda: dict(_relay.stats, buffered=len(getattr(_relay, "buf", ()))))
+    if mode == "receive":
+        return None
+    if not cfg["relay_local"]:
+        return _relay.submit
+    def emit(title, body, priority=None, stamps=None, image=None):
+        _relay.submit(title, body, priority)
+        _coalescer.submit(title, body, priority, stamps, image)
+    return emit
+
+
+# ── DB 읽기 ───────────────────────────────────
 DB_PATH = os.path.expandvars(
     r"%LOCALAPPDATA%\Microsoft\Windows\Notifications\wpndatabase.db"
 )
 
-def _read_db(query):
-    tmp = tempfile.mktemp(suffix=".db")
+def _copy_snapshot(src, dst):
+    """db + -wal 을 함께 복사 (WAL 에만 있는 새 알림도 보이도록)
+
+    -wal 을 먼저 복사해야 그 사이 체크포인트가 일어나도 db 쪽에 반영된 상태라
+    일관성이 유지된다. 복사 중 -wal 이 바뀌면 몇 번 다시 시도한다.
+    -shm 은 복사하지 않는다 (열 때 SQLite 가 -wal 로 다시 만든다).
+    """
+    for _ in range(3):
+        try: before = os.stat(src + "-wal")
+        except OSError: before = None
+        if before is not None:
+            shutil.copyfile(src + "-wal", dst + "-wal")
+        shutil.copyfile(src, dst)
+        metrics.incr("poll.bytes_copied", os.path.getsize(dst) + (before.st_size if before else 0))
+        try: after = os.stat(src + "-wal")
+        except OSError: after = None
+        same = (before is None and after is None) or (
+            before is not None and after is not None
+            and (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns))
+        if same:
+            return
+    # 계속 바뀌는 중이면 마지막 복사본 그대로 사용 (다음 틱에 다시 읽힘)
+
+def _read_db(query, args=(), path=None):
+    """DB 스냅샷을 임시 파일로 복사해서 읽기 (잠겨 있을 때의 대체 경로)"""
+    fd, tmp = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
     try:
-        shutil.copy2(DB_PATH, tmp)
+        _copy_snapshot(path or DB_PATH, tmp)
         con = sqlite3.connect(tmp)
-        rows = con.execute(query).fetchall()
-        con.close()
-        return rows
+        try:
+            return con.execute(query, args).fetchall()
+        finally:
+            con.close()
     finally:
-        try: os.unlink(tmp)
-        except: pass
+        for suffix in ("", "-wal", "-shm"):
+            try: os.unlink(tmp + suffix)
+            except OSError: pass
+
+def _filetime_to_unix(ft):
+    """Windows FILETIME (1601년부터 100ns 단위) → unix 초"""
+    return ft / 10_000_000 - 11_644_473_600
+
+class _DbReader:
+    """wpndatabase.db 증분 리더
+
+    읽기 전용 연결을 계속 열어두고 Id > since 인 행만 가져온다.
+    SELECT 는 자동 커밋이라 읽기 트랜잭션을 잡고 있지 않으므로
+    Windows 쪽 쓰기/체크포인트를 막지 않는다.
+    연결이나 쿼리가 실패하면(잠김 등) 그 틱만 복사본으로 읽는다.
+    """
+    NEW_ROWS = ('SELECT Id, HandlerId, Payload, ArrivalTime, Tag, "Group" FROM Notification'
+                " WHERE Id > ? ORDER BY Id LIMIT ?")
+    GAP_ROWS = ('SELECT Id, HandlerId, Payload, ArrivalTime, Tag, "Group" FROM Notification'
+                " WHERE Id IN (%s) ORDER BY Id")
+
+    def __init__(self, path=None, batch=200):
+        self.path    = path or DB_PATH
+        self.batch   = batch
+        self.con     = None
+        self._version  = None  # PRAGMA data_version
+        self._stat_sig = None  # db/-wal/-shm 의 (크기, mtime)
+
+    def _connect(self):
+        if self.con is None:
+            from urllib.request import pathname2url
+            uri = "file:" + pathname2url(self.path) + "?mode=ro"
+            self.con = sqlite3.connect(uri, uri=True, timeout=0.5,
+                                       check_same_thread=False)
+        return self.con
+
+    def close(self):
+        if self.con is not None:
+            try: self.con.close()
+            except sqlite3.Error: pass
+            self.con = None
+            self._version = None
+
+    def _stat_signature(self):
+        sig = []
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                st = os.stat(self.path + suffix)
+                sig.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def changed(self):
+        """마지막 확인 이후 DB 가 바뀌었을 수 있으면 True
+
+        연결이 살아 있으면 PRAGMA data_version (다른 연결의 커밋마다 바뀜)을,
+        복사본 모드면 db/-wal/-shm 의 크기·수정시각을 비교한다.
+        """
+        if self.con is not None:
+            try:
+                (v,), = self.con.execute("PRAGMA data_version").fetchall()
+                if v == self._version:
+                    return False
+                self._version = v
+                return True
+            except sqlite3.Error:
+                self.close()
+        sig = self._stat_signature()
+        if sig == self._stat_sig:
+            return False
+        self._stat_sig = sig
+        return True
 
-def get_discord_ids():
-    try:
-        rows = _read_db("SELECT * FROM NotificationHandler")
-        return {row[0] for row in rows
-                if "discord" in " ".join(str(v).lower() for v in row if v)}
-    except: return set()
+    def invalidate(self):
+        """다음 changed() 가 무조건 True 가 되도록"""
+        self._version = self._stat_sig = None
 
-def poll_notifications():
-    if not os.path.exists(DB_PATH):
-        print(f"[오류] 알림 DB 없음: {DB_PATH}"); return
+    def query(self, sql, args=()):
+        try:
+            return self._connect().execute(sql, args).fetchall()
+        except sqlite3.Error:
+            # 잠김/손상/열기 실패 → 다음 틱에 다시 연결, 이번엔 복사본으로
+            self.close()
+            metrics.incr("poll.fallbacks")  # 복사본으로 읽은 횟수
+            return _read_db(sql, args, self.path)
+
+    def max_id(self):
+        (mx,), = self.query("SELECT IFNULL(MAX(Id), 0) FROM Notification")
+        return mx
+
+    def fetch_new(self, since, gaps=()):
+        """Id > since 인 행 + gaps 중 이제 생긴 행 [(Id, HandlerId, Payload, ArrivalTime, Tag, Group), ...]
+
+        gaps 는 따로 Id 로 찾으므로, 구멍이 남아 있어도 읽는 범위는 항상 since 뒤로 나아간다.
+        """
+        rows = self.query(self.NEW_ROWS, (since, self.batch))
+        if len(rows) >= self.batch:
+            self.invalidate()  # 남은 행은 다음 틱에
+        gaps = list(gaps)
+        if gaps:
+            rows = self.query(self.GAP_ROWS % ",".join("?" * len(gaps)), gaps) + rows
+        return rows
 
-    discord_ids = get_discord_ids()
-    print(f"[OK] Discord HandlerId: {discord_ids if discord_ids else '자동감지 실패→전체'}")
-    print(f"[OK] 감지 시작! 트레이 우클릭 → 설정/종료\n")
+    @staticmethod
+    def note_lag(arrival, now=None):
+        """새 행의 ArrivalTime 기준으로 읽기 지연(ms) 기록 (모든 앱의 새 행)"""
+        if arrival:
+            lag = max(0.0, ((now or time.time()) - _filetime_to_unix(arrival)) * 1000)
+            metrics.observe("poll.lag", lag)
+            return lag
+        return None
+
+class _SeenIds:
+    """알림 Id 중복 제거 — 가동 시간/DB 크기와 무관하게 메모리 고정
+
+    watermark 는 지금까지 본 가장 큰 Id. 그보다 작은 Id 는 이미 본 것으로 치되,
+    Id 가 건너뛰어진 구멍(gap)은 늦게 커밋될 수 있으므로 최근 window 개까지
+    ttl 초 동안 기억해 두고 나타나면 새 알림으로 인정한다.
+    같은 Id 로 다시 써진 행은 watermark 아래라서 중복으로 걸러진다.
+    """
+    def __init__(self, window=64, ttl=30.0):
+        self.window    = window
+        self.ttl       = ttl
+        self.watermark = 0
+        self.gaps      = collections.OrderedDict()  # Id → 기록 시각 (Id 오름차순)
+
+    def prime(self, max_id):
+        """시작 시점의 최대 Id 를 기준점으로 (기존 알림은 무시)"""
+        self.watermark = max(self.watermark, max_id)
+        self.gaps.clear()
+
+    def add(self, rid, now=None):
+        """처음 보는 Id 면 True"""
+        if rid > self.watermark:
+            now = time.monotonic() if now is None else now
+            for gap in range(max(self.watermark + 1, rid - self.window), rid):
+                self.gaps[gap] = now
+            while len(self.gaps) > self.window:
+                self.gaps.popitem(last=False)
+            self.watermark = rid
+            return True
+        return self.gaps.pop(rid, None) is not None
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self.gaps:
+            gap, ts = next(iter(self.gaps.items()))
+            if now - ts < self.ttl:
+                break
+            del self.gaps[gap]
+
+
+class _HandlerRegistry:
+    """NotificationHandler 의 HandlerId → 앱 이름 매핑
+
+    테이블은 처음 한 번만 통째로 읽고, 이후에는 행 수/최대 rowid 가 바뀐 경우에만
+    다시 읽는다. 행 단위 필터는 dict 조회 한 번.
+    """
+    def __init__(self, patterns, watch):
+        self.patterns = patterns
+        self.watch    = set(watch)
+        self.matchers = {app: re.compile(pat, re.I) for app, pat in patterns.items()}
+        # 감지 실패 시 payload 에서 찾을 감시 대상 앱 정규식 (하나로 묶음)
+        alts = [f"(?P<{app}>{pat.pattern})" for app, pat in self.matchers.items()
+                if app in self.watch and app.isidentifier()]
+        self._payload_re = re.compile("|".join(alts), re.I) if alts else None
+        self.apps = {}     # HandlerId → 앱 이름 (모르는 앱은 None)
+        self.found = False # 감시 대상 앱의 HandlerId 를 하나라도 찾았는지
+        self._sig = None
+
+    def _match(self, row):
+        text = " ".join(str(v) for v in row if v)
+        for app, rx in self.matchers.items():
+            if rx.search(text):
+                return app
+        return None
+
+    def refresh(self, reader):
+        """바뀌었으면 다시 읽고 True"""
+        sig = tuple(reader.query("SELECT COUNT(*), MAX(rowid) FROM NotificationHandler")[0])
+        if sig == self._sig:
+            return False
+        self.apps = {row[0]: self._match(row)
+                     for row in reader.query("SELECT * FROM NotificationHandler")}
+        self.found = any(app in self.watch for app in self.apps.values())
+        self._sig = sig
+        return True
 
-    seen_ids = set()
-    try:
-        for (rid,) in _read_db("SELECT Id FROM Notification"): seen_ids.add(rid)
-    except: pass
+    def watched_ids(self):
+        return {hid for hid, app in self.apps.items() if app in self.watch}
+
+    def app_for(self, handler_id, payload):
+        """감시 대상 앱이면 앱 이름, 아니면 None"""
+        if self.found:
+            app = self.apps.get(handler_id)
+            return app if app in self.watch else None
+        # HandlerId 로 못 찾았으면 payload 내용으로 판단
+        if self._payload_re is None or not payload:
+            return None
+        ps = payload.decode("utf-8", errors="replace") if isinstance(payload, bytes) else payload
+        m = self._payload_re.search(ps)
+        return m.lastgroup if m else None
+
+# ── 알림 내용 파싱 ─────────────────────────────
+class Toast:
+    """토스트 XML 에서 뽑은 내용 (캐시에 공유되므로 읽기 전용으로 취급)"""
+    __slots__ = ("title", "body", "attribution", "image", "launch")
+
+    def __init__(self, title="", body="", attribution="", image="", launch=""):
+        self.title, self.body, self.attribution = title, body, attribution
+        self.image, self.launch = image, launch
+
+    def __repr__(self):
+        return f"Toast({self.title!r}, {self.body!r})"
+
+_TEXT_RE   = re.compile(r"<text\b([^>]*)>([^<]*)</text>")
+_IMAGE_RE  = re.compile(r"<image\b([^>]*)>")
+_LAUNCH_RE = re.compile(r'<toast\b[^>]*?\blaunch="([^"]*)"')
+_ATTR_RE   = re.compile(r'([\w-]+)\s*=\s*"([^"]*)"')
+
+def _unescape(s):
+    return html.unescape(s) if "&" in s else s
+
+def _clean(s):
+    # Discord 가 이름 앞뒤에 넣는 방향 격리 문자 제거
+    return s.replace("\u2068", "").replace("\u2069", "").strip()
+
+def _build_toast(texts, images, launch):
+    """texts: [(placement, 텍스트)], images: [속성 dict]"""
+    main = [t for p, t in texts if p != "attribution" and t]
+    attribution = next((t for p, t in texts if p == "attribution" and t), "")
+    logo = next((i for i in images if i.get("placement") == "appLogoOverride"),
+                images[0] if images else {})
+    return Toast(_clean(main[0]) if main else "",
+                 _clean(main[1]) if len(main) > 1 else "",
+                 _clean(attribution), logo.get("src", ""), launch)
+
+def _parse_toast_fast(ps):
+    """ToastGeneric 기본 레이아웃 전용 정규식 추출. 애매하면 None (→ XML 파싱)"""
+    if 'template="ToastGeneric"' not in ps or "<![CDATA[" in ps or "'" in ps:
+        return None
+    matches = _TEXT_RE.findall(ps)
+    if len(matches) != ps.count("<text"):  # <text/>, 하위 요소 등 → 정식 파싱
+        return None
+    texts  = [("attribution" if 'placement="attribution"' in attr else "", _unescape(t))
+              for attr, t in matches]
+    images = [{k: _unescape(v) for k, v in _ATTR_RE.findall(attr)}
+              for attr in _IMAGE_RE.findall(ps)]
+    m = _LAUNCH_RE.search(ps)
+    return _build_toast(texts, images, _unescape(m[1]) if m else "")
+
+def _parse_toast_xml(ps):
+    root = ET.fromstring(ps)
+    texts  = [(e.get("placement", ""), e.text or "") for e in root.iter("text")]
+    images = [dict(e.attrib) for e in root.iter("image")]
+    return _build_toast(texts, images, root.get("launch", ""))
+
+@functools.lru_cache(maxsize=256)
+def parse_toast(payload):
+    """Notification.Payload (bytes/str) → Toast. 같은 내용이 다시 오면 캐시 사용"""
+    ps = payload.decode("utf-8", errors="replace") if isinstance(payload, bytes) else payload
+    return _parse_toast_fast(ps) or _parse_toast_xml(ps)
 
-    tick = 0
-    while True:
-        time.sleep(1.0)
-        tick += 1
-        if tick >= 30:
-            tick = 0
-            new = get_discord_ids()
-            if new != discord_ids:
-                discord_ids.clear(); discord_ids.update(new)
-                print(f"[갱신] Discord HandlerId: {discord_ids}")
-
-        try: rows = _read_db("SELECT Id, HandlerId, Payload FROM Notification ORDER BY Id DESC LIMIT 30")
-        except: continue
-
-        for rid, handler_id, payload in rows:
-            if rid in seen_ids: continue
-            seen_ids.add(rid)
+
+# ── DB 폴링 ───────────────────────────────────
+class _DbPoller:
+    """wpndatabase.db 폴링 한 틱 단위 처리
+
+    tick() 한 번이 변경 확인 → 새 행 읽기 → 중복 제거 → 앱 판별 → emit(_Item).
+    거르기/파싱은 파이프라인의 다음 단계(다른 스레드)에서 한다.
+    emit 기본값은 _pipeline.push.
+    """
+    def __init__(self, path=None, emit=None):
+        self.reader   = _DbReader(path)
+        self.emit     = emit or _pipeline.push
+        self.seen     = _SeenIds()
+        cfg = _config.get()
+        self.handlers = _HandlerRegistry(cfg["app_patterns"], cfg["watch_apps"])
+        self.interval = cfg["poll_min_ms"] / 1000  # 다음 tick 까지 쉴 시간
+        self.next_handlers = time.monotonic() + 30
+        self.next_config   = time.monotonic() + 2
+
+    def start(self):
+        try: self.handlers.refresh(self.reader)
+        except Exception: pass
+        try: self.seen.prime(self.reader.max_id())
+        except Exception: pass
+
+    def tick(self):
+        """한 번 폴링. 내보낸 알림 수를 돌려준다"""
+        reader, handlers, seen = self.reader, self.handlers, self.seen
+        if time.monotonic() >= self.next_config:
+            # 설정 파일을 직접 고친 경우 반영 (stat 한 번)
+            self.next_config = time.monotonic() + 2
+            _config.check()
+        cfg = _config.get()
+        if handlers.watch != set(cfg["watch_apps"]) or handlers.patterns != cfg["app_patterns"]:
+            handlers = self.handlers = _HandlerRegistry(cfg["app_patterns"], cfg["watch_apps"])
+            self.next_handlers = 0
+        min_s, max_s = cfg["poll_min_ms"] / 1000, cfg["poll_max_ms"] / 1000
+        if time.monotonic() >= self.next_handlers:
+            self.next_handlers = time.monotonic() + 30
+            try:
+                if handlers.refresh(reader):
+                    print(f"[갱신] HandlerId: {handlers.watched_ids()}")
+            except Exception: pass
+
+        # 변경 없으면 쿼리 생략 + 간격 늘리기, 변경 있으면 최소 간격으로
+        metrics.incr("poll.ticks")
+        t0 = time.perf_counter()
+        if not reader.changed():
+            self.interval = min(max_s, self.interval * cfg["poll_backoff"])
+            metrics.incr("poll.skipped")
+            metrics.observe("poll.gate", (time.perf_counter() - t0) * 1000)
+            return 0
+        self.interval = min_s
+
+        seen.expire()
+        try: rows = reader.fetch_new(seen.watermark, seen.gaps)
+        except Exception:
+            reader.invalidate(); return 0
+        read_at = time.time()
+        metrics.observe("poll.read", (time.perf_counter() - t0) * 1000)
+        metrics.incr("poll.rows", len(rows))
+
+        emitted = 0
+        for rid, handler_id, payload, arrival, tag, group in rows:
+            if not seen.add(rid): continue
+            reader.note_lag(arrival, read_at)
             if not payload: continue
-            is_discord = (handler_id in discord_ids) if discord_ids else ("discord" in str(payload).lower())
-            if not is_discord: continue
+            if handler_id not in handlers.apps:  # 새로 등록된 앱일 수 있음
+                try: handlers.refresh(reader)
+                except Exception: pass
+            stamps = {"arrival": _filetime_to_unix(arrival) if arrival else None,
+                      "read": read_at}
+            self.emit(_Item("db", handlers.app_for(handler_id, payload), payload,
+                            stamps=stamps, tag=tag, group=group))
+            emitted += 1
+        return emitted
+
+def poll_notifications(emit=None, path=None):
+    if not os.path.exists(path or DB_PATH):
+        print(f"[오류] 알림 DB 없음: {path or DB_PATH}"); return
+
+    poller = _DbPoller(path, emit)
+    poller.start()
+    _mark("first_poll")
+    ids = poller.handlers.watched_ids()
+    print(f"[OK] 감시 앱 {sorted(poller.handlers.watch)} HandlerId: {ids if ids else '자동감지 실패→내용으로 판단'}")
+    print(f"[OK] 감지 시작! 트레이 우클릭 → 설정/종료\n")
+
+    while True:
+        time.sleep(poller.interval)
+        poller.tick()
+
+
+# ── 수집 파이프라인 ─────────────────────────────
+# 소스(DB / HTTP / UDP / 파일) → 거르기 → 파싱 → emit (묶기 단계 → 팝업, 또는 릴레이)
+# 단계 사이는 크기 제한 큐이고 단계마다 작업 스레드가 있어서, DB 복사가 느려도 파싱은
+# 계속 돌고 파싱이 밀려도 DB 폴러는 큐가 찰 때까지만 기다린다. 묶기(_Coalescer)와
+# 팝업(_main_queue)은 원래부터 자기 큐와 스레드를 가진 단계다.
+#
+# 소스는 name 과 start(push) 를 가진 객체. push(item, block) 으로 _Item 을 넣는다.
+# 푸시 소스(HTTP/UDP)는 block=False 로 넣어서, 큐가 차면 기다리지 않고 버린다.
+
+class _Item:
+    """파이프라인을 흐르는 알림 한 건"""
+    __slots__ = ("source", "app", "payload", "title", "body", "priority", "stamps",
+                 "tag", "group", "image")
+
+    def __init__(self, source, app=None, payload=None, title="", body="",
+                 priority=None, stamps=None, tag=None, group=None):
+        self.source   = source
+        self.app      = app       # DB 알림: 감시 대상이 아니면 None
+        self.payload  = payload   # DB 알림의 토스트 XML (파싱 전)
+        self.title    = title
+        self.body     = body
+        self.priority = priority  # None 이면 priority_rules 로 결정
+        self.stamps   = stamps if stamps is not None else {}
+        self.tag      = tag       # DB 알림의 Tag / Group (같은 알림을 다시 쓸 때 유지됨)
+        self.group    = group
+        self.image    = None      # 토스트의 아바타 이미지 src
+
+class _Stage:
+    """크기 제한 큐 + 작업 스레드. fn(item) 의 결과(None 이면 버림)를 out 으로"""
+    def __init__(self, name, fn, out, maxsize=256, workers=1):
+        self.name    = name
+        self.fn      = fn
+        self.out     = out
+        self.q       = queue.Queue(maxsize)
+        self.workers = workers
+        self.threads = []
+        self.lock    = threading.Lock()
+        self.stats   = {"in": 0, "out": 0, "dropped": 0, "errors": 0}
+
+    def put(self, item, block=True):
+        """block=False 면 큐가 찼을 때 기다리지 않고 버린다 (False 반환)"""
+        if not self.threads:
+            with self.lock:
+                while len(self.threads) < self.workers:
+                    t = threading.Thread(target=self._run, daemon=True)
+                    t.start()
+                    self.threads.append(t)
+        try:
+            self.q.put(item, block)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            item = self.q.get()
             try:
-                ps = payload.decode("utf-8", errors="replace") if isinstance(payload, bytes) else payload
-                texts = [e.text for e in ET.fromstring(ps).iter("text") if e.text]
-                clean = lambda s: s.replace("\u2068","").replace("\u2069","").strip()
-                title = clean(texts[0]) if texts else "Discord"
-                body  = clean(texts[1]) if len(texts) > 1 else ""
-                print(f"  [알림] {title}: {body}")
-                show_popup(title, body)
+                self.stats["in"] += 1
+                t0 = time.perf_counter()
+                res = self.fn(item)
+                metrics.observe("pipeline." + self.name, (time.perf_counter() - t0) * 1000)
+                if res is not None:
+                    self.stats["out"] += 1
+                    self.out(res)
             except Exception as e:
-                print(f"  [파싱오류] {e}")
+                self.stats["errors"] += 1
+                print(f"  [{self.name} 오류] {e}")
+            finally:
+                self.q.task_done()
+
+def _filter_item(item):
+    """감시 대상이 아닌 DB 알림, 내용 없는 알림 거르기"""
+    if item.source == "db":
+        return item if item.app is not None and item.payload else None
+    return item if item.title or item.body else None
+
+def _parse_item(item):
+    """DB 알림의 토스트 XML → 제목/본문 (푸시 소스는 이미 채워져 있음)"""
+    if item.payload is not None:
+        try:
+            toast = parse_toast(item.payload)
+        except Exception as e:
+            metrics.incr("parse.errors")
+            print(f"  [파싱오류] {e}")
+            return None
+        item.title = toast.title or item.app.capitalize()
+        item.body  = toast.body
+        item.image = toast.image or None
+    item.stamps["parse"] = time.time()
+    return item
+
+def _log_item(item):
+    metrics.incr("notifications")
+    stamps = item.stamps
+    if _config.get()["verbose"]:
+        lag = ((stamps["read"] - stamps["arrival"]) * 1000
+               if stamps.get("arrival") and stamps.get("read") else None)
+        print(f"  [알림] {item.title}: {item.body}" + (f" (+{lag:.0f}ms)" if lag is not None else ""))
+
+class _ContentDedup:
+    """내용이 같은 알림 다시 띄우지 않기 (_SeenIds 다음 단계)
+
+    Windows 가 알림을 새 Id 로 다시 쓰거나 Discord 가 같은 토스트를 또 보내면
+    Id 로는 못 거른다. (앱, 제목, 본문, Tag, Group) 을 정규화한 해시를 처음 본
+    시각과 함께 시간 순 OrderedDict 에 window 초 동안 기억한다 (최대 max_keys 개).
+    중복이 계속 와도 기억 시각은 늘리지 않으므로 window 초마다 한 번은 다시 뜬다.
+    """
+    def __init__(self, window=10.0, max_keys=1024):
+        self.window   = window
+        self.max_keys = max_keys
+        self.keys     = collections.OrderedDict()  # 해시 → 처음 본 시각 (오래된 순)
+        self.lock     = threading.Lock()
+        self.stats    = {"checked": 0, "suppressed": 0}
+
+    @staticmethod
+    def key(item):
+        norm = lambda s: " ".join(s.split()).casefold() if s else ""
+        return hash((item.app or item.source, norm(item.title), norm(item.body),
+                     item.tag or "", item.group or ""))
+
+    def seen(self, item, now=None):
+        """window 초 안에 같은 내용을 봤으면 True (띄우지 않음)"""
+        if self.window <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        k = self.key(item)
+        with self.lock:
+            self.stats["checked"] += 1
+            keys = self.keys
+            while keys:
+                old, ts = next(iter(keys.items()))
+                if now - ts < self.window and len(keys) < self.max_keys:
+                    break
+                del keys[old]
+            if k in keys:
+                self.stats["suppressed"] += 1
+                metrics.incr("dedup.suppressed")
+                return True
+            keys[k] = now
+            return False
+
+class _Pipeline:
+    """소스 → 거르기 → 파싱(+내용 중복 제거) → emit(title, body, priority, stamps, image=)"""
+    def __init__(self, emit=None, maxsize=256):
+        self.emit    = emit or _coalescer.submit
+        self.dedup   = _ContentDedup()
+        self.parse   = _Stage("parse", self._parse, self._emit, maxsize)
+        self.filter  = _Stage("filter", _filter_item, self.parse.put, maxsize)
+        self.sources = []
+
+    def _parse(self, item):
+        item = _parse_item(item)
+        self.dedup.window = _config.get()["dedup_window_s"]
+        if item is None or self.dedup.seen(item):
+            return None
+        _log_item(item)
+        return item
+
+    def _emit(self, item):
+        priority = item.priority
+        if priority is None:  # 앱을 아는 여기서 정해야 dm 규칙이 맞게 걸린다
+            priority = notification_priority(item.title, item.body, app=item.app)
+        self.emit(item.title, item.body, priority, item.stamps, image=item.image)
+
+    def resize(self, maxsize):
+        """시작 전(큐가 비어 있을 때)에만"""
+        for st in (self.filter, self.parse):
+            st.q = queue.Queue(maxsize)
+
+    def push(self, item, block=True):
+        return self.filter.put(item, block)
+
+    def add_source(self, src):
+        src.start(self.push)
+        self.sources.append(src)
+
+    def join(self):
+        """지금까지 넣은 알림이 emit 까지 다 지나가길 기다림 (벤치용)"""
+        self.filter.q.join()
+        self.parse.q.join()
+
+    def stats(self):
+        out = {"sources": ",".join(s.name for s in self.sources)}
+        for st in (self.filter, self.parse):
+            out.update({f"{st.name}.{k}": v for k, v in st.stats.items()})
+            out[f"{st.name}.queue"] = st.q.qsize()
+        out["dedup.suppressed"] = self.dedup.stats["suppressed"]
+        out["dedup.keys"] = len(self.dedup.keys)
+        return out
+
+_pipeline = _Pipeline()
+metrics.gauge("pipeline", _pipeline.stats)
+
+_PUSH_MAX = 64 * 1024  # 푸시 알림 한 건의 최대 바이트
+
+def _push_item(source, data, default_title="PeekAlert"):
+    """푸시 소스가 받은 바이트 → _Item (잘못된 형식이면 None)
+
+    JSON {"title", "body", "app", "priority"} 또는 텍스트 (첫 줄 제목, 나머지 본문,
+    한 줄뿐이면 그 줄이 본문).
+    """
+    text = data.decode("utf-8", "replace").strip()
+    if not text:
+        return None
+    if text.startswith("{"):
+        try: obj = json.loads(text)
+        except ValueError: return None
+        if not isinstance(obj, dict):
+            return None
+        title = str(obj.get("title") or default_title)
+        body  = str(obj.get("body") or "")
+        pri   = obj.get("priority")
+        if isinstance(pri, float) and not math.isfinite(pri):
+            return None  # json 은 NaN/Infinity 도 받아 준다 (int() 에서 터짐)
+        pri   = int(pri) if isinstance(pri, (int, float)) else None
+        app   = str(obj.get("app") or source)
+    else:
+        title, _, body = text.partition("\n")
+        if not body:
+            title, body = default_title, title
+        pri, app = None, source
+    return _Item(source, app, title=title.strip(), body=body.strip(), priority=pri,
+                 stamps={"read": time.time()})
+
+class _DbSource:
+    """Windows 알림 DB 폴링 (poll_notifications 루프를 별도 스레드에서)"""
+    name = "db"
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def start(self, push):
+        threading.Thread(target=poll_notifications, args=(push, self.path), daemon=True,
+                         name="poll").start()
+
+class _HttpSource:
+    """POST /notify 로 알림 받기 (스크립트/봇용, 기본은 이 PC 에서만 접속 가능)"""
+    name = "http"
+
+    def __init__(self, host, port):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        src = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                try: size = int(self.headers.get("Content-Length") or 0)
+                except ValueError: size = -1
+                if self.path.rstrip("/") not in ("", "/notify"):
+                    code = 404
+                elif size < 0:  # 음수면 read() 가 연결이 끊길 때까지 읽어 버림
+                    code = 400
+                elif size > _PUSH_MAX:
+                    code = 413
+                else:
+                    item = _push_item("http", self.rfile.read(min(size, _PUSH_MAX)))
+                    if item is None:    code = 400
+                    elif src.push(item, block=False): code = 202
+                    else:               code = 503  # 큐가 가득 참
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.push = None
+
+    def start(self, push):
+        self.push = push
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"[OK] HTTP 알림 받기: http://{self.server.server_address[0]}:{self.port}/notify")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class _UdpSource:
+    """UDP 데이터그램 하나 = 알림 하나"""
+    name = "udp"
+
+    def __init__(self, host, port):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+
+    def start(self, push):
+        threading.Thread(target=self._run, args=(push,), daemon=True).start()
+        print(f"[OK] UDP 알림 받기: {self.sock.getsockname()[0]}:{self.port}")
+
+    def _run(self, push):
+        while True:
+            try: data, _ = self.sock.recvfrom(_PUSH_MAX)
+            except OSError: return  # close() 됨
+            try:
+                item = _push_item("udp", data)
+                if item is not None:
+                    push(item, block=False)
+            except Exception as e:  # 데이터그램 하나 때문에 소스가 멈추면 안 됨
+                print(f"[오류] UDP 알림 처리: {e!r}")
+
+    def close(self):
+        self.sock.close()
+
+class _FileTailSource:
+    """파일 끝에 추가되는 줄마다 알림 하나 (시작 시점 이후에 추가된 줄만)"""
+    name = "file"
+    INTERVAL = 0.25
+
+    def __init__(self, path):
+        self.path    = path
+        self.pos     = os.path.getsize(path) if os.path.exists(path) else 0
+        self.partial = b""
+
+    def start(self, push):
+        threading.Thread(target=self._run, args=(push,), daemon=True).start()
+        print(f"[OK] 파일 감시: {self.path}")
+
+    def poll(self, push):
+        """새로 추가된 완전한 줄들을 push. 파일이 줄었으면 (교체/비움) 처음부터"""
+        try: size = os.path.getsize(self.path)
+        except OSError: return
+        if size < self.pos:
+            self.pos, self.partial = 0, b""
+        if size == self.pos:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.pos)
+            data = f.read(size - self.pos)
+        self.pos += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()[-_PUSH_MAX:]
+        for line in lines:
+            try: item = _push_item("file", line, os.path.basename(self.path))
+            except Exception as e:  # 나머지 줄은 계속
+                print(f"[오류] 파일 감시: {e!r}"); continue
+            if item is not None:
+                push(item)
+
+    def _run(self, push):
+        while True:
+            time.sleep(self.INTERVAL)
+            try: self.poll(push)
+            except Exception as e:  # 읽기 오류 등으로 감시가 멈추면 안 됨
+                print(f"[오류] 파일 감시: {e!r}")
+
+def start_sources(cfg, emit):
+    """설정의 sources 를 열고 파이프라인 시작"""
+    _pipeline.emit = emit
+    _pipeline.resize(cfg["pipeline_queue"])
+    for name in cfg["sources"]:
+        try:
+            if name == "db":     src = _DbSource()
+            elif name == "http": src = _HttpSource(cfg["ingest_host"], cfg["http_port"])
+            elif name == "udp":  src = _UdpSource(cfg["ingest_host"], cfg["udp_port"])
+            elif name == "file":
+                if not cfg["tail_path"]:
+                    print("[오류] file 소스: tail_path 가 비어 있음"); continue
+                src = _FileTailSource(cfg["tail_path"])
+            else:
+                print(f"[오류] 알 수 없는 소스: {name}"); continue
+            _pipeline.add_source(src)
+        except OSError as e:
+            print(f"[오류] {name} 소스 시작 실패: {e}")
+
+
+# ── 알림 기록 ─────────────────────────────────
+_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id    INTEGER PRIMARY KEY,
+    time  REAL NOT NULL,
+    title TEXT NOT NULL,
+    body  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_history_time ON history (time);
+"""
+# 외부 내용(content=) FTS5 색인: 본문은 history 에만 두고 색인만 따로
+_HISTORY_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    title, body, content='history', content_rowid='id', tokenize='unicode61 remove_diacritics 2');
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, title, body)
+    VALUES ('delete', old.id, old.title, old.body);
+END;
+"""
+
+def _fts_terms(words, column=None):
+    """검색어 → FTS5 질의 (단어마다 접두어 검색, 모두 포함)"""
+    terms = ['"' + w.replace('"', '""') + '"*' for w in words]
+    return " AND ".join((column + ":" + t) if column else t for t in terms)
+
+def _like(w):
+    return "%" + w.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class _History:
+    """지난 알림 저장/검색 (SQLite, FTS5 가 있으면 전문 검색 색인)
+
+    add() 는 목록에 넣기만 하고, 쓰기 스레드가 첫 건부터 FLUSH_S 초(또는 BATCH 건)
+    모아 한 트랜잭션으로 쓴다. 쌓인 게 없으면 쓰기 스레드는 깨어나지 않는다.
+    days 일이 지났거나 max_rows 개를 넘은 기록은 저장할 때 COMPACT_S 초가 지났으면
+    지운다. 읽기는 스레드마다 따로 연결 (WAL 이라 쓰기와 안 막힘).
+    """
+    FLUSH_S, BATCH, COMPACT_S = 1.0, 500, 3600
+
+    def __init__(self, path, days=30, max_rows=100000, fts=True):
+        self.path     = path
+        self.days     = days
+        self.max_rows = max_rows
+        self.pending  = []
+        self.cond     = threading.Condition()
+        self.wlock    = threading.Lock()  # 쓰기 연결 (쓰기 스레드 / flush)
+        self.thread   = None
+        self.local    = threading.local()
+        self.next_compact = 0.0
+        self.stats    = {"written": 0, "batches": 0, "deleted": 0}
+        self.writer   = self._connect(writer=True)
+        self.writer.executescript(_HISTORY_SCHEMA)
+        self.fts = False
+        if fts:
+            try:
+                new = not self.writer.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name='history_fts'").fetchone()
+                self.writer.executescript(_HISTORY_FTS)
+                if new:  # FTS 없이 쌓인 기록이 있으면 색인 만들기
+                    self.writer.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+                self.fts = True
+            except sqlite3.OperationalError:  # FTS5 없이 빌드된 sqlite → LIKE 검색
+                pass
+        self.writer.commit()
+
+    def _connect(self, writer=False):
+        con = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        if writer:
+            # 새 파일이면 다른 어떤 문장보다 먼저여야 적용된다 (journal_mode=WAL 이
+            # 파일 헤더를 먼저 써 버리면 auto_vacuum=0 으로 굳음). 기존 파일은 compact() 에서
+            con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def _reader(self):
+        con = getattr(self.local, "con", None)
+        if con is None:
+            con = self.local.con = self._connect()
+        return con
+
+    def add(self, title, body, t=None):
+        with self.cond:
+            self.pending.append((time.time() if t is None else t, title, body))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            if len(self.pending) == 1 or len(self.pending) >= self.BATCH:
+                self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending)  # 조용할 때는 시간 제한 없이
+                self.cond.wait_for(lambda: len(self.pending) >= self.BATCH, self.FLUSH_S)
+            try:
+                self.flush()
+                if time.time() >= self.next_compact:
+                    self.next_compact = time.time() + self.COMPACT_S
+                    self.compact()
+            except sqlite3.Error as e:
+                print(f"[기록] 저장 실패: {e}")
+                time.sleep(self.FLUSH_S)
+
+    def flush(self):
+        """쌓인 기록을 한 트랜잭션으로 저장"""
+        with self.wlock:
+            with self.cond:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            with self.writer:
+                self.writer.executemany(
+                    "INSERT INTO history (time, title, body) VALUES (?, ?, ?)", batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            return len(batch)
+
+    def compact(self):
+        """보관 기간/개수를 넘은 기록 지우고 빈 공간 돌려주기"""
+        with self.wlock:
+            con = self.writer
+            with con:
+                n = con.execute("DELETE FROM history WHERE time < ?",
+                                (time.time() - self.days * 86400,)).rowcount
+                n += con.execute(
+                    "DELETE FROM history WHERE id <= "
+                    "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_rows,)).rowcount
+            if n:
+                if self.fts:
+                    with con:
+                        con.execute("INSERT INTO history_fts (history_fts) VALUES ('optimize')")
+                (mode,), = con.execute("PRAGMA auto_vacuum").fetchall()
+                if mode == 2:
+                    # execute() 는 한 단계(한 페이지)만 돌리므로 끝까지 도는 executescript 로
+                    con.executescript("PRAGMA incremental_vacuum;")
+                else:  # auto_vacuum 없이 만들어진 파일 → 한 번만 전체 VACUUM 으로 전환
+                    con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    con.execute("VACUUM")
+            self.stats["deleted"] += n
+            return n
+
+    def search(self, text="", sender="", since=None, until=None):
+        """조건에 맞는 기록 id 목록 (최신 순). sender 는 제목(보낸 사람/채널)에서만 찾음"""
+        where, args = [], []
+        if since is not None:
+            where.append("time >= ?"); args.append(since)
+        if until is not None:
+            where.append("time < ?"); args.append(until)
+        words, senders = text.split(), sender.split()
+        if self.fts:
+            # 글자/숫자가 있는 단어만 색인으로, "@" 같은 기호뿐인 단어는 LIKE 로
+            fw = [w for w in words if re.search(r"\w", w)]
+            fs = [w for w in senders if re.search(r"\w", w)]
+            if fw or fs:
+                q = " AND ".join(x for x in (_fts_terms(fw), _fts_terms(fs, "title")) if x)
+                where.append("id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+                args.append(q)
+                words   = [w for w in words if w not in fw]
+                senders = [w for w in senders if w not in fs]
+        for w in words:
+            where.append("(title LIKE ? ESCAPE '\\' OR body LIKE ? ESCAPE '\\')")
+            args += [_like(w), _like(w)]
+        for w in senders:
+            where.append("title LIKE ? ESCAPE '\\'"); args.append(_like(w))
+        return self._ids(where, args)
+
+    def _ids(self, where, args):
+        sql = "SELECT id FROM history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return [r[0] for r in self._reader().execute(
+            sql + " ORDER BY id DESC LIMIT ?", args + [self.max_rows])]
+
+    def rows(self, ids):
+        """id 목록 → {id: (time, title, body)}"""
+        out = {}
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for rid, t, title, body in self._reader().execute(
+                    "SELECT id, time, title, body FROM history WHERE id IN (%s)"
+                    % ",".join("?" * len(chunk)), chunk):
+                out[rid] = (t, title, body)
+        return out
+
+    def count(self):
+        return self._reader().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+_history = None  # start_history() 후 _History
+
+def start_history(cfg):
+    global _history
+    if not cfg["history"]:
+        return
+    try:
+        _history = _History(HISTORY_PATH, cfg["history_days"], cfg["history_max"])
+    except sqlite3.Error as e:
+        print(f"[오류] 기록 DB 열기 실패: {e}"); return
+    metrics.gauge("history", lambda: dict(_history.stats, pending=len(_history.pending),
+                                          fts=_history.fts))
 
 
 # ── 설정 창 ───────────────────────────────────
+# 설정 창을 조작하는 동안은 파일에 쓰지 않고 메모리의 초안(draft)만 바꾼다.
+# 미리보기 팝업 하나를 띄워 두고 초안이 바뀔 때마다 그 자리에서 색/크기/위치만 다시 적용
+# (한 프레임에 한 번까지). 파일 저장과 떠 있는 팝업 반영은 "저장 후 닫기" 때만.
+_PREVIEW_FRAME_MS = 16
+
+class _PreviewPopup:
+    """설정 창 전용 미리보기 팝업 (스택/풀 밖에서 따로 관리, 메인 스레드 전용)"""
+    TITLE, BODY = "미리보기 💬", "이 설정으로 팝업이 표시됩니다!"
+
+    def __init__(self):
+        self.entry = None
+
+    def apply(self, cfg):
+        """cfg 로 다시 칠하고 옮긴다. 없으면 만들어서 띄움 (render_mode 와 상관없이 위젯)"""
+        t0 = time.perf_counter()
+        if self.entry is None:
+            win, parts = _build_popup_window(cfg)
+            self.entry = {"id": None, "win": win, "parts": parts}
+            win.bind("<Button-1>", lambda e: self.hide(), add="+")
+            for w in parts.values():
+                w.bind("<Button-1>", lambda e: self.hide(), add="+")
+            _set_popup_text(self.entry, self.TITLE, self.BODY)
+            _set_popup_icon(self.entry, cfg)
+        entry, win = self.entry, self.entry["win"]
+        _skin_popup(entry, cfg)
+        x, by = _base_x_y(cfg)[:2]
+        win.geometry(f"{cfg['popup_width']}x{cfg['popup_height']}+{x}+"
+                     f"{_target_y_for_slot(0, cfg, by)}")
+        if win.state() == "withdrawn":
+            win.deiconify()
+        metrics.observe("settings.preview", (time.perf_counter() - t0) * 1000)
+
+    def hide(self):
+        if self.entry is not None:
+            self.entry["win"].withdraw()
+
+    def close(self):
+        if self.entry is not None:
+            try: self.entry["win"].destroy()
+            except tk.TclError: pass
+            self.entry = None
+
 def _create_settings_window():
-    cfg = load_config()
+    cfg = _config.get()
+    displays.invalidate()  # 모니터 구성이 바뀌었을 수 있음
     mon_count = count_monitors()
 
     win = tk.Toplevel()
@@ -342,6 +2791,20 @@ def _create_settings_window():
     style.configure("TCombobox", fieldbackground="#40444b", foreground="#ffffff")
     style.configure("Horizontal.TScale", background="#2f3136", troughcolor="#40444b")
 
+    preview = _PreviewPopup()
+    pending = {"job": None}
+
+    def update_preview():
+        pending["job"] = None
+        try: draft = get_values()
+        except (tk.TclError, ValueError): return  # 입력 중인 빈 칸/잘못된 숫자
+        try: preview.apply(draft)
+        except tk.TclError: pass  # 잘못된 색 이름 등
+
+    def schedule(*args):  # 값이 연달아 바뀌어도 한 프레임에 한 번만 반영
+        if pending["job"] is None and win.winfo_exists():
+            pending["job"] = win.after(_PREVIEW_FRAME_MS, update_preview)
+
     def section(title):
         lf = ttk.LabelFrame(win, text=title, padding=(10, 5))
         lf.pack(fill="x", pady=(0, 8))
@@ -357,6 +2820,7 @@ def _create_settings_window():
         lbl = ttk.Label(f, text=fmt(var.get()), width=6)
         ttk.Scale(f, from_=from_, to=to_, variable=var, orient="horizontal", length=140,
                   command=lambda v: lbl.config(text=fmt(float(v)))).pack(side="left")
+        var.trace_add("write", schedule)
         lbl.pack(side="left", padx=4)
 
     def color_row(parent, label, color_var):
@@ -365,6 +2829,7 @@ def _create_settings_window():
         prev.pack(side="left", padx=(0, 6))
         hex_lbl = ttk.Label(f, text=color_var.get(), width=8)
         hex_lbl.pack(side="left", padx=(0, 6))
+        color_var.trace_add("write", schedule)
         def pick():
             res = colorchooser.askcolor(color=color_var.get(), title=label, parent=win)
             if res and res[1]:
@@ -379,12 +2844,14 @@ def _create_settings_window():
     mon_cb = ttk.Combobox(f, values=[f"모니터 {i} {'(주)' if i==0 else '(서브)'}" for i in range(mon_count)],
                           state="readonly", width=18)
     mon_cb.current(min(cfg["monitor_index"], mon_count-1)); mon_cb.pack(side="left")
+    mon_cb.bind("<<ComboboxSelected>>", schedule)
 
     f = lrow(s1, "위치")
     pos_map = {"우하단":"bottom_right","좌하단":"bottom_left","우상단":"top_right","좌상단":"top_left"}
     rev_map = {v:k for k,v in pos_map.items()}
     pos_cb = ttk.Combobox(f, values=list(pos_map.keys()), state="readonly", width=10)
     pos_cb.set(rev_map.get(cfg["position"],"우하단")); pos_cb.pack(side="left")
+    pos_cb.bind("<<ComboboxSelected>>", schedule)
 
     margin_var = tk.IntVar(value=cfg["margin"])
     slider_row(s1, "여백 (px)", margin_var, 0, 100, lambda v: f"{int(v)}px")
@@ -395,6 +2862,8 @@ def _create_settings_window():
     ttk.Spinbox(f, from_=-500, to=500, textvariable=offx_var, width=6).pack(side="left")
     ttk.Label(f, text=" / ").pack(side="left")
     ttk.Spinbox(f, from_=-500, to=500, textvariable=offy_var, width=6).pack(side="left")
+    offx_var.trace_add("write", schedule)
+    offy_var.trace_add("write", schedule)
 
     # 크기
     s2 = section("📐 팝업 크기")
@@ -433,8 +2902,9 @@ def _create_settings_window():
     color_row(s5, "강조색(바)", accent_var)
 
     def get_values():
-        return {
-            **load_config(),
+        """창의 값으로 만든 설정 초안 (파일에는 쓰지 않음)"""
+        return _config._validate({
+            **_config.get(),
             "monitor_index":     mon_cb.current(),
             "position":          pos_map[pos_cb.get()],
             "margin":            margin_var.get(),
@@ -451,27 +2921,442 @@ def _create_settings_window():
             "body_color":        body_color_var.get(),
             "bg_color":          bg_var.get(),
             "accent_color":      accent_var.get(),
-        }
+        })
 
-    def do_preview():
-        save_config(get_values())
-        show_popup("미리보기 💬", "이 설정으로 팝업이 표시됩니다!", preview=True)
+    def close():
+        if pending["job"] is not None:
+            win.after_cancel(pending["job"])
+        preview.close()
+        win.destroy()
 
     def do_save():
-        save_config(get_values())
-        win.destroy()
+        try: draft = get_values()
+        except (tk.TclError, ValueError): return
+        save_config(draft)
+        _config.flush()
+        close()
 
     bf = ttk.Frame(win); bf.pack(fill="x", pady=(6, 0))
-    ttk.Button(bf, text="미리보기",     command=do_preview).pack(side="left", padx=(0, 6))
+    ttk.Button(bf, text="미리보기",     command=update_preview).pack(side="left", padx=(0, 6))
     ttk.Button(bf, text="저장 후 닫기", command=do_save).pack(side="left")
-    ttk.Button(bf, text="취소",         command=win.destroy).pack(side="right")
+    ttk.Button(bf, text="취소",         command=close).pack(side="right")
+    win.protocol("WM_DELETE_WINDOW", close)
+    update_preview()
 
 def open_settings():
     _queue_task(_create_settings_window)
 
 
+# ── 통계 창 ───────────────────────────────────
+def _format_stats(snap):
+    lines = [f"PeekAlert {snap['version']}  가동 {snap['uptime_s'] / 60:.1f}분", ""]
+    lines.append(f"{'지연 (ms)':<24}{'건수':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, h in snap["latency_ms"].items():
+        if "p50" in h:
+            lines.append(f"{name:<24}{h['count']:>7}{h['p50']:>9.1f}{h['p95']:>9.1f}"
+                         f"{h['p99']:>9.1f}{h['max']:>9.1f}")
+    lines += ["", "카운터"]
+    lines += [f"  {k:<22}{v:>10}" for k, v in snap["counters"].items()]
+    for name, g in snap["gauges"].items():
+        lines += ["", name]
+        lines += [f"  {k:<22}{v:>10}" for k, v in g.items()]
+    return "\n".join(lines)
+
+def _create_stats_window():
+    win = tk.Toplevel()
+    win.title("PeekAlert 통계")
+    win.attributes("-topmost", True)
+    win.configure(bg="#2f3136")
+    txt = tk.Text(win, width=72, height=36, bg="#2f3136", fg="#dcddde",
+                  font=("Consolas", 9), relief="flat", padx=12, pady=10)
+    txt.pack(fill="both", expand=True)
+
+    def refresh():
+        if not win.winfo_exists():
+            return
+        txt.configure(state="normal")
+        txt.delete("1.0", "end")
+        txt.insert("1.0", _format_stats(metrics.snapshot()))
+        txt.configure(state="disabled")
+        win.after(1000, refresh)
+
+    def save():
+        try: metrics.write(METRICS_PATH, "both")
+        except OSError as e: print(f"[측정] 저장 실패: {e}")
+
+    bf = tk.Frame(win, bg="#2f3136"); bf.pack(fill="x", padx=12, pady=(0, 10))
+    ttk.Button(bf, text="파일로 저장", command=save).pack(side="left")
+    ttk.Button(bf, text="닫기", command=win.destroy).pack(side="right")
+    refresh()
+
+def open_stats():
+    _queue_task(_create_stats_window)
+
+
+# ── 기록 창 ───────────────────────────────────
+_HISTORY_PERIODS = {"전체": None, "오늘": "today", "7일": 7, "30일": 30}
+_ROW_H = 42
+
+def _period_since(name):
+    p = _HISTORY_PERIODS.get(name)
+    if p is None:
+        return None
+    if p == "today":
+        lt = time.localtime()
+        return time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1))
+    return time.time() - p * 86400
+
+def _create_history_window():
+    """지난 알림 목록. 10만 건이어도 보이는 줄만 그린다 (캔버스 항목을 재사용)"""
+    if _history is None:
+        print("[기록] 꺼져 있음 (설정 파일의 history)"); return
+    cfg = _config.get()
+    bg = "#2f3136"
+    win = tk.Toplevel()
+    win.title("PeekAlert 기록")
+    win.attributes("-topmost", True)
+    win.configure(bg=bg)
+    win.geometry("560x640")
+
+    top = tk.Frame(win, bg=bg); top.pack(fill="x", padx=12, pady=(10, 6))
+    text_var, sender_var, period_var = tk.StringVar(), tk.StringVar(), tk.StringVar(value="전체")
+    tk.Label(top, text="검색", bg=bg, fg="#dcddde", font=("Segoe UI", 9)).pack(side="left")
+    text_entry = ttk.Entry(top, textvariable=text_var, width=18)
+    text_entry.pack(side="left", padx=(4, 10))
+    tk.Label(top, text="보낸 사람", bg=bg, fg="#dcddde", font=("Segoe UI", 9)).pack(side="left")
+    ttk.Entry(top, textvariable=sender_var, width=12).pack(side="left", padx=(4, 10))
+    ttk.Combobox(top, textvariable=period_var, values=list(_HISTORY_PERIODS),
+                 width=6, state="readonly").pack(side="left")
+    count_lbl = tk.Label(top, bg=bg, fg="#aaaaaa", font=("Segoe UI", 9))
+    count_lbl.pack(side="right")
+
+    body = tk.Frame(win, bg=bg); body.pack(fill="both", expand=True, padx=12, pady=(0, 10))
+    canvas = tk.Canvas(body, bg=cfg["bg_color"], highlightthickness=0)
+    sb = ttk.Scrollbar(body, orient="vertical")
+    sb.pack(side="right", fill="y")
+    canvas.pack(side="left", fill="both", expand=True)
+
+    st = {"ids": [], "top": 0, "cache": {}, "rows": [], "seq": 0, "job": None}
+    f_time  = ("Segoe UI", 8)
+    f_title = ("Segoe UI", cfg["title_size"] - 1, "bold")
+    f_body  = ("Segoe UI", cfg["body_size"])
+
+    def visible():
+        return max(1, canvas.winfo_height() // _ROW_H + 1)
+
+    def render():
+        ids, n = st["ids"], visible()
+        st["top"] = top_i = max(0, min(st["top"], len(ids) - n + 1))
+        page = ids[top_i:top_i + n]
+        missing = [i for i in page if i not in st["cache"]]
+        if missing:
+            if len(st["cache"]) > 2000:
+                st["cache"].clear()
+            st["cache"].update(_history.rows(missing))
+        while len(st["rows"]) < n:  # 줄 수가 늘었을 때만 항목 추가
+            st["rows"].append((
+                canvas.create_text(0, 0, anchor="nw", font=f_time, fill=cfg["accent_color"]),
+                canvas.create_text(0, 0, anchor="nw", font=f_title, fill=cfg["title_color"]),
+                canvas.create_text(0, 0, anchor="nw", font=f_body, fill=cfg["body_color"]),
+                canvas.create_line(0, 0, 0, 0, fill="#202225")))
+        width = canvas.winfo_width()
+        max_chars = max(10, (width - 20) // 7)
+        for k, items in enumerate(st["rows"]):
+            row = st["cache"].get(page[k]) if k < len(page) else None
+            if row is None:
+                for it in items:
+                    canvas.itemconfigure(it, state="hidden")
+                continue
+            t, title, text = row
+            y = k * _ROW_H
+            text = text.replace("\n", " ")
+            canvas.itemconfigure(items[0], state="normal",
+                                 text=time.strftime("%m-%d %H:%M", time.localtime(t)))
+            canvas.itemconfigure(items[1], state="normal", text=title[:max_chars - 14])
+            canvas.itemconfigure(items[2], state="normal",
+                                 text=text if len(text) <= max_chars else text[:max_chars - 1] + "…")
+            canvas.coords(items[0], 10, y + 5)
+            canvas.coords(items[1], 90, y + 4)
+            canvas.coords(items[2], 10, y + 22)
+            canvas.coords(items[3], 0, y + _ROW_H - 1, width, y + _ROW_H - 1)
+        total = len(ids)
+        sb.set(*((top_i / total, min(1.0, (top_i + n) / total)) if total else (0, 1)))
+
+    def scroll(*args):
+        n = visible()
+        if args[0] == "moveto":
+            st["top"] = int(float(args[1]) * len(st["ids"]))
+        elif args[0] == "scroll":
+            st["top"] += int(args[1]) * (n - 1 if args[2] == "pages" else 1)
+        render()
+    sb.configure(command=scroll)
+
+    def wheel(e):
+        step = -3 if (getattr(e, "delta", 0) > 0 or e.num == 4) else 3
+        scroll("scroll", step, "units")
+    canvas.bind("<MouseWheel>", wheel)
+    canvas.bind("<Button-4>", wheel)
+    canvas.bind("<Button-5>", wheel)
+    canvas.bind("<Configure>", lambda e: render())
+
+    def apply(seq, ids, ms):
+        if seq != st["seq"] or not win.winfo_exists():
+            return  # 더 새 검색이 있었음
+        st["ids"], st["top"] = ids, 0
+        count_lbl.configure(text=f"{len(ids):,}건  ({ms:.0f} ms)")
+        render()
+
+    def search():
+        st["job"] = None
+        st["seq"] += 1
+        seq, q = st["seq"], (text_var.get(), sender_var.get(), _period_since(period_var.get()))
+        def work():  # 검색은 별도 스레드, 결과 반영은 메인 스레드
+            t0 = time.perf_counter()
+            try: ids = _history.search(q[0], q[1], since=q[2])
+            except sqlite3.Error as e:
+                print(f"[기록] 검색 실패: {e}"); ids = []
+            ms = (time.perf_counter() - t0) * 1000
+            metrics.observe("history.search", ms)
+            _queue_task(lambda: apply(seq, ids, ms))
+        threading.Thread(target=work, daemon=True).start()
+
+    def schedule(*args):  # 입력 중에는 250ms 조용해질 때까지 기다렸다가 검색
+        if st["job"]:
+            win.after_cancel(st["job"])
+        st["job"] = win.after(250, search)
+    text_var.trace_add("write", schedule)
+    sender_var.trace_add("write", schedule)
+    period_var.trace_add("write", schedule)
+
+    _history.flush()
+    search()
+    text_entry.focus_set()
+
+def open_history():
+    _queue_task(_create_history_window)
+
+
+# ── 진단 ──────────────────────────────────────
+# 며칠씩 켜 두는 프로그램이라 조금씩 새는 것(닫히지 않은 창, 취소 안 된 after, 쌓이는 큐)을
+# 찾기 위한 모드. 평소에는 꺼져 있고 tracemalloc/프로파일러도 켜지 않는다.
+def _rss_bytes():
+    """현재 프로세스의 상주 메모리 (알 수 없으면 None)"""
+    if sys.platform == "win32":
+        import ctypes, ctypes.wintypes as wt
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wt.DWORD), ("PageFaultCount", wt.DWORD)] + [
+                (n, ctypes.c_size_t) for n in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                    "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                    "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+        pmc = PROCESS_MEMORY_COUNTERS()
+        pmc.cb = ctypes.sizeof(pmc)
+        proc = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(proc, ctypes.byref(pmc), pmc.cb):
+            return pmc.WorkingSetSize
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _tk_counts(root):
+    """살아 있는 위젯/Toplevel 수와 대기 중인 after 수 (메인 스레드)"""
+    widgets = toplevels = 0
+    todo = [root]
+    while todo:
+        w = todo.pop()
+        widgets += 1
+        if isinstance(w, tk.Toplevel):
+            toplevels += 1
+        todo.extend(w.winfo_children())
+    return {"widgets": widgets, "toplevels": toplevels,
+            "afters": len(root.tk.splitlist(root.tk.call("after", "info")))}
+
+class _Sampler:
+    """sys._current_frames() 를 interval 마다 훑어 스레드별로 어디서 시간을 쓰는지 센다"""
+    def __init__(self, threads=("MainThread", "poll"), interval=0.01, depth=4):
+        self.threads  = set(threads)
+        self.interval = interval
+        self.depth    = depth
+        self.counts   = collections.Counter()
+        self.samples  = 0
+        self.running  = False
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            threading.Thread(target=self._run, daemon=True, name="diag-sampler").start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            names = {t.ident: t.name for t in threading.enumerate() if t.name in self.threads}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident)
+                if name is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.depth:
+                    co = frame.f_code
+                    stack.append(f"{co.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.counts[(name, " < ".join(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def take(self, n=15):
+        """상위 n 개 (스레드, 스택, 비율) 후 초기화"""
+        counts, samples = self.counts, max(1, self.samples)
+        self.counts, self.samples = collections.Counter(), 0
+        return [(name, stack, c / samples) for (name, stack), c in counts.most_common(n)]
+
+# 각 gauge 에서 "쌓이는 양" 에 해당하는 값 (큐 길이, 보관 개수 등)
+_DIAG_SIZES = ("queue", "pending", "groups", "items", "shown", "free", "keys", "buffered")
+
+class _Diagnostics:
+    """진단 모드: 주기적으로 상태를 재서 회전 로그에 쓰고, 계속 늘어나면 경고"""
+    def __init__(self, path=DIAG_PATH):
+        self.path    = path
+        self.log     = None
+        self.snap    = None      # 직전 tracemalloc 스냅샷
+        self.sampler = None
+        self.series  = {"rss": collections.deque(), "widgets": collections.deque()}
+        self.last    = {}
+        self.stats   = {"samples": 0, "alarms": 0}
+
+    def start(self, cfg):
+        import logging, logging.handlers, tracemalloc
+        self.log = logging.getLogger("peekalert.diag")
+        self.log.propagate = False
+        h = logging.handlers.RotatingFileHandler(self.path, maxBytes=1 << 20, backupCount=3,
+                                                 encoding="utf-8")
+        h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        self.log.addHandler(h)
+        self.log.setLevel(logging.INFO)
+        tracemalloc.start(1)
+        self.snap = self._snapshot()
+        if cfg["diag_profile"]:
+            self.sampler = _Sampler()
+            self.sampler.start()
+        threading.Thread(target=self._run, daemon=True, name="diag").start()
+        self.log.info("진단 시작 (v%s, pid %d)", VERSION, os.getpid())
+        print(f"[OK] 진단 모드 → {self.path}")
+
+    @staticmethod
+    def _snapshot():
+        import tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+
+    def _ui_counts(self, timeout=5.0):
+        """메인 스레드에서 _tk_counts 실행. 응답이 없으면 None (그 자체가 문제 신호)"""
+        if _root is None:
+            return {}
+        box, done = {}, threading.Event()
+        def run():
+            try: box.update(_tk_counts(_root))
+            finally: done.set()
+        _queue_task(run)
+        return box if done.wait(timeout) else None
+
+    def _run(self):
+        while True:
+            time.sleep(max(1, _config.get()["diag_interval_s"]))
+            try:
+                self.sample()
+            except Exception as e:
+                self.log.exception("진단 실패: %r", e)
+
+    def sample(self):
+        cfg = _config.get()
+        rss = _rss_bytes()
+        ui = self._ui_counts()
+        snap = self._snapshot()
+        diff = snap.compare_to(self.snap, "lineno")[:10]
+        self.snap = snap
+        traced = sum(st.size for st in snap.statistics("filename"))
+        self.stats["samples"] += 1
+
+        self.last = {"rss_mb": round(rss / 1048576, 1) if rss else None,
+                     "traced_mb": round(traced / 1048576, 1),
+                     "threads": threading.active_count(),
+                     "main_queue": _main_queue.qsize()}
+        if ui is None:
+            self.log.warning("메인 스레드가 5초 안에 응답하지 않음 (큐 %d)", _main_queue.qsize())
+        else:
+            self.last.update(ui)
+        self.log.info("상태 %s", json.dumps(self.last, ensure_ascii=False))
+        gauges = metrics.snapshot()["gauges"]
+        queues = {name: {k: v for k, v in g.items() if any(w in k for w in _DIAG_SIZES)}
+                  for name, g in gauges.items() if name != "diag"}
+        self.log.info("큐 %s", json.dumps({k: v for k, v in queues.items() if v},
+                                           ensure_ascii=False))
+        for st in diff:
+            if st.size_diff:
+                self.log.info("  메모리 %+8.1f KB  %+6d개  %s", st.size_diff / 1024,
+                              st.count_diff, st.traceback[0])
+        if self.sampler is not None:
+            for name, stack, share in self.sampler.take():
+                self.log.info("  프로파일 %5.1f%%  %-10s %s", share * 100, name, stack)
+
+        self._check("rss", rss, cfg["diag_alarm_rss_mb"] * 1048576, cfg, "MB", 1048576)
+        if ui:
+            self._check("widgets", ui["widgets"], cfg["diag_alarm_widgets"], cfg, "개", 1)
+
+    def _check(self, name, value, limit, cfg, unit, scale):
+        """최근 diag_alarm_samples 번 줄지 않고 limit 이상 늘었으면 경고 (한 번 울리면 다시 셈)"""
+        if value is None:
+            return
+        q = self.series[name]
+        q.append(value)
+        while len(q) > max(2, cfg["diag_alarm_samples"]):
+            q.popleft()
+        if len(q) < max(2, cfg["diag_alarm_samples"]):
+            return
+        vals = list(q)
+        if all(b >= a for a, b in zip(vals, vals[1:])) and vals[-1] - vals[0] >= limit:
+            self.stats["alarms"] += 1
+            msg = (f"{name} 계속 증가: {vals[0] / scale:.1f} → {vals[-1] / scale:.1f} {unit} "
+                   f"({len(vals)}회 연속)")
+            self.log.warning(msg)
+            print(f"[진단] {msg} → {self.path}")
+            q.clear()
+
+_diag = None
+
+def start_diagnostics(cfg):
+    global _diag
+    if not (cfg["diagnostics"] or "--diagnostics" in sys.argv):
+        return
+    _diag = _Diagnostics()
+    try:
+        _diag.start(cfg)
+    except OSError as e:
+        print(f"[오류] 진단 로그 열기 실패: {e}"); _diag = None
+        return
+    metrics.gauge("diag", lambda: dict(_diag.stats, **_diag.last))
+
+
 # ── 트레이 아이콘 ─────────────────────────────
+def _resource(name):
+    """EXE 로 묶였으면 압축 해제 폴더(sys._MEIPASS), 아니면 스크립트 폴더"""
+    return os.path.join(getattr(sys, "_MEIPASS", APP_DIR), name)
+
 def _make_icon():
+    """make_icon.py 로 미리 만든 icon.ico 사용, 없으면 직접 그림"""
+    try:
+        img = Image.open(_resource("icon.ico"))
+        img.load()
+        return img
+    except OSError:
+        pass
+    from PIL import ImageDraw
     img = Image.new("RGBA", (64, 64), (0,0,0,0))
     d = ImageDraw.Draw(img)
     d.ellipse([2,2,62,62], fill="#5865f2")
@@ -479,38 +3364,71 @@ def _make_icon():
     d.rectangle([20,20,32,44], fill="#5865f2")
     return img
 
+def _quit(icon):
+    icon.stop()
+    _config.flush()
+    if _history is not None:
+        try: _history.flush()
+        except sqlite3.Error: pass
+    cfg = _config.get()
+    if cfg["metrics_interval_s"] > 0:
+        try: metrics.write(METRICS_PATH, cfg["metrics_format"])
+        except OSError: pass
+    os._exit(0)
+
 def run_tray():
+    """트레이 아이콘 (별도 스레드, 이 안에서 pystray/Pillow 로드)"""
+    try:
+        _load_tray()
+    except ImportError as e:
+        print(f"[오류] 트레이 패키지 없음 ({e.name}) → python peekalert.py --install-deps")
+        return
     icon = pystray.Icon(
         "PeekAlert", _make_icon(), "PeekAlert",
         pystray.Menu(
             pystray.MenuItem("테스트 팝업", lambda i, item: show_popup("친구#1234", "야 게임하자! 들어와~")),
             pystray.MenuItem("설정",        lambda i, item: open_settings()),
-            pystray.MenuItem("종료",        lambda i, item: (i.stop(), os._exit(0))),
+            pystray.MenuItem("기록",        lambda i, item: open_history()),
+            pystray.MenuItem("통계",        lambda i, item: open_stats()),
+            pystray.MenuItem("종료",        lambda i, item: _quit(i)),
         )
     )
-    threading.Thread(target=icon.run, daemon=True).start()
+    _mark("tray")
+    icon.run()
+
+
+metrics.gauge("startup", lambda: {**{k: round(v, 1) for k, v in _startup.items()},
+                                   **{"import " + k: round(v, 1) for k, v in _startup_imports.items()}})
+_mark("module")
 
 
 # ── 메인 루프 ─────────────────────────────────
 if __name__ == "__main__":
+    if "--install-deps" in sys.argv:
+        install_deps(); sys.exit(0)
+
     print("=" * 48)
     print("  PeekAlert v1.0  - Discord → 서브모니터")
     print("=" * 48)
 
-    threading.Thread(target=poll_notifications, daemon=True).start()
-    run_tray()
-
+    # 감시 먼저 시작 → 그 사이에 메인 스레드는 Tk, 트레이 스레드는 pystray 로드
+    start_history(_config.get())
+    start_diagnostics(_config.get())
+    try:
+        emit = start_relay(_config.get())
+    except OSError as e:
+        print(f"[오류] 릴레이 시작 실패: {e}"); emit = _coalescer.submit
+    if emit is not None:  # receive 모드는 DB 를 보지 않음
+        start_sources(_config.get(), emit)
+    threading.Thread(target=_metrics_writer, daemon=True).start()
+    threading.Thread(target=run_tray, daemon=True).start()
+
+    _load_ui()
     root = tk.Tk()
     root.withdraw()
-
-    while True:
-        try:
-            fn = _main_queue.get_nowait()
-            fn()
-        except queue.Empty:
-            pass
-        try:
-            root.update()
-        except Exception:
-            break
-        time.sleep(0.02)
+    _start_dispatcher(root)
+    _mark("ui")
+    root.after_idle(lambda: _pool.warm(_config.get()))
+    if "--startup-report" in sys.argv:
+        root.after(3000, lambda: print(_startup_report()))
+    root.mainloop()
@@ -0,0 +1,39 @@
+"""
+PeekAlert 테스트 공통 준비
+실행: python -m pytest -q   (Windows/디스플레이 없이 가짜 알림 DB 로 돌아갑니다)
+"""
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import peekalert as pa
+import make_testdb
+
+
+@pytest.fixture
+def config(tmp_path):
+    """사용자 설정 파일 대신 임시 설정. config(키=값) 으로 바꿀 수 있다"""
+    saved = pa._config
+    pa._config = pa._ConfigStore(str(tmp_path / "cfg.json"), pa.DEFAULT_CONFIG, save_delay=60)
+    def update(**overrides):
+        pa._config.save({**pa._config.get(), "verbose": False, **overrides})
+        return pa._config.get()
+    update()
+    yield update
+    pa._config = saved
+
+
+@pytest.fixture
+def testdb(tmp_path):
+    """가짜 wpndatabase.db 를 만들고 (경로, 쓰기 연결) 을 돌려준다"""
+    made = []
+    def make(rows=100, wal=False):
+        path = str(tmp_path / f"wpndatabase{len(made)}.db")
+        con = make_testdb.make_db(path, rows, wal)
+        made.append(con)
+        return path, con
+    yield make
+    for con in made:
+        con.close()
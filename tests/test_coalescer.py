@@ -0,0 +1,61 @@
+"""묶기 단계: 오류가 나도 스레드가 계속 돌고, 닫힌 그룹은 다시 토큰을 기다려야 함"""
+import time
+
+import peekalert as pa
+
+
+def _wait(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_sink_error_does_not_stop_thread(config):
+    config(rate_per_s=1000.0, rate_burst=100, coalesce_ms=50)
+    out = []
+    def sink(title, body, **kw):
+        if title == "boom":
+            raise RuntimeError("sink")
+        out.append(title)
+    co = pa._Coalescer(sink=sink)
+    co.submit("boom", "x", priority=pa.PRI_NORMAL)
+    assert _wait(lambda: co.stats["errors"] == 1)
+    co.submit("ok", "y", priority=pa.PRI_NORMAL)
+    assert _wait(lambda: out == ["ok"])
+
+
+def test_step_error_drops_state_and_recovers(config):
+    config(rate_per_s=1000.0, rate_burst=100, coalesce_ms=50)
+    out = []
+    co = pa._Coalescer(sink=lambda title, body, **kw: out.append(title))
+    co.submit("bad", "x", priority="2")    # _step 에서 TypeError
+    assert _wait(lambda: co.stats["errors"] >= 1)
+    co.submit("ok", "y", priority=pa.PRI_NORMAL)
+    assert _wait(lambda: out == ["ok"])
+    assert co.thread.is_alive()
+
+
+def test_forgotten_group_waits_for_token_again(config):
+    config(rate_per_s=0.001, rate_burst=1, coalesce_ms=60000)
+    out = []
+    co = pa._Coalescer(sink=lambda title, body, update=False, **kw: out.append((title, update)))
+    co.submit("A", "1", priority=pa.PRI_NORMAL)
+    assert _wait(lambda: out == [("A", False)])     # 토큰 하나 사용
+    co.forget("A")                                  # 팝업이 밀려나거나 클릭으로 닫힘
+    co.submit("A", "2", priority=pa.PRI_NORMAL)
+    time.sleep(0.3)
+    assert out == [("A", False)]                    # 갱신으로 되살아나지 않고 토큰을 기다림
+    assert [g["title"] for g in co.waiting] == ["A"]
+
+
+def test_update_keeps_avatar(config):
+    config(rate_per_s=1000.0, rate_burst=100, coalesce_ms=5000)
+    out = []
+    co = pa._Coalescer(sink=lambda title, body, image=None, update=False, **kw:
+                       out.append((title, image, update)))
+    co.submit("Alice", "1", priority=pa.PRI_NORMAL, image="alice.png")
+    assert _wait(lambda: len(out) == 1)
+    co.submit("Alice", "2", priority=pa.PRI_NORMAL)
+    assert _wait(lambda: len(out) == 2)
+    assert out == [("Alice", "alice.png", False), ("Alice +1", "alice.png", True)]
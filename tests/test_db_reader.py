@@ -0,0 +1,73 @@
+"""알림 DB 증분 읽기 (_DbReader) — wpndatabase.db 와 같은 스키마의 가짜 DB 로"""
+import sqlite3
+
+import peekalert as pa
+import make_testdb
+
+
+def _schema(path):
+    con = sqlite3.connect(path)
+    try:
+        return sorted(con.execute("SELECT type, name, sql FROM sqlite_master").fetchall())
+    finally:
+        con.close()
+
+
+def test_only_rows_after_last_id(testdb, tmp_path):
+    path, con = testdb(100)
+    ref = str(tmp_path / "ref.db")
+    sqlite3.connect(ref).executescript(make_testdb.SCHEMA)
+    assert _schema(path) == _schema(ref)
+
+    reader = pa._DbReader(path)
+    assert reader.max_id() == 100
+    assert reader.fetch_new(100) == []
+    make_testdb.append_rows(con, 10)
+    rows = reader.fetch_new(100)
+    assert [r[0] for r in rows] == list(range(101, 111))
+    assert [r[0] for r in reader.fetch_new(105)] == list(range(106, 111))
+    rid, handler_id, payload, arrival, tag, group = rows[0]
+    assert payload.startswith(b"<toast") and tag == "tag101" and arrival > 0
+
+
+def test_batch_limit_carries_over(testdb):
+    path, con = testdb(10)
+    reader = pa._DbReader(path, batch=4)
+    make_testdb.append_rows(con, 10)
+    seen, last = [], 10
+    while True:
+        rows = reader.fetch_new(last)
+        if not rows:
+            break
+        assert len(rows) <= 4
+        seen += [r[0] for r in rows]
+        last = rows[-1][0]
+    assert seen == list(range(11, 21))
+
+
+def test_copy_fallback_when_db_locked(testdb):
+    path, con = testdb(50)                      # 롤백 저널 모드: 쓰기 잠금이 읽기도 막음
+    reader = pa._DbReader(path)
+    assert reader.max_id() == 50
+    make_testdb.append_rows(con, 5)
+    con.execute("BEGIN EXCLUSIVE")
+    try:
+        before = pa.metrics.counters["poll.fallbacks"]
+        rows = reader.fetch_new(50)
+        assert [r[0] for r in rows] == list(range(51, 56))
+        assert pa.metrics.counters["poll.fallbacks"] == before + 1
+        assert reader.con is None                # 다음 틱에 다시 연결
+    finally:
+        con.rollback()
+    assert [r[0] for r in reader.fetch_new(50)] == list(range(51, 56))
+    assert reader.con is not None
+
+
+def test_copy_fallback_when_open_fails(testdb, monkeypatch):
+    path, con = testdb(20)
+    reader = pa._DbReader(path)
+    def fail():
+        raise sqlite3.OperationalError("unable to open database file")
+    monkeypatch.setattr(reader, "_connect", fail)
+    make_testdb.append_rows(con, 3)
+    assert [r[0] for r in reader.fetch_new(20)] == [21, 22, 23]
@@ -0,0 +1,64 @@
+"""알림 기록: 오래된 기록을 지우면 파일이 실제로 줄고, 쓰기 스레드는 조용할 때 쉰다"""
+import sqlite3, time
+
+import peekalert as pa
+
+
+def _fill(h, n, t=None):
+    h.next_compact = float("inf")  # 쓰기 스레드가 먼저 정리하지 않도록
+    for i in range(n):
+        h.add(f"보낸이{i % 50}", f"메시지 {i} " + "내용 " * 40, t=t)
+    h.flush()
+
+
+def test_new_file_uses_incremental_vacuum(tmp_path):
+    h = pa._History(str(tmp_path / "h.db"))
+    assert h.writer.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert h.writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_compact_shrinks_file(tmp_path):
+    path = str(tmp_path / "h.db")
+    h = pa._History(path, max_rows=100)
+    _fill(h, 3000)
+    before = h.writer.execute("PRAGMA page_count").fetchone()[0]
+    assert h.compact() == 2900
+    after = h.writer.execute("PRAGMA page_count").fetchone()[0]
+    assert after < before / 5
+    assert h.count() == 100
+
+
+def test_compact_converts_old_file(tmp_path):
+    path = str(tmp_path / "h.db")
+    con = sqlite3.connect(path)          # auto_vacuum 이 먹지 않던 예전 순서로 만든 파일
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    con.executescript(pa._HISTORY_SCHEMA)
+    con.close()
+    h = pa._History(path, days=1)
+    assert h.writer.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    _fill(h, 2000, t=time.time() - 3 * 86400)
+    before = h.writer.execute("PRAGMA page_count").fetchone()[0]
+    assert h.compact() == 2000
+    assert h.writer.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert h.writer.execute("PRAGMA page_count").fetchone()[0] < before / 5
+
+
+def test_writer_sleeps_while_idle(tmp_path):
+    h = pa._History(str(tmp_path / "h.db"))
+    h.FLUSH_S = 0.02
+    flushes = []
+    flush = h.flush
+    h.flush = lambda: flushes.append(flush())
+    h.add("보낸이", "첫 알림")
+    end = time.monotonic() + 3
+    while not flushes and time.monotonic() < end:
+        time.sleep(0.01)
+    assert flushes == [1]
+    time.sleep(0.3)                      # 예전에는 FLUSH_S 마다 깨어나 빈 flush
+    assert flushes == [1]
+    h.add("보낸이", "둘째 알림")          # 다시 쌓이면 바로 깨어나 저장
+    end = time.monotonic() + 3
+    while len(flushes) < 2 and time.monotonic() < end:
+        time.sleep(0.01)
+    assert flushes == [1, 1] and h.count() == 2
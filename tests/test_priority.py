@@ -0,0 +1,93 @@
+"""알림 우선순위와 메인 스레드 작업 큐 (합성 폭주)"""
+import random, threading, time
+
+import pytest
+
+import peekalert as pa
+
+
+def test_dm_rule_only_for_discord(config):
+    assert pa.notification_priority("Alice", "hi", app="discord") == pa.PRI_HIGH
+    assert pa.notification_priority("Alice (#general, Srv)", "hi", app="discord") == pa.PRI_NORMAL
+    for app in ("slack", "teams", "http", None):
+        assert pa.notification_priority("Alice", "hi", app=app) == pa.PRI_NORMAL
+    assert pa.notification_priority("Bot", "@me 봐봐", app="http") == pa.PRI_HIGH  # 멘션은 그대로
+
+
+def test_push_flood_is_rate_limited(config):
+    config(rate_per_s=2.0, rate_burst=3, coalesce_ms=3000, max_popups=3)
+    shown = []
+    co = pa._Coalescer(sink=lambda title, body, priority=None, **kw: shown.append(priority))
+    pipe = pa._Pipeline(co.submit)
+    for i in range(100):
+        pipe.push(pa._push_item("http", f'{{"title": "빌드 {i}", "body": "끝"}}'.encode()))
+    pipe.join()
+    time.sleep(0.3)
+    assert len(shown) <= 4 and set(shown) == {pa.PRI_NORMAL}
+
+
+def _ops(rng, n, high_share=0.05):
+    pri = lambda: pa.PRI_HIGH if rng.random() < high_share else rng.choice((pa.PRI_LOW, pa.PRI_NORMAL))
+    return [(pri(), i) for i in range(n)]
+
+
+def test_queue_orders_by_priority_then_fifo(config):
+    q = pa._TaskQueue()
+    ops = _ops(random.Random(1), 500)
+    for pri, i in ops:
+        q.put((pri, i), pri)
+    out = []
+    while not q.empty():
+        _, fn, pri = q.get_nowait()
+        out.append(fn)
+    assert out == sorted(ops, key=lambda op: (-op[0], op[1]))
+
+
+@pytest.mark.parametrize("policy", ["drop_lowest", "drop_oldest"])
+def test_queue_memory_bound_under_flood(config, policy):
+    cfg = config(queue_max=32, queue_policy=policy)
+    q = pa._TaskQueue()
+    ops = _ops(random.Random(2), 20000)
+    for pri, i in ops:
+        q.put((pri, i), pri, droppable=True)
+        assert q.droppable <= cfg["queue_max"]
+    q.put("control", pa.PRI_CONTROL)               # 제어 작업은 버리지 않음
+    kept = []
+    while not q.empty():
+        kept.append(q.get_nowait()[1])
+    assert kept[0] == "control" and len(kept) == cfg["queue_max"] + 1
+    if policy == "drop_lowest":  # 높은 우선순위는 낮은 것이 남아 있는 한 버려지지 않음
+        highs = [op for op in ops if op[0] == pa.PRI_HIGH][-cfg["queue_max"]:]
+        assert all(op in kept for op in highs[-5:])
+    else:                        # 가장 최근 queue_max 개만 남음
+        assert sorted(kept[1:], key=lambda op: op[1]) == ops[-cfg["queue_max"]:]
+
+
+def test_high_priority_wait_bounded_during_flood(config, monkeypatch):
+    config(queue_max=32, queue_policy="drop_lowest")
+    monkeypatch.setattr(pa, "_main_queue", pa._TaskQueue())
+    monkeypatch.setattr(pa, "_root", None)
+    pa.metrics.hists.pop("dispatch.wait_high", None)
+
+    def work():  # 팝업 하나 만드는 정도의 작업
+        time.sleep(0.0002)
+
+    def flood(end):  # 5ms 마다 낮은/보통 20 개 + 높은 1 개 (queue_max 를 계속 넘김)
+        rng = random.Random(3)
+        while time.monotonic() < end:
+            for _ in range(20):
+                pa._queue_task(work, rng.choice((pa.PRI_LOW, pa.PRI_NORMAL)), droppable=True)
+            pa._queue_task(work, pa.PRI_HIGH, droppable=True)
+            time.sleep(0.005)
+
+    end = time.monotonic() + 1.0
+    t = threading.Thread(target=flood, args=(end,), daemon=True)
+    t.start()
+    while t.is_alive():                        # Tk 메인 루프 흉내: 깨어날 때마다 비움
+        pa._drain()
+        time.sleep(0.005)
+    pa._drain()
+    waits = sorted(pa.metrics.values("dispatch.wait_high"))
+    assert len(waits) > 50
+    assert pa._main_queue.stats["dropped_lowest"] > 0
+    assert waits[int(len(waits) * 0.99)] < 50  # ms, 낮은 우선순위가 아무리 쌓여도
@@ -0,0 +1,59 @@
+"""릴레이 수신: 잘못된 메시지는 버리고 연결과 묶기 단계는 살아 있어야 함"""
+import io, socket, threading, time, zlib
+
+import pytest
+
+import peekalert as pa
+
+
+def _wait(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_malformed_messages_dropped_connection_kept():
+    got, lock = [], threading.Lock()
+    def sink(title, body, priority=None, stamps=None):
+        with lock:
+            got.append((title, body, priority))
+    rx = pa._RelayReceiver("127.0.0.1", 0, sink)
+    rx.start()
+    try:
+        with socket.create_connection(("127.0.0.1", rx.port)) as s:
+            s.sendall(pa._encode_frame([["A", "x", "2"], ["B", None, 1.0], [1, "y", None],
+                                        ["C"], "D", ["E", "z", True], ["G", "w", float("inf")],
+                                        ["H", "v", float("nan")], ["I", "u", 3]], sent="어제"))
+            s.sendall(pa._encode_frame([["F", "ok", None]]))
+            assert _wait(lambda: len(got) == 3)
+        assert got == [("B", "", 1), ("I", "u", 3), ("F", "ok", None)]
+        assert rx.stats["errors"] == 7 and rx.stats["received"] == 3
+    finally:
+        rx.close()
+
+
+def test_string_priority_does_not_kill_coalescer(config):
+    config(rate_per_s=1000.0, rate_burst=100, coalesce_ms=50)
+    out = []
+    co = pa._Coalescer(sink=lambda title, body, **kw: out.append(title))
+    rx = pa._RelayReceiver("127.0.0.1", 0, co.submit)
+    rx.start()
+    try:
+        with socket.create_connection(("127.0.0.1", rx.port)) as s:
+            s.sendall(pa._encode_frame([["A", "x", "2"]]))
+            s.sendall(pa._encode_frame([["B", "y", 2]]))
+            assert _wait(lambda: "B" in out)
+        assert "A" not in out
+    finally:
+        rx.close()
+
+
+def test_decompression_bomb_rejected():
+    data = zlib.compress(b"[0,[" + b" " * (pa._FRAME_MAX + 1) + b"]]", 9)
+    frame = pa._FRAME_HEAD.pack(len(data), pa._FRAME_ZLIB) + data
+    assert len(frame) < 64 * 1024
+    with pytest.raises(ValueError):
+        pa._read_frame(io.BytesIO(frame))
+    big = pa._encode_frame([["A", "x" * 100_000, None]])  # 정상 압축 프레임은 그대로
+    assert pa._read_frame(io.BytesIO(big))[1] == [["A", "x" * 100_000, None]]
@@ -0,0 +1,116 @@
+"""팝업 재정렬: 크기만 바뀐 경우, 재정렬 중 갱신 (Tk 없이)"""
+import time
+
+import pytest
+
+import peekalert as pa
+
+
+class _Recorder:
+    def __init__(self):
+        self.anims, self.moves = {}, []
+
+    def move(self, win, start, end, size, duration_ms, easing="ease_out", keep_done=False):
+        self.moves.append((win, start, end, size))
+
+    def cancel(self, win):
+        pass
+
+
+def _stack(cfg, n):
+    base_x, base_y = pa._base_x_y(cfg)[:2]
+    return [{"id": i, "win": f"win{i}", "x": base_x,
+             "target_y": pa._target_y_for_slot(i, cfg, base_y),
+             "size": (cfg["popup_width"], cfg["popup_height"])} for i in range(n)]
+
+
+def test_width_change_without_move_is_applied(config, monkeypatch):
+    monkeypatch.setattr(pa, "displays", pa._DisplayService(pa.FakeDisplays([(0, 0, 1920, 1040, True)])))
+    rec = _Recorder()
+    monkeypatch.setattr(pa, "_animator", rec)
+    cfg = config(position="top_left", popup_width=380)
+    monkeypatch.setattr(pa, "_popup_stack", _stack(cfg, 2))
+
+    pa._restack(cfg)
+    assert rec.moves == []                      # 그대로면 아무것도 안 함
+
+    cfg = config(position="top_left", popup_width=450)  # 좌상단: 너비만 바뀌고 위치는 그대로
+    pa._restack(cfg)
+    assert [(m[0], m[3]) for m in rec.moves] == [("win0", (450, cfg["popup_height"])),
+                                                 ("win1", (450, cfg["popup_height"]))]
+    assert all(m[1] == m[2] for m in rec.moves)
+
+
+class _FakeWin:
+    """after/geometry 만 흉내 내는 팝업 창"""
+    def __init__(self):
+        self.timers, self.n = {}, 0
+
+    def after(self, ms, fn):
+        self.n += 1
+        self.timers[self.n] = (ms, fn)
+        return self.n
+
+    def after_cancel(self, tid):
+        self.timers.pop(tid, None)
+
+    def geometry(self, spec): pass
+    def deiconify(self): pass
+    def withdraw(self): pass
+    def update_idletasks(self): pass
+    def destroy(self): pass
+
+
+def _finish(anim):
+    time.sleep(0.01)       # anim_ms=1 → 모든 이동이 끝날 시각
+    anim._tick()
+
+
+@pytest.fixture
+def anim(config, monkeypatch):
+    """가짜 창으로 팝업을 띄우는 환경 (애니메이터는 진짜, tick 은 손으로)"""
+    monkeypatch.setattr(pa, "displays", pa._DisplayService(pa.FakeDisplays([(0, 0, 1920, 1040, True)])))
+    anim = pa._Animator()
+    monkeypatch.setattr(pa, "_animator", anim)
+    monkeypatch.setattr(pa, "_popup_stack", [])
+    monkeypatch.setattr(pa._pool, "acquire", lambda cfg, bitmap=False: (_FakeWin(), {}))
+    monkeypatch.setattr(pa._pool, "release", lambda entry: None)
+    for name in ("_skin_popup", "_set_popup_text", "_set_popup_icon"):
+        monkeypatch.setattr(pa, name, lambda *a, **kw: None)
+    config(anim_ms=1)
+    return anim
+
+
+def test_update_during_restack_keeps_close_timer(anim):
+    cfg = pa._config.get()
+
+    pa._create_popup("A", "a", group="A")
+    pa._create_popup("B", "b", group="B")
+    _finish(anim)                                  # 슬라이드 인 끝 → 둘 다 자동 닫기 예약
+    a, b = pa._popup_stack
+    assert a["timer"] and b["timer"]
+
+    pa._remove_popup(a["id"], cfg)                 # B 는 done 없는 재정렬 이동 시작
+    assert b["win"] in anim.anims
+    pa._create_popup("B +1", "b2", group="B")      # 재정렬 중에 온 갱신
+    _finish(anim)
+
+    assert b["timer"] is not None
+    ms, fn = b["win"].timers[b["timer"]]
+    assert ms == cfg["popup_duration_ms"]
+    fn()
+    assert pa._popup_stack == []
+
+
+def test_update_for_closed_group_is_dropped(anim, monkeypatch):
+    forgot = []
+    monkeypatch.setattr(pa._coalescer, "forget", forgot.append)
+    pa._create_popup("A", "a", group="A")
+    a, = pa._popup_stack
+    pa._remove_popup(a["id"], pa._config.get())    # 닫힘 → 묶기 단계에 알림
+    assert forgot == ["A"]
+
+    pa._create_popup("A +3", "a4", group="A", update=True)  # 그 사이 이미 보낸 갱신
+    assert pa._popup_stack == [] and forgot == ["A", "A"]
+    pa._create_popup("A", "a5", group="A")         # 새 팝업 요청은 그대로 뜬다
+    assert len(pa._popup_stack) == 1
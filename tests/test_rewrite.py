@@ -0,0 +1,66 @@
+"""재기록 재생: Windows 가 같은 알림을 새 Id 로 다시 써도 팝업은 한 번만"""
+import random, time
+
+import pytest
+
+import peekalert as pa
+import make_testdb
+
+N = 120
+APPS = ["discord", "slack", "teams", "telegram"]
+MIX = {app: 1 for app in APPS}  # 감시하지 않는 앱 행은 거르기 단계에서 빠지므로 제외
+
+
+@pytest.fixture
+def replay(config, testdb):
+    config(watch_apps=APPS, dedup_window_s=0.5)
+    path, writer = testdb(100)
+    out = []
+    pipe = pa._Pipeline(lambda t, b, priority=None, stamps=None, image=None: out.append((t, b)))
+    poller = pa._DbPoller(path, emit=pipe.push)
+    poller.start()
+
+    def run(write):
+        before = len(out)
+        write()
+        while poller.tick():  # 한 틱에 batch 행까지라 남은 행이 없을 때까지
+            pass
+        pipe.join()
+        return len(out) - before
+    run.writer, run.pipe = writer, pipe
+    yield run
+    poller.reader.close()
+
+
+def _new(replay, seed=4):
+    w = replay.writer
+    first = w.execute("SELECT MAX(Id) FROM Notification").fetchone()[0] + 1
+    assert replay(lambda: make_testdb.append_rows(w, N, random.Random(seed), MIX)) == N
+    return range(first, first + N)
+
+
+def test_rewrite_with_new_ids_is_suppressed(replay):
+    ids = _new(replay)
+    assert replay(lambda: make_testdb.rewrite_rows(replay.writer, ids)) == 0
+    assert replay.pipe.dedup.stats["suppressed"] == N
+
+
+def test_same_text_different_tag_is_shown(replay):
+    _new(replay)
+    assert replay(lambda: make_testdb.append_rows(replay.writer, N, random.Random(4), MIX)) == N
+
+
+def test_rewrite_after_window_is_shown_again(replay):
+    ids = _new(replay)
+    time.sleep(0.6)
+    assert replay(lambda: make_testdb.rewrite_rows(replay.writer, ids)) == N
+
+
+def test_rewrites_interleaved_with_new_rows(replay):
+    ids = list(_new(replay))
+    w = replay.writer
+    def write():  # 일부 재기록 → 새 알림 → 나머지 재기록 (같은 틱에 섞여 들어옴)
+        make_testdb.rewrite_rows(w, ids[:40])
+        make_testdb.append_rows(w, 25, random.Random(99), MIX)
+        make_testdb.rewrite_rows(w, ids[40:])
+    assert replay(write) == 25
@@ -0,0 +1,94 @@
+"""알림 Id 중복 제거 (_SeenIds) 와 폴러의 읽기 범위"""
+import random, tracemalloc
+
+import peekalert as pa
+import make_testdb
+
+
+def _shuffled(n, window, seed=2):
+    """1..n 을 window 개 단위로 순서만 뒤섞음 (늦게 커밋되는 행 흉내)"""
+    rng, ids = random.Random(seed), []
+    for base in range(1, n + 1, window):
+        chunk = list(range(base, min(base + window, n + 1)))
+        rng.shuffle(chunk)
+        ids += chunk
+    return ids
+
+
+def test_million_ids_flat_memory_no_drops_no_duplicates():
+    ids = _shuffled(1_000_000, 8)
+    seen = pa._SeenIds()
+    tracemalloc.start()
+    try:
+        new = sum(seen.add(i, now=0.0) for i in ids)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert new == len(ids)                        # 빠진 것 없음
+    assert peak < 64 * 1024                       # Id 수와 무관하게 고정
+    assert len(seen.gaps) <= seen.window
+    assert not any(seen.add(i, now=0.0) for i in ids[::97])  # 다시 와도 중복
+
+
+def test_gap_filled_late_is_new_once_and_expires():
+    seen = pa._SeenIds(window=4, ttl=30.0)
+    assert seen.add(10, now=0.0)
+    assert list(seen.gaps) == [6, 7, 8, 9]        # window 개까지만 기억
+    assert seen.add(8, now=1.0)
+    assert not seen.add(8, now=1.0)
+    assert not seen.add(5, now=1.0)               # window 밖은 이미 본 것
+    seen.expire(now=31.0)
+    assert not seen.gaps
+    assert not seen.add(9, now=31.0)
+
+
+def _poll_until_quiet(poller, ticks=20):
+    total = 0
+    for _ in range(ticks):
+        total += poller.tick()
+    return total
+
+
+def test_burst_with_gap_moves_forward_each_tick(config, testdb):
+    path, con = testdb(100)
+    out = []
+    poller = pa._DbPoller(path, emit=out.append)
+    poller.start()
+
+    # 400 건이 한꺼번에 + 중간 Id 하나는 지워져서 구멍으로 남음
+    make_testdb.append_rows(con, 400)
+    con.execute("DELETE FROM Notification WHERE Id = 150")
+    con.commit()
+    rows0 = pa.metrics.counters["poll.rows"]
+    emitted = [poller.tick() for _ in range(3)]
+    assert sum(emitted) == 399 and emitted[0] == 200     # 틱마다 batch 만큼 앞으로
+    assert 150 in poller.seen.gaps
+    assert pa.metrics.counters["poll.rows"] - rows0 == 399
+
+    # 구멍이 남아 있는 동안의 띄엄띄엄 들어오는 알림: 읽는 행 수 ≈ 새 행 수
+    rows0 = pa.metrics.counters["poll.rows"]
+    for _ in range(61):
+        make_testdb.append_rows(con, 1)
+        assert poller.tick() == 1
+    assert pa.metrics.counters["poll.rows"] - rows0 == 61
+
+    assert len(out) == 460
+    assert _poll_until_quiet(poller) == 0
+
+
+def test_late_commit_into_gap_is_picked_up(config, testdb):
+    path, con = testdb(100)
+    out = []
+    poller = pa._DbPoller(path, emit=out.append)
+    poller.start()
+    make_testdb.append_rows(con, 5)
+    con.execute("DELETE FROM Notification WHERE Id = 103")
+    con.commit()
+    assert poller.tick() == 4
+    # Id 103 이 나중에 커밋됨
+    con.execute('INSERT INTO Notification (Id, HandlerId, Payload, ArrivalTime)'
+                ' SELECT 103, HandlerId, Payload, ArrivalTime FROM Notification WHERE Id = 104')
+    con.commit()
+    assert poller.tick() == 1
+    assert _poll_until_quiet(poller) == 0
+    assert [item.tag for item in out][-1] is None and len(out) == 5
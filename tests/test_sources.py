@@ -0,0 +1,75 @@
+"""푸시 소스: HTTP 요청 검사, 잘못된 입력 하나로 소스가 멈추지 않아야 함"""
+import socket, time
+
+import pytest
+
+import peekalert as pa
+
+
+@pytest.fixture
+def http():
+    got = []
+    src = pa._HttpSource("127.0.0.1", 0)
+    src.start(lambda item, block=True: got.append(item) or True)
+    yield src, got
+    src.close()
+
+
+def _request(port, head, body=b""):
+    with socket.create_connection(("127.0.0.1", port), timeout=3) as s:
+        s.sendall(b"POST /notify HTTP/1.1\r\nHost: x\r\n" + head + b"\r\n" + body)
+        return int(s.recv(64).split()[1])   # 연결을 끊지 않아도 바로 응답해야 함
+
+
+def test_valid_post_accepted(http):
+    src, got = http
+    body = '{"title": "빌드", "body": "완료"}'.encode()
+    assert _request(src.port, b"Content-Length: %d\r\n" % len(body), body) == 202
+    assert [(i.title, i.body) for i in got] == [("빌드", "완료")]
+
+
+@pytest.mark.parametrize("length", [b"-1", b"-100", b"abc"])
+def test_bad_content_length_rejected_without_reading(http, length):
+    src, got = http
+    assert _request(src.port, b"Content-Length: " + length + b"\r\n", b'{"title": "x"}') == 400
+    assert got == []
+
+
+def test_too_large_rejected(http):
+    src, got = http
+    assert _request(src.port, b"Content-Length: %d\r\n" % (pa._PUSH_MAX + 1)) == 413
+    assert got == []
+
+
+@pytest.mark.parametrize("pri", [b"NaN", b"Infinity", b"-Infinity"])
+def test_non_finite_priority_rejected(http, pri):
+    src, got = http
+    body = b'{"title": "a", "priority": ' + pri + b'}'
+    assert _request(src.port, b"Content-Length: %d\r\n" % len(body), body) == 400
+    assert got == []
+
+
+def test_udp_bad_datagram_does_not_stop_source():
+    got = []
+    src = pa._UdpSource("127.0.0.1", 0)
+    src.start(lambda item, block=True: got.append(item.title))
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b'{"title": "a", "priority": NaN}', ("127.0.0.1", src.port))
+            s.sendto(b'{"title": "b", "priority": 2}', ("127.0.0.1", src.port))
+        end = time.monotonic() + 3
+        while not got and time.monotonic() < end:
+            time.sleep(0.01)
+        assert got == ["b"]
+    finally:
+        src.close()
+
+
+def test_file_tail_skips_bad_line(tmp_path):
+    path = tmp_path / "feed.log"
+    path.write_bytes(b"")
+    got = []
+    src = pa._FileTailSource(str(path))
+    path.write_bytes(b'{"title": "a", "priority": Infinity}\n{"title": "b"}\n')
+    src.poll(lambda item: got.append(item.title))
+    assert got == ["b"]
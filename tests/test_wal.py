@@ -0,0 +1,65 @@
+"""WAL 모드 알림 DB: 체크포인트 전(-wal 에만 있는) 새 알림도 한 틱 안에 보여야 함"""
+import os, sqlite3
+
+import pytest
+
+import peekalert as pa
+import make_testdb
+
+
+@pytest.fixture
+def wal_db(testdb):
+    path, con = testdb(100, wal=True)
+    con.execute("PRAGMA wal_autocheckpoint=0")  # 새 행이 db 파일로 옮겨지지 않게
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return path, con
+
+
+def _only_in_wal(path, con, n):
+    size = os.path.getsize(path)
+    make_testdb.append_rows(con, n)
+    assert os.path.getsize(path + "-wal") > 0
+    assert os.path.getsize(path) == size        # db 파일은 그대로
+
+
+def test_live_readonly_connection_sees_wal_rows(config, wal_db):
+    path, con = wal_db
+    out = []
+    poller = pa._DbPoller(path, emit=out.append)
+    poller.start()
+    assert poller.tick() == 0
+    _only_in_wal(path, con, 7)
+    assert poller.tick() == 7
+    assert poller.reader.con is not None        # 복사본이 아니라 열어 둔 연결로
+    _only_in_wal(path, con, 3)
+    assert poller.tick() == 3
+    assert len(out) == 10
+
+
+def test_copy_snapshot_includes_wal(wal_db, tmp_path):
+    path, con = wal_db
+    _only_in_wal(path, con, 5)
+    dst = str(tmp_path / "copy.db")
+    pa._copy_snapshot(path, dst)
+    assert os.path.exists(dst + "-wal")
+    c = sqlite3.connect(dst)
+    try:
+        assert c.execute("SELECT MAX(Id) FROM Notification").fetchone()[0] == 105
+    finally:
+        c.close()
+
+
+def test_copy_mode_poller_sees_wal_rows_within_one_tick(config, wal_db, monkeypatch):
+    path, con = wal_db
+    out = []
+    poller = pa._DbPoller(path, emit=out.append)
+    poller.start()
+    def fail():
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(poller.reader, "_connect", fail)
+    poller.reader.close()
+    poller.tick()
+    _only_in_wal(path, con, 6)
+    assert poller.tick() == 6
+    assert poller.tick() == 0                   # 바뀐 것 없음 → 다시 읽지 않음
+    assert len(out) == 6